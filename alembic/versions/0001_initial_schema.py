@@ -0,0 +1,61 @@
+"""Initial schema with ingestion job checkpoints.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    """Tables may already exist if they were created with create_all()."""
+    if op.get_context().as_sql:
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('taxi_trips'):
+        op.create_table(
+            'taxi_trips',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('vendor_id', sa.Integer(), nullable=True),
+            sa.Column('pickup_datetime', sa.DateTime(), nullable=True),
+            sa.Column('passenger_count', sa.Integer(), nullable=True),
+            sa.Column('pickup_longitude', sa.Float(), nullable=True),
+            sa.Column('pickup_latitude', sa.Float(), nullable=True),
+            sa.Column('dropoff_longitude', sa.Float(), nullable=True),
+            sa.Column('dropoff_latitude', sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('ingestion_jobs'):
+        op.create_table(
+            'ingestion_jobs',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('file_path', sa.String(), nullable=False),
+            sa.Column('batch_size', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('chunk_offset', sa.Integer(), nullable=False),
+            sa.Column('total_records', sa.Integer(), nullable=False),
+            sa.Column('processed_records', sa.Integer(), nullable=False),
+            sa.Column('failed_records', sa.Integer(), nullable=False),
+            sa.Column('elapsed_seconds', sa.Float(), nullable=False),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('ingestion_jobs')
+    op.drop_table('taxi_trips')
@@ -0,0 +1,75 @@
+"""Trip duration, grid cell columns and query indexes on taxi_trips.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+GRID_RESOLUTION = 8
+
+
+def _cell_sql(prefix):
+    """SQL equivalent of GeoUtils.grid_cell at the default resolution."""
+    scale = 2 ** GRID_RESOLUTION
+    return (
+        f"(floor(({prefix}_latitude + 90) * {scale})::bigint << {GRID_RESOLUTION + 9}) | "
+        f"floor(({prefix}_longitude + 180) * {scale})::bigint"
+    )
+
+
+def upgrade():
+    op.add_column('taxi_trips', sa.Column('dropoff_datetime', sa.DateTime(), nullable=True))
+    op.add_column('taxi_trips', sa.Column('trip_duration', sa.Integer(), nullable=True))
+    op.add_column('taxi_trips', sa.Column('pickup_cell', sa.BigInteger(), nullable=True))
+    op.add_column('taxi_trips', sa.Column('dropoff_cell', sa.BigInteger(), nullable=True))
+
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    if is_postgres:
+        op.execute(
+            f"UPDATE taxi_trips SET pickup_cell = {_cell_sql('pickup')}, "
+            f"dropoff_cell = {_cell_sql('dropoff')} "
+            "WHERE pickup_latitude IS NOT NULL AND dropoff_latitude IS NOT NULL"
+        )
+
+    # Build indexes without blocking ingestion on large PostgreSQL tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_taxi_trips_pickup_datetime_brin',
+            'taxi_trips',
+            ['pickup_datetime'],
+            postgresql_using='brin',
+            postgresql_concurrently=is_postgres
+        )
+        op.create_index(
+            'ix_taxi_trips_pickup_datetime_id',
+            'taxi_trips',
+            ['pickup_datetime', 'id'],
+            postgresql_include=['trip_duration', 'vendor_id', 'passenger_count'],
+            postgresql_concurrently=is_postgres
+        )
+        op.create_index(
+            'ix_taxi_trips_route_cells',
+            'taxi_trips',
+            ['pickup_cell', 'dropoff_cell'],
+            postgresql_concurrently=is_postgres
+        )
+
+
+def downgrade():
+    op.drop_index('ix_taxi_trips_route_cells', table_name='taxi_trips')
+    op.drop_index('ix_taxi_trips_pickup_datetime_id', table_name='taxi_trips')
+    op.drop_index('ix_taxi_trips_pickup_datetime_brin', table_name='taxi_trips')
+    op.drop_column('taxi_trips', 'dropoff_cell')
+    op.drop_column('taxi_trips', 'pickup_cell')
+    op.drop_column('taxi_trips', 'trip_duration')
+    op.drop_column('taxi_trips', 'dropoff_datetime')
@@ -0,0 +1,84 @@
+"""Range-partition taxi_trips by pickup month.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDEXES = """
+    CREATE INDEX ix_taxi_trips_pickup_datetime_brin ON {table} USING brin (pickup_datetime);
+    CREATE INDEX ix_taxi_trips_pickup_datetime_id ON {table} (pickup_datetime, id)
+        INCLUDE (trip_duration, vendor_id, passenger_count);
+    CREATE INDEX ix_taxi_trips_route_cells ON {table} (pickup_cell, dropoff_cell);
+"""
+
+
+def upgrade():
+    # Only PostgreSQL supports declarative partitioning; other databases
+    # keep the plain table created by the earlier revisions
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # The partition key cannot be NULL; refuse to migrate rather than drop rows
+    missing = bind.execute(sa.text(
+        "SELECT count(*) FROM taxi_trips WHERE pickup_datetime IS NULL"
+    )).scalar()
+    if missing:
+        raise RuntimeError(
+            f"{missing} taxi_trips rows have no pickup_datetime and cannot be partitioned; "
+            "fix or delete them before upgrading"
+        )
+
+    op.execute("ALTER TABLE taxi_trips RENAME TO taxi_trips_unpartitioned")
+    op.execute(
+        "CREATE TABLE taxi_trips (LIKE taxi_trips_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (pickup_datetime)"
+    )
+    # One partition per month already present in the data; later months
+    # are created by the ingestion path
+    op.execute("""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT DISTINCT date_trunc('month', pickup_datetime)::date
+                FROM taxi_trips_unpartitioned
+                WHERE pickup_datetime IS NOT NULL
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF taxi_trips FOR VALUES FROM (%L) TO (%L)',
+                    'taxi_trips_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute("INSERT INTO taxi_trips SELECT * FROM taxi_trips_unpartitioned")
+    op.execute("DROP TABLE taxi_trips_unpartitioned")
+    op.execute("ALTER TABLE taxi_trips ADD PRIMARY KEY (id, pickup_datetime)")
+    op.execute(INDEXES.format(table='taxi_trips'))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("ALTER TABLE taxi_trips RENAME TO taxi_trips_partitioned")
+    op.execute("CREATE TABLE taxi_trips (LIKE taxi_trips_partitioned INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO taxi_trips SELECT * FROM taxi_trips_partitioned")
+    op.execute("DROP TABLE taxi_trips_partitioned CASCADE")
+    op.execute("ALTER TABLE taxi_trips ADD PRIMARY KEY (id)")
+    op.execute(INDEXES.format(table='taxi_trips'))
@@ -0,0 +1,52 @@
+"""Hourly trip rollup table.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def _hour_sql(dialect):
+    """SQL truncating pickup_datetime to the hour, matching HourlyRollup."""
+    if dialect == 'sqlite':
+        return "strftime('%Y-%m-%d %H:00:00.000000', pickup_datetime)"
+    return "date_trunc('hour', pickup_datetime)"
+
+
+def upgrade():
+    op.create_table(
+        'trip_hourly_rollup',
+        sa.Column('hour_bucket', sa.DateTime(), nullable=False),
+        sa.Column('vendor_id', sa.Integer(), nullable=False),
+        sa.Column('pickup_cell', sa.BigInteger(), nullable=False),
+        sa.Column('trip_count', sa.BigInteger(), nullable=False),
+        sa.Column('passenger_sum', sa.BigInteger(), nullable=False),
+        sa.Column('duration_sum', sa.BigInteger(), nullable=False),
+        sa.Column('duration_count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('hour_bucket', 'vendor_id', 'pickup_cell')
+    )
+
+    # Backfill from the trips loaded before the rollup existed
+    op.execute(
+        "INSERT INTO trip_hourly_rollup "
+        "(hour_bucket, vendor_id, pickup_cell, trip_count, passenger_sum, duration_sum, duration_count) "
+        f"SELECT {_hour_sql(op.get_bind().dialect.name)}, vendor_id, coalesce(pickup_cell, -1), "
+        "count(*), coalesce(sum(passenger_count), 0), coalesce(sum(trip_duration), 0), count(trip_duration) "
+        "FROM taxi_trips "
+        "WHERE pickup_datetime IS NOT NULL AND vendor_id IS NOT NULL "
+        "GROUP BY 1, 2, 3"
+    )
+
+
+def downgrade():
+    op.drop_table('trip_hourly_rollup')
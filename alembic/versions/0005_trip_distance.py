@@ -0,0 +1,47 @@
+"""Haversine trip distance column on taxi_trips.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+EARTH_RADIUS_KM = 6371.0
+
+# SQL equivalent of GeoUtils.haversine_array
+DISTANCE_SQL = (
+    f"2 * {EARTH_RADIUS_KM} * asin(sqrt(least(1.0, "
+    "power(sin(radians(dropoff_latitude - pickup_latitude) / 2), 2) + "
+    "cos(radians(pickup_latitude)) * cos(radians(dropoff_latitude)) * "
+    "power(sin(radians(dropoff_longitude - pickup_longitude) / 2), 2))))"
+)
+
+
+def upgrade():
+    op.add_column('taxi_trips', sa.Column('trip_distance_km', sa.Float(), nullable=True))
+
+    # Other databases lack the trigonometric functions; their existing rows
+    # keep a NULL distance until reloaded
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            f"UPDATE taxi_trips SET trip_distance_km = {DISTANCE_SQL} "
+            "WHERE pickup_latitude IS NOT NULL AND dropoff_latitude IS NOT NULL"
+        )
+
+    # taxi_trips is partitioned on PostgreSQL, and partitioned indexes
+    # cannot be built concurrently
+    op.create_index('ix_taxi_trips_trip_distance_km', 'taxi_trips', ['trip_distance_km'])
+
+
+def downgrade():
+    op.drop_index('ix_taxi_trips_trip_distance_km', table_name='taxi_trips')
+    op.drop_column('taxi_trips', 'trip_distance_km')
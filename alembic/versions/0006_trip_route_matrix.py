@@ -0,0 +1,73 @@
+"""Origin-destination route matrix table.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Resolution of the stored pickup_cell and dropoff_cell ids
+GRID_RESOLUTION = 8
+
+# Default ROUTE_RESOLUTIONS; other resolutions are filled by /rollups/rebuild
+RESOLUTIONS = (6, 8)
+
+
+def _day_sql(dialect):
+    """SQL truncating pickup_datetime to the date, matching RouteMatrix."""
+    if dialect == 'sqlite':
+        return "date(pickup_datetime)"
+    return "CAST(pickup_datetime AS DATE)"
+
+
+def _coarsen_sql(column, resolution):
+    """SQL equivalent of GeoUtils.coarsen_cell."""
+    shift = GRID_RESOLUTION - resolution
+    lon_mask = (1 << (GRID_RESOLUTION + 9)) - 1
+    return (
+        f"((({column} >> {GRID_RESOLUTION + 9 + shift}) << {resolution + 9}) | "
+        f"(({column} & {lon_mask}) >> {shift}))"
+    )
+
+
+def upgrade():
+    op.create_table(
+        'trip_route_matrix',
+        sa.Column('resolution', sa.SmallInteger(), nullable=False),
+        sa.Column('day_bucket', sa.Date(), nullable=False),
+        sa.Column('vendor_id', sa.Integer(), nullable=False),
+        sa.Column('pickup_cell', sa.BigInteger(), nullable=False),
+        sa.Column('dropoff_cell', sa.BigInteger(), nullable=False),
+        sa.Column('trip_count', sa.BigInteger(), nullable=False),
+        sa.Column('duration_sum', sa.BigInteger(), nullable=False),
+        sa.Column('duration_count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('resolution', 'day_bucket', 'vendor_id', 'pickup_cell', 'dropoff_cell')
+    )
+
+    # Backfill from the trips loaded before the matrix existed
+    day = _day_sql(op.get_bind().dialect.name)
+    for resolution in RESOLUTIONS:
+        op.execute(
+            "INSERT INTO trip_route_matrix "
+            "(resolution, day_bucket, vendor_id, pickup_cell, dropoff_cell, trip_count, duration_sum, duration_count) "
+            f"SELECT {resolution}, {day}, vendor_id, "
+            f"{_coarsen_sql('pickup_cell', resolution)}, {_coarsen_sql('dropoff_cell', resolution)}, "
+            "count(*), coalesce(sum(trip_duration), 0), count(trip_duration) "
+            "FROM taxi_trips "
+            "WHERE pickup_datetime IS NOT NULL AND vendor_id IS NOT NULL "
+            "AND pickup_cell IS NOT NULL AND dropoff_cell IS NOT NULL "
+            "GROUP BY 2, 3, 4, 5"
+        )
+
+
+def downgrade():
+    op.drop_table('trip_route_matrix')
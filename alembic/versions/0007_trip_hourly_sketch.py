@@ -0,0 +1,35 @@
+"""Hourly trip sketch table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sketches are built in Python, so trips loaded before this revision
+    # are added by POST /api/v1/rollups/rebuild rather than a backfill here
+    op.create_table(
+        'trip_hourly_sketch',
+        sa.Column('hour_bucket', sa.DateTime(), nullable=False),
+        sa.Column('trip_count', sa.BigInteger(), nullable=False),
+        sa.Column('routes', sa.LargeBinary(), nullable=True),
+        sa.Column('durations', sa.LargeBinary(), nullable=True),
+        sa.Column('distances', sa.LargeBinary(), nullable=True),
+        sa.Column('hot_routes', sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint('hour_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('trip_hourly_sketch')
@@ -0,0 +1,75 @@
+"""Load-test the trip endpoints at increasing client concurrency.
+
+Fires a fixed number of requests per concurrency level and reports
+throughput and latency percentiles. To compare the sync and async data
+layers, run it once against a server built from the previous release and
+once against the current one, with the same database and arguments.
+
+Usage:
+    python -m benchmarks.bench_api_load --url http://localhost:8000 \\
+        --concurrency 50 200 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+import httpx
+
+PATHS = [
+    "/api/v1/trips/?limit=100&start_date=2016-03-01T00:00:00",
+    "/api/v1/trips/stats?start_date=2016-03-01T00:00:00&end_date=2016-03-08T00:00:00"
+]
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int) -> dict:
+    """Run ``total`` requests with ``concurrency`` clients in flight."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(total))
+    
+    async def worker() -> None:
+        nonlocal errors
+        for index in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(PATHS[index % len(PATHS)])
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors
+    }
+
+async def main(url: str, levels: List[int], total: int) -> None:
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        # Warm up connection pools on both sides
+        await run_level(client, min(levels), min(levels) * 2)
+        
+        print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+        for concurrency in levels:
+            result = await run_level(client, concurrency, total)
+            print(
+                f"{result['concurrency']:>8} {result['requests_per_second']:>10.1f} "
+                f"{result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} {result['errors']:>8}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.concurrency, args.requests))
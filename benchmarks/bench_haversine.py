@@ -0,0 +1,65 @@
+"""Benchmark the scalar and vectorized haversine distance functions.
+
+Computes the distance from one point to N random pickups in New York with
+GeoUtils.calculate_distance in a loop and with GeoUtils.haversine_array in
+one call, then times the grid-cell pruning used by /trips/nearby.
+
+Usage:
+    python -m benchmarks.bench_haversine --points 1000000
+"""
+import argparse
+import time
+import numpy as np
+from src.utils.geo import GeoUtils
+
+CENTER = (40.7545, -73.9876)
+
+def timed(function, repeat: int):
+    """Best wall time of several runs, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--radius-m", type=float, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    bounds = GeoUtils.NYC_BOUNDS
+    latitudes = rng.uniform(bounds['min_latitude'], bounds['max_latitude'], args.points)
+    longitudes = rng.uniform(bounds['min_longitude'], bounds['max_longitude'], args.points)
+
+    scalar_seconds, scalar = timed(
+        lambda: [GeoUtils.calculate_distance(CENTER, point) for point in zip(latitudes.tolist(), longitudes.tolist())],
+        1
+    )
+    vector_seconds, vector = timed(
+        lambda: GeoUtils.haversine_array(CENTER[0], CENTER[1], latitudes, longitudes),
+        args.repeat
+    )
+    assert np.allclose(scalar, vector)
+
+    print(f"{args.points:,} points")
+    print(f"  scalar:     {scalar_seconds * 1000:10.1f} ms")
+    print(f"  vectorized: {vector_seconds * 1000:10.1f} ms ({scalar_seconds / vector_seconds:.0f}x)")
+
+    # Cell pruning: only trips in cells around the point need a distance
+    cells = GeoUtils.grid_cell(latitudes, longitudes)
+    nearby_cells = np.array(GeoUtils.cells_in_radius(CENTER[0], CENTER[1], args.radius_m / 1000))
+    prune_seconds, candidates = timed(lambda: np.flatnonzero(np.isin(cells, nearby_cells)), args.repeat)
+    refine_seconds, within = timed(
+        lambda: GeoUtils.haversine_array(CENTER[0], CENTER[1], latitudes[candidates], longitudes[candidates]) <= args.radius_m / 1000,
+        args.repeat
+    )
+    assert within.sum() == (vector <= args.radius_m / 1000).sum()
+    print(f"  {len(nearby_cells)} cells within {args.radius_m:.0f} m: {len(candidates):,} candidates, {within.sum():,} in range")
+    print(f"  pruned refine: {refine_seconds * 1000:10.3f} ms (cell filter {prune_seconds * 1000:.1f} ms, done by the index in the database)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark hourly analytics from SQL against the in-memory hot trip store.
+
+Loads N synthetic trips spread over a window into a SQLite file, then times
+loading the store from the database against mapping a published snapshot,
+and AnalyticsService.get_hourly_distribution and get_peak_hours with and
+without a loaded HotTripStore.
+
+Usage:
+    python -m benchmarks.bench_hot_store --trips 1000000 --days 30
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.data.hot_store import ROW_BYTES, HotTripStore
+from src.data.snapshot import TripSnapshots
+from src.database.models import Base, TaxiTrip
+from src.services.analytics_service import AnalyticsService
+
+# Peak hours are measured back from the current time
+NOW = datetime.now().replace(microsecond=0)
+
+async def timed(function, repeat: int):
+    """Best wall time of several awaited runs, and the last result."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def populate(path: Path, trips: int, days: int) -> None:
+    """Write synthetic trips picked up in the ``days`` before NOW."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        'id': [f'id{i}' for i in range(trips)],
+        'vendor_id': rng.integers(1, 3, trips),
+        'pickup_datetime': NOW - pd.to_timedelta(rng.integers(1, days * 86400, trips), unit='s'),
+        'dropoff_datetime': NOW,
+        'passenger_count': rng.integers(1, 5, trips),
+        'pickup_latitude': rng.uniform(40.70, 40.80, trips),
+        'pickup_longitude': rng.uniform(-74.02, -73.93, trips),
+        'dropoff_latitude': rng.uniform(40.70, 40.80, trips),
+        'dropoff_longitude': rng.uniform(-74.02, -73.93, trips),
+        'trip_duration': rng.integers(60, 3600, trips)
+    }).to_sql(TaxiTrip.__tablename__, engine, if_exists='append', index=False, chunksize=50000)
+    engine.dispose()
+
+async def run(path: Path, args: argparse.Namespace) -> None:
+    store = HotTripStore(window=timedelta(days=args.days))
+    engine = create_engine(f"sqlite:///{path}")
+    session = sessionmaker(bind=engine)()
+    started = time.perf_counter()
+    store.load(session)
+    load_seconds = time.perf_counter() - started
+    session.close()
+    engine.dispose()
+    print(f"{store.row_count:,} trips loaded in {load_seconds:.1f} s ({store.row_count * ROW_BYTES / 2 ** 20:.0f} MiB)")
+
+    # Worker startup from a published snapshot instead of the database
+    snapshots = TripSnapshots(str(path.parent / "snapshots"))
+    engine = create_engine(f"sqlite:///{path}")
+    session = sessionmaker(bind=engine)()
+    store.export(session, snapshots)
+    session.close()
+    engine.dispose()
+    worker = HotTripStore(window=timedelta(days=args.days))
+    started = time.perf_counter()
+    worker.load_snapshot(snapshots)
+    print(f"  snapshot mapped in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    db = sessionmaker(bind=async_engine, class_=AsyncSession)()
+    sql = AnalyticsService(db, None)
+    memory = AnalyticsService(db, None, hot_store=store)
+    start = NOW - timedelta(days=args.days - 1)
+    peak_days = min(7, args.days - 1)
+
+    for name, query in (
+        (f"hourly distribution, {args.days - 1} days", lambda service: service.get_hourly_distribution(start, NOW)),
+        (f"peak hours, {peak_days} days", lambda service: service.get_peak_hours(peak_days))
+    ):
+        sql_seconds, sql_result = await timed(lambda: query(sql), args.repeat)
+        store_seconds, store_result = await timed(lambda: query(memory), args.repeat)
+        assert sql_result == store_result
+        print(f"  {name}")
+        print(f"    sql:   {sql_seconds * 1000:10.1f} ms")
+        print(f"    store: {store_seconds * 1000:10.1f} ms ({sql_seconds / store_seconds:.0f}x)")
+
+    await db.close()
+    await async_engine.dispose()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trips", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "trips.db"
+        populate(path, args.trips, args.days)
+        asyncio.run(run(path, args))
+
+if __name__ == "__main__":
+    main()
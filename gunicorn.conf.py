@@ -0,0 +1,53 @@
+"""Gunicorn configuration for serving the API with several worker processes.
+
+Usage:
+    gunicorn -c gunicorn.conf.py main:app
+
+Each worker is a uvicorn event loop. The worker count, preload and timeouts
+come from the WEB_* settings. Send HUP to the master to replace the workers
+gracefully, e.g. after a configuration change. Without WEB_PRELOAD the
+new workers also load new code.
+"""
+import os
+import shutil
+import tempfile
+
+# Must be set before prometheus_client is imported by the master or a worker
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "taxi-service-metrics")
+)
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+bind = f"{settings.WEB_HOST}:{settings.WEB_PORT}"
+workers = settings.WEB_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = settings.WEB_PRELOAD
+timeout = settings.WEB_TIMEOUT
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS // 10
+keepalive = 5
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's totals
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def when_ready(server):
+    if settings.ENABLE_METRICS:
+        from src.monitoring.metrics import start_metrics_server
+        start_metrics_server(settings.PROMETHEUS_PORT)
+        server.log.info(f"Serving metrics of all workers on port {settings.PROMETHEUS_PORT}")
+
+def post_fork(server, worker):
+    # With preload, anything the master created is rebuilt per worker
+    from src.api.dependencies import reset_after_fork
+    reset_after_fork()
+
+def child_exit(server, worker):
+    from src.monitoring.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -1,74 +1,150 @@
 """Main application entry point."""
-from src.database.models import Base
-import uvicorn
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.graphql import GraphQLApp
+from fastapi.responses import JSONResponse
 from src.api.rest import router as rest_router
-from src.database.connection import DatabaseManager
-from src.api.graphql import schema
-from src.config.settings import Settings
-from src.cache.redis_manager import RedisManager
+from src.database.session import get_db_manager
+from src.api.graphql import execute_request
+from src.api.analytics import CACHE_PREFIX as ANALYTICS_CACHE_PREFIX, router as analytics_router
+from src.api.health import router as health_router
+from src.api.metrics import router as metrics_router
+from src.api.dependencies import (
+    get_settings,
+    get_redis_manager,
+    get_rate_limiter,
+    get_cache_service,
+    get_hot_store,
+    get_trip_snapshots
+)
+from src.data.ingestion import add_commit_listener, add_run_listener, remove_commit_listener, remove_run_listener
 from src.middleware.error_handler import error_handler
-from src.middleware.rate_limiter import RateLimiter
-from src.auth.jwt_handler import JWTHandler
+from src.middleware.metrics import MetricsMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from src.api.docs import custom_openapi
 
-# Initialize settings and services
-settings = Settings()
-db_manager = DatabaseManager(settings.DATABASE_URL)
-redis_manager = RedisManager(settings)
-rate_limiter = RateLimiter(redis_manager, settings.RATE_LIMIT_PER_MINUTE)
-
-# Create database tables
-Base.metadata.create_all(bind=db_manager.engine)
-
-# Initialize FastAPI application
-app = FastAPI(
-    title="NYC Taxi Trip Data Service",
-    description="API service for analyzing NYC taxi trip data",
-    version="1.0.0",
-    docs_url=None,
-    redoc_url=None
-)
-
-# Custom API documentation
-app.openapi = lambda: custom_openapi(app)
+# Rate limiting dependency
+async def check_rate_limit(request: Request):
+    await get_rate_limiter().check_rate_limit(request)
 
-@app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui_html():
-    return get_swagger_ui_html(
-        openapi_url="/openapi.json",
-        title="NYC Taxi Trip Data Service - API Documentation",
-        swagger_favicon_url="/static/favicon.ico"
-    )
+def invalidate_cache(chunk) -> None:
+    # Newly ingested trips make every cached result stale
+    get_cache_service().invalidate_threadsafe()
 
-# Add middleware
-app.middleware("http")(error_handler)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def invalidate_analytics() -> None:
+    # Results computed from a worker's stale hot store may be shared in
+    # Redis, so each reload drops them for every worker
+    get_cache_service().invalidate_threadsafe(ANALYTICS_CACHE_PREFIX)
 
-# Rate limiting dependency
-async def check_rate_limit(request: Request):
-    await rate_limiter.check_rate_limit(request)
+async def startup() -> None:
+    """Start background tasks; connections are still opened on first use."""
+    settings = get_settings()
+    await get_cache_service().start_invalidation_listener()
+    add_commit_listener(invalidate_cache)
+    
+    hot_store = get_hot_store()
+    if hot_store is not None:
+        snapshots = get_trip_snapshots()
+        add_commit_listener(hot_store.append)
+        hot_store.on_replace = invalidate_analytics
+        if snapshots is not None:
+            add_run_listener(hot_store.request_export)
+        hot_store.start_refresh(
+            get_db_manager().get_session,
+            settings.HOT_STORE_REFRESH_SECONDS,
+            snapshots,
+            settings.HOT_STORE_SNAPSHOT_POLL_SECONDS
+        )
 
-# Include routers
-app.include_router(rest_router, prefix="/api/v1")
+async def shutdown() -> None:
+    """Stop background tasks and close every pooled connection."""
+    remove_commit_listener(invalidate_cache)
+    await get_cache_service().stop_invalidation_listener()
+    
+    hot_store = get_hot_store()
+    if hot_store is not None:
+        remove_commit_listener(hot_store.append)
+        hot_store.on_replace = None
+        remove_run_listener(hot_store.request_export)
+        await hot_store.stop_refresh()
+    
+    await get_db_manager().dispose()
+    await get_redis_manager().close()
 
-# Remove the direct route addition with dependencies
-# Instead, create a dependency-protected endpoint that serves GraphQL
+def create_app() -> FastAPI:
+    """
+    Build the application.
+    
+    Nothing here reads the database or Redis: settings, engines, pools and
+    clients are created on first use, and background tasks are started by
+    the startup hook, so importing this module is cheap and works while the
+    database is unreachable.
+    """
+    app = FastAPI(
+        title="NYC Taxi Trip Data Service",
+        description="API service for analyzing NYC taxi trip data",
+        version="1.0.0",
+        docs_url=None,
+        redoc_url=None,
+        on_startup=[startup],
+        on_shutdown=[shutdown]
+    )
+    
+    # Custom API documentation
+    app.openapi = lambda: custom_openapi(app)
+    
+    @app.get("/docs", include_in_schema=False)
+    async def custom_swagger_ui_html():
+        return get_swagger_ui_html(
+            openapi_url="/openapi.json",
+            title="NYC Taxi Trip Data Service - API Documentation",
+            swagger_favicon_url="/static/favicon.ico"
+        )
+    
+    # Add middleware
+    app.middleware("http")(error_handler)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    if get_settings().ENABLE_METRICS:
+        # Outermost, so its time covers error handling and CORS too
+        app.add_middleware(MetricsMiddleware)
+    
+    # Include routers; health checks and metrics are not rate limited
+    app.include_router(health_router)
+    if get_settings().ENABLE_METRICS:
+        app.include_router(metrics_router)
+    app.include_router(rest_router, prefix="/api/v1", dependencies=[Depends(check_rate_limit)])
+    app.include_router(
+        analytics_router,
+        prefix="/api/v1/analytics",
+        dependencies=[Depends(check_rate_limit)]
+    )
+    
+    # Remove the direct route addition with dependencies
+    # Instead, create a dependency-protected endpoint that serves GraphQL
+    
+    @app.post("/graphql")
+    @app.get("/graphql")
+    async def graphql_endpoint(request: Request):
+        await check_rate_limit(request)
+        if request.method == "POST":
+            payload = await request.json()
+        else:
+            payload = dict(request.query_params)
+        
+        async with get_db_manager().get_async_session() as db:
+            response, status_code = await execute_request(payload, {"request": request, "db": db})
+        return JSONResponse(response, status_code=status_code)
+    
+    return app
 
-@app.post("/graphql")
-@app.get("/graphql")
-async def graphql_endpoint(request: Request):
-    await check_rate_limit(request)
-    return await GraphQLApp(schema=schema)(request)
+app = create_app()
 
+# Single process for development; gunicorn.conf.py runs several workers
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,265 @@
+"""Analytics API endpoints."""
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Any, Callable, List, Optional, Tuple
+from datetime import date, datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import json
+from ..data.rollup import HourlyRollup
+from ..services.analytics_service import (
+    AnalyticsService, DEFAULT_DISTANCE_BINS_KM, DEFAULT_SUMMARY_PERCENTILES, MAX_PEAK_HOURS_DAYS
+)
+from ..services.cache_service import CacheService
+from ..utils.validation import ValidationUtils
+from .dependencies import get_cache_service, get_hot_store, get_session_factory, get_settings
+
+router = APIRouter()
+
+CACHE_PREFIX = "analytics"
+MAX_DISTANCE_BINS = 100
+
+async def query_analytics(
+    cache: CacheService,
+    session_factory: Callable[[], AsyncSession],
+    name: str,
+    *args: Any
+) -> Any:
+    """
+    Run an ``AnalyticsService`` method through the result cache.
+    
+    The session is only opened on a cache miss, so hits never touch the
+    database.
+    
+    Args:
+        cache: Cache the result is stored in
+        session_factory: Opens the session used on a miss
+        name: Name of the ``AnalyticsService`` method
+        args: Method arguments, which also make up the cache key
+    
+    Returns:
+        The result after a JSON round trip
+    """
+    settings = get_settings()
+    
+    async def load(*args):
+        async with session_factory() as db:
+            service = AnalyticsService(
+                db,
+                cache.redis,
+                use_rollup=settings.USE_ROLLUP,
+                hot_store=get_hot_store()
+            )
+            return await getattr(service, name)(*args)
+    
+    load.__name__ = name
+    return await cache.cached(CACHE_PREFIX, settings.ANALYTICS_CACHE_TTL)(load)(*args)
+
+def etag_response(request: Request, payload: Any) -> Response:
+    """
+    Build a JSON response with an ETag, or a 304 if the client has it.
+    
+    The ETag is a hash of the body, so every worker produces the same tag
+    for the same aggregate.
+    """
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    etag = f'"{hashlib.sha256(body.encode()).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={get_settings().ANALYTICS_MAX_AGE}"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def parse_floats(value: str, name: str) -> List[float]:
+    """Parse a comma-separated list of numbers."""
+    try:
+        return [float(item) for item in value.split(",")]
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{name} must be a comma-separated list of numbers"
+        )
+
+def distance_spec(
+    bin_edges: Optional[List[float]] = None,
+    percentiles: Optional[List[float]] = None
+) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    """
+    Validate and normalize a histogram spec, so equal specs share a cache key.
+    
+    Raises:
+        HTTPException: If the edges are not increasing or a percentile is
+            outside 0-100
+    """
+    bin_edges = tuple(float(edge) for edge in (bin_edges or DEFAULT_DISTANCE_BINS_KM))
+    percentiles = tuple(sorted(set(float(p) for p in (percentiles or ()))))
+    if len(bin_edges) > MAX_DISTANCE_BINS or any(a >= b for a, b in zip(bin_edges, bin_edges[1:])):
+        raise HTTPException(
+            status_code=400,
+            detail=f"bins must be at most {MAX_DISTANCE_BINS} increasing edges"
+        )
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise HTTPException(
+            status_code=400,
+            detail="percentiles must be between 0 and 100"
+        )
+    return bin_edges, percentiles
+
+def percentile_spec(percentiles: Optional[List[float]] = None) -> Tuple[float, ...]:
+    """
+    Validate and normalize summary percentiles, so equal lists share a cache key.
+    
+    Whole percentiles become ints, so results are keyed ``p50`` rather
+    than ``p50.0``.
+    
+    Raises:
+        HTTPException: If a percentile is outside 0-100
+    """
+    values = sorted(set(float(p) for p in (percentiles or DEFAULT_SUMMARY_PERCENTILES)))
+    if any(not 0 <= p <= 100 for p in values):
+        raise HTTPException(
+            status_code=400,
+            detail="percentiles must be between 0 and 100"
+        )
+    return tuple(int(p) if p.is_integer() else p for p in values)
+
+def route_spec(
+    resolution: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[int, Optional[date], Optional[date]]:
+    """
+    Validate the grid resolution and day range of a popular-routes query.
+    
+    Raises:
+        HTTPException: If the resolution is not kept in the route matrix or
+            the range ends before it starts
+    """
+    resolutions = sorted(get_settings().ROUTE_RESOLUTIONS)
+    resolution = resolutions[-1] if resolution is None else resolution
+    if resolution not in resolutions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"resolution must be one of {resolutions}"
+        )
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=400,
+            detail="start_date must be before end_date"
+        )
+    return resolution, start_date, end_date
+
+@router.get("/hourly-distribution")
+async def get_hourly_distribution(
+    request: Request,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cache: CacheService = Depends(get_cache_service),
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Get trip counts by hour of day.
+    
+    The range is widened to whole hours, so requests a few minutes apart
+    share a cache entry.
+    """
+    ValidationUtils.validate_date_range(start_date, end_date)
+    start_date, end_date = HourlyRollup.canonical_range(start_date, end_date)
+    distribution = await query_analytics(
+        cache, session_factory, "get_hourly_distribution", start_date, end_date
+    )
+    return etag_response(request, distribution)
+
+@router.get("/peak-hours")
+async def get_peak_hours(
+    request: Request,
+    days: int = 7,
+    cache: CacheService = Depends(get_cache_service),
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Get trip counts by day of week and hour over the last N days."""
+    ValidationUtils.validate_positive_int(days, "days", MAX_PEAK_HOURS_DAYS)
+    peak_hours = await query_analytics(cache, session_factory, "get_peak_hours", days)
+    return etag_response(request, peak_hours)
+
+@router.get("/popular-routes")
+async def get_popular_routes(
+    request: Request,
+    limit: int = 10,
+    min_trips: int = 5,
+    resolution: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    vendor_id: Optional[int] = None,
+    cache: CacheService = Depends(get_cache_service),
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Get the most travelled routes between grid cells.
+    
+    ``resolution`` picks one of the configured ``ROUTE_RESOLUTIONS``
+    (the finest by default); lower resolutions give larger cells. The
+    dates are whole pickup days, inclusive.
+    """
+    ValidationUtils.validate_positive_int(limit, "limit")
+    ValidationUtils.validate_positive_int(min_trips, "min_trips")
+    resolution, start_date, end_date = route_spec(resolution, start_date, end_date)
+    routes = await query_analytics(
+        cache, session_factory, "get_popular_routes",
+        limit, min_trips, resolution, start_date, end_date, vendor_id
+    )
+    return etag_response(request, routes)
+
+@router.get("/distance-distribution")
+async def get_distance_distribution(
+    request: Request,
+    bins: Optional[str] = None,
+    percentiles: Optional[str] = None,
+    cache: CacheService = Depends(get_cache_service),
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Get a histogram of trip distances.
+    
+    ``bins`` is a comma-separated list of increasing edges in kilometers
+    and ``percentiles`` a comma-separated list of percentiles, e.g.
+    ``bins=0,1,2,5,10&percentiles=50,90,99``. Each combination is cached
+    separately.
+    """
+    bin_edges, percentile_values = distance_spec(
+        parse_floats(bins, "bins") if bins else None,
+        parse_floats(percentiles, "percentiles") if percentiles else None
+    )
+    distribution = await query_analytics(
+        cache, session_factory, "get_distance_distribution", bin_edges, percentile_values
+    )
+    return etag_response(request, distribution)
+
+@router.get("/trip-summary")
+async def get_trip_summary(
+    request: Request,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    percentiles: Optional[str] = None,
+    top_routes: int = 10,
+    approximate: bool = False,
+    cache: CacheService = Depends(get_cache_service),
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Get trip counts, distinct routes, duration and distance percentiles and hot routes.
+    
+    With ``approximate=true`` the summary is merged from hourly sketches,
+    which answers ranges of months in a fraction of the time of the exact
+    scan at about 1% error. The range is widened to whole hours.
+    """
+    ValidationUtils.validate_date_range(start_date, end_date)
+    ValidationUtils.validate_positive_int(top_routes, "top_routes")
+    start_date, end_date = HourlyRollup.canonical_range(start_date, end_date)
+    percentile_values = percentile_spec(parse_floats(percentiles, "percentiles") if percentiles else None)
+    summary = await query_analytics(
+        cache, session_factory, "get_trip_summary",
+        start_date, end_date, percentile_values, top_routes, approximate
+    )
+    return etag_response(request, summary)
@@ -0,0 +1,49 @@
+"""Request-scoped batching of GraphQL lookups."""
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class DataLoader(Generic[K, V]):
+    """Collects the keys loaded while resolving a query and fetches them at once.
+    
+    Resolvers for each item of a list run concurrently; every ``load`` made
+    before the event loop gets back to the loader is answered by a single
+    call to ``batch_load``. Results are memoized, so a loader must only live
+    for one request.
+    """
+    
+    def __init__(self, batch_load: Callable[[List[K]], Awaitable[Dict[K, V]]]):
+        """
+        Args:
+            batch_load: Fetches values for a list of keys, returning them by
+                key; keys without a value resolve to None
+        """
+        self.batch_load = batch_load
+        self._futures: Dict[K, asyncio.Future] = {}
+        self._queue: List[K] = []
+    
+    def load(self, key: K) -> "asyncio.Future[V]":
+        """Schedule a key to be fetched with the current batch."""
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+    
+    async def _dispatch(self) -> None:
+        """Fetch every queued key with one ``batch_load`` call."""
+        keys, self._queue = self._queue, []
+        try:
+            values = await self.batch_load(keys)
+        except Exception as e:
+            for key in keys:
+                self._futures.pop(key).set_exception(e)
+            return
+        for key in keys:
+            self._futures[key].set_result(values.get(key))
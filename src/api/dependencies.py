@@ -0,0 +1,99 @@
+"""Shared service providers for the API layer.
+
+Each provider builds its object on first use and returns the same instance
+afterwards, so routers can depend on them without import-time side
+effects, and tests can swap them with ``app.dependency_overrides``.
+"""
+from datetime import timedelta
+from functools import lru_cache
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..cache.local_cache import LocalCache
+from ..cache.redis_manager import RedisManager
+from ..config.settings import get_settings
+from ..data.hot_store import HotTripStore
+from ..data.snapshot import TripSnapshots
+from ..database.session import get_db_manager
+from ..middleware.rate_limiter import RateLimiter
+from ..services.cache_service import CacheService
+from ..services.ingestion_job_service import IngestionJobService
+
+@lru_cache()
+def get_redis_manager() -> RedisManager:
+    """Pooled Redis client."""
+    return RedisManager(get_settings())
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """Redis-backed request rate limiter."""
+    settings = get_settings()
+    return RateLimiter(
+        get_redis_manager(),
+        settings.RATE_LIMIT_PER_MINUTE,
+        route_limits=settings.RATE_LIMIT_ROUTES
+    )
+
+@lru_cache()
+def get_cache_service() -> CacheService:
+    """Two-tier result cache."""
+    settings = get_settings()
+    return CacheService(
+        get_redis_manager(),
+        LocalCache(
+            max_entries=settings.CACHE_L1_MAX_ENTRIES,
+            max_bytes=settings.CACHE_L1_MAX_BYTES,
+            default_ttl=settings.CACHE_L1_TTL
+        ),
+        stale_ttl=settings.CACHE_STALE_TTL,
+        lock_timeout=settings.CACHE_LOCK_TIMEOUT,
+        early_expiry_beta=settings.CACHE_EARLY_EXPIRY_BETA
+    )
+
+@lru_cache()
+def get_hot_store() -> Optional[HotTripStore]:
+    """In-memory store of recent trips, or None when disabled."""
+    settings = get_settings()
+    if not settings.HOT_STORE_ENABLED:
+        return None
+    return HotTripStore(
+        window=timedelta(days=settings.HOT_STORE_WINDOW_DAYS),
+        max_bytes=settings.HOT_STORE_MAX_BYTES
+    )
+
+@lru_cache()
+def get_trip_snapshots() -> Optional[TripSnapshots]:
+    """Snapshot directory for the hot trip store, or None when not configured."""
+    settings = get_settings()
+    if not settings.HOT_STORE_SNAPSHOT_DIR:
+        return None
+    return TripSnapshots(settings.HOT_STORE_SNAPSHOT_DIR)
+
+@lru_cache()
+def get_job_service() -> IngestionJobService:
+    """Background ingestion jobs of this process."""
+    return IngestionJobService(get_db_manager().get_session)
+
+def get_session_factory() -> Callable[[], AsyncSession]:
+    """Factory for async sessions not tied to a single request."""
+    return get_db_manager().get_async_session
+
+def reset_after_fork() -> None:
+    """
+    Forget the per-process objects inherited from a forking parent.
+    
+    Called in each gunicorn worker after fork, so pools, clients, caches
+    and rate-limit buckets created in the master are rebuilt in the worker
+    instead of being shared with it.
+    """
+    if get_db_manager.cache_info().currsize:
+        get_db_manager().reset_after_fork()
+    for provider in (
+        get_db_manager,
+        get_redis_manager,
+        get_rate_limiter,
+        get_cache_service,
+        get_hot_store,
+        get_trip_snapshots,
+        get_job_service
+    ):
+        provider.cache_clear()
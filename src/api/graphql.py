@@ -1,11 +1,39 @@
 """GraphQL API schema and resolvers."""
+import hashlib
+import json
+import math
+from inspect import isawaitable
+from typing import Optional, Set, Tuple
 import graphene
 from graphene import ObjectType, String, Int, Float, DateTime, List
-from ..services.trip_service import TripService
+from graphene.utils.str_converters import to_snake_case
+from fastapi import HTTPException
+from graphql import (
+    DocumentNode, FieldNode, FragmentSpreadNode, GraphQLError, InlineFragmentNode,
+    execute, parse, validate
+)
+from ..cache.local_cache import LocalCache, MISSING
+from ..data.rollup import HourlyRollup
+from ..database.models import TaxiTrip
+from ..services.analytics_service import MAX_PEAK_HOURS_DAYS
+from ..services.trip_service import MAX_PAGE_SIZE, TripService
+from ..utils.validation import ValidationUtils
+from .analytics import distance_spec, percentile_spec, query_analytics, route_spec
+from .dataloader import DataLoader
+from .dependencies import get_cache_service, get_session_factory, get_settings
+
+# Trip columns needed by fields that are not columns themselves
+FIELD_COLUMNS = {"vendor": ["vendor_id"]}
+
+class VendorType(ObjectType):
+    """Trip totals for a vendor."""
+    id = Int()
+    total_trips = Int()
+    average_duration = Float()
 
 class TaxiTripType(ObjectType):
     """GraphQL type for taxi trips."""
-    id = Int()
+    id = String()
     vendor_id = String()
     pickup_datetime = DateTime()
     dropoff_datetime = DateTime()
@@ -15,16 +43,309 @@ class TaxiTripType(ObjectType):
     dropoff_longitude = Float()
     dropoff_latitude = Float()
     trip_duration = Int()
+    vendor = graphene.Field(VendorType)
+    
+    async def resolve_vendor(parent, info):
+        if parent.get("vendor_id") is None:
+            return None
+        return await vendor_loader(info).load(parent["vendor_id"])
+
+class HourCountType(ObjectType):
+    """Trip count for an hour of the day."""
+    hour = Int()
+    trip_count = Int()
+
+class PeakHourType(ObjectType):
+    """Trip count for an hour of a day of the week."""
+    day_of_week = Int()
+    hour = Int()
+    trip_count = Int()
+
+class PointType(ObjectType):
+    """Geographic point."""
+    lat = Float()
+    lng = Float()
+
+class RouteType(ObjectType):
+    """Route between the centers of a pickup and a dropoff grid cell."""
+    pickup = graphene.Field(PointType)
+    dropoff = graphene.Field(PointType)
+    # Cell ids do not fit in a 32-bit GraphQL Int
+    pickup_cell = String()
+    dropoff_cell = String()
+    trip_count = Int()
+    avg_duration = Float()
+
+class DistanceBucketType(ObjectType):
+    """Trip count for a range of trip distances; open-ended bins have a null bound."""
+    min_km = Float()
+    max_km = Float()
+    count = Int()
+
+class DistancePercentileType(ObjectType):
+    """Trip distance at a percentile."""
+    percentile = Float()
+    distance_km = Float()
+
+class DistanceDistributionType(ObjectType):
+    """Histogram and percentiles of trip distances."""
+    bins = List(DistanceBucketType)
+    percentiles = List(DistancePercentileType)
+
+class PercentileValueType(ObjectType):
+    """Value at a percentile."""
+    percentile = Float()
+    value = Float()
+
+def percentile_values(percentiles: dict) -> list:
+    """Turn ``MetricsUtils.calculate_percentiles`` output into a list."""
+    return [{"percentile": float(key[1:]), "value": value} for key, value in percentiles.items()]
+
+class TripSummaryType(ObjectType):
+    """Trip summary for a range, exact or merged from hourly sketches."""
+    trip_count = Int()
+    distinct_routes = Int()
+    duration_percentiles = List(PercentileValueType)
+    distance_percentiles = List(PercentileValueType)
+    hot_routes = List(RouteType)
+    approximate = graphene.Boolean()
+    
+    def resolve_duration_percentiles(parent, info):
+        return percentile_values(parent["duration_percentiles"])
+    
+    def resolve_distance_percentiles(parent, info):
+        return percentile_values(parent["distance_percentiles"])
+
+def vendor_loader(info) -> DataLoader:
+    """The request's vendor loader, so every trip's vendor is fetched in one query."""
+    loader = info.context.get("vendor_loader")
+    if loader is None:
+        service = TripService(info.context["db"], use_rollup=get_settings().USE_ROLLUP)
+        loader = info.context["vendor_loader"] = DataLoader(service.get_vendor_stats)
+    return loader
+
+def selected_fields(info) -> Set[str]:
+    """Names of the fields selected below the current field, fragments included."""
+    names = set()
+    
+    def collect(selection_set) -> None:
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                names.add(to_snake_case(selection.name.value))
+            elif isinstance(selection, InlineFragmentNode):
+                collect(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                collect(info.fragments[selection.name.value].selection_set)
+    
+    for node in info.field_nodes:
+        if node.selection_set is not None:
+            collect(node.selection_set)
+    return names
+
+def trip_columns(info) -> list:
+    """Trip columns needed to resolve the selected fields."""
+    columns = []
+    for name in selected_fields(info):
+        if name in TaxiTrip.__table__.c:
+            columns.append(name)
+        columns.extend(FIELD_COLUMNS.get(name, []))
+    return columns
+
+def analytics(info, name, *args):
+    """Run a cached analytics query; the context may supply the cache and sessions."""
+    return query_analytics(
+        info.context.get("cache") or get_cache_service(),
+        info.context.get("session_factory") or get_session_factory(),
+        name,
+        *args
+    )
 
 class Query(ObjectType):
     """GraphQL query definitions."""
-    trips = List(TaxiTripType, 
-                start_date=DateTime(), 
+    trips = List(TaxiTripType,
+                start_date=DateTime(),
                 end_date=DateTime(),
                 limit=Int(default_value=100))
+    hourly_distribution = List(HourCountType, start_date=DateTime(), end_date=DateTime())
+    peak_hours = List(PeakHourType, days=Int(default_value=7))
+    popular_routes = List(
+        RouteType,
+        limit=Int(default_value=10),
+        min_trips=Int(default_value=5),
+        resolution=Int(),
+        start_date=graphene.Date(),
+        end_date=graphene.Date(),
+        vendor_id=Int()
+    )
+    distance_distribution = graphene.Field(
+        DistanceDistributionType,
+        bin_edges=List(Float),
+        percentiles=List(Float)
+    )
+    trip_summary = graphene.Field(
+        TripSummaryType,
+        start_date=DateTime(),
+        end_date=DateTime(),
+        percentiles=List(Float),
+        top_routes=Int(default_value=10),
+        approximate=graphene.Boolean(default_value=False)
+    )
     
-    def resolve_trips(self, info, start_date=None, end_date=None, limit=100):
+    async def resolve_trips(self, info, start_date=None, end_date=None, limit=100):
+        try:
+            ValidationUtils.validate_positive_int(limit, "limit", MAX_PAGE_SIZE)
+        except HTTPException as error:
+            raise GraphQLError(error.detail)
         service = TripService(info.context["db"])
-        return service.get_trips(start_date, end_date, limit)
+        return await service.get_trip_rows(start_date, end_date, limit, trip_columns(info))
+    
+    async def resolve_hourly_distribution(self, info, start_date=None, end_date=None):
+        start_date, end_date = HourlyRollup.canonical_range(start_date, end_date)
+        distribution = await analytics(info, "get_hourly_distribution", start_date, end_date)
+        return [
+            {"hour": int(hour), "trip_count": count}
+            for hour, count in distribution.items()
+        ]
+    
+    async def resolve_peak_hours(self, info, days=7):
+        try:
+            ValidationUtils.validate_positive_int(days, "days", MAX_PEAK_HOURS_DAYS)
+        except HTTPException as error:
+            raise GraphQLError(error.detail)
+        return await analytics(info, "get_peak_hours", days)
+    
+    async def resolve_popular_routes(
+        self, info, limit=10, min_trips=5, resolution=None, start_date=None, end_date=None, vendor_id=None
+    ):
+        try:
+            spec = route_spec(resolution, start_date, end_date)
+        except HTTPException as error:
+            raise GraphQLError(error.detail)
+        return await analytics(info, "get_popular_routes", limit, min_trips, *spec, vendor_id)
+    
+    async def resolve_distance_distribution(self, info, bin_edges=None, percentiles=None):
+        try:
+            spec = distance_spec(bin_edges, percentiles)
+        except HTTPException as error:
+            raise GraphQLError(error.detail)
+        return await analytics(info, "get_distance_distribution", *spec)
+    
+    async def resolve_trip_summary(
+        self, info, start_date=None, end_date=None, percentiles=None, top_routes=10, approximate=False
+    ):
+        if top_routes < 1:
+            raise GraphQLError("top_routes must be a positive integer")
+        try:
+            spec = percentile_spec(percentiles)
+        except HTTPException as error:
+            raise GraphQLError(error.detail)
+        start_date, end_date = HourlyRollup.canonical_range(start_date, end_date)
+        return await analytics(info, "get_trip_summary", start_date, end_date, spec, top_routes, approximate)
+
+schema = graphene.Schema(query=Query)
 
-schema = graphene.Schema(query=Query)
\ No newline at end of file
+class PersistedQueryCache:
+    """Parsed and validated documents keyed by the SHA-256 of the query text.
+    
+    Repeated queries skip parsing and validation. Clients may also send
+    only the hash of a query the server has seen, following the automatic
+    persisted queries protocol, instead of the full text.
+    """
+    
+    def __init__(self, schema: graphene.Schema, max_entries: int = 512):
+        self.schema = schema
+        self.documents = LocalCache(max_entries=max_entries, default_ttl=math.inf)
+    
+    @staticmethod
+    def query_hash(query: str) -> str:
+        """Hex SHA-256 of a query, as sent by persisted-query clients."""
+        return hashlib.sha256(query.encode()).hexdigest()
+    
+    def lookup(self, query_hash: str) -> Optional[DocumentNode]:
+        """Get a previously prepared document by hash."""
+        document = self.documents.get(query_hash)
+        return None if document is MISSING else document
+    
+    def prepare(self, query: str) -> Tuple[Optional[DocumentNode], list]:
+        """
+        Parse and validate a query, or reuse the cached result.
+        
+        Only valid documents are cached.
+        
+        Returns:
+            tuple: (document or None, validation errors)
+        """
+        query_hash = self.query_hash(query)
+        document = self.lookup(query_hash)
+        if document is not None:
+            return document, []
+        
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            return None, [error]
+        errors = validate(self.schema.graphql_schema, document)
+        if errors:
+            return None, errors
+        self.documents.set(query_hash, document, len(query))
+        return document, []
+
+query_cache = PersistedQueryCache(schema)
+
+def _json_param(value):
+    """Decode a JSON-encoded GET parameter."""
+    return json.loads(value) if isinstance(value, str) else value
+
+async def execute_request(payload: dict, context: dict) -> Tuple[dict, int]:
+    """
+    Execute a GraphQL request body or query string.
+    
+    Args:
+        payload: ``query``, ``variables``, ``operationName`` and
+            ``extensions``; values may be JSON strings on GET
+        context: Resolver context, with the request's ``db`` session
+    
+    Returns:
+        tuple: (response body, HTTP status)
+    """
+    query = payload.get("query")
+    try:
+        variables = _json_param(payload.get("variables"))
+        extensions = _json_param(payload.get("extensions"))
+    except ValueError:
+        return {"errors": [{"message": "Variables and extensions must be JSON"}]}, 400
+    if not isinstance(variables, (dict, type(None))) or not isinstance(extensions, (dict, type(None))):
+        return {"errors": [{"message": "Variables and extensions must be JSON objects"}]}, 400
+    query_hash = ((extensions or {}).get("persistedQuery") or {}).get("sha256Hash")
+    
+    if query is None:
+        if query_hash is None:
+            return {"errors": [{"message": "Must provide query string."}]}, 400
+        document = query_cache.lookup(query_hash)
+        if document is None:
+            # Tells the client to retry with the full query text
+            return {"errors": [{
+                "message": "PersistedQueryNotFound",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}
+            }]}, 200
+    else:
+        if query_hash is not None and query_hash != query_cache.query_hash(query):
+            return {"errors": [{"message": "Provided sha does not match query"}]}, 400
+        document, errors = query_cache.prepare(query)
+        if errors:
+            return {"data": None, "errors": [error.formatted for error in errors]}, 400
+    
+    result = execute(
+        schema.graphql_schema,
+        document,
+        context_value=context,
+        variable_values=variables,
+        operation_name=payload.get("operationName")
+    )
+    if isawaitable(result):
+        result = await result
+    
+    response = {"data": result.data}
+    if result.errors:
+        response["errors"] = [error.formatted for error in result.errors]
+    return response, 400 if result.errors and result.data is None else 200
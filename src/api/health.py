@@ -0,0 +1,48 @@
+"""Liveness and readiness endpoints."""
+import asyncio
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from ..cache.redis_manager import RedisManager
+from ..database.session import DatabaseManager, get_db_manager
+from .dependencies import get_redis_manager
+
+router = APIRouter()
+
+# Readiness checks give up after this many seconds
+CHECK_TIMEOUT = 2.0
+
+@router.get("/health/live")
+async def liveness():
+    """The process is up and serving requests; never touches a dependency."""
+    return {"status": "ok"}
+
+@router.get("/health/ready")
+async def readiness(
+    db_manager: DatabaseManager = Depends(get_db_manager),
+    redis_manager: RedisManager = Depends(get_redis_manager)
+):
+    """
+    Whether this worker should receive traffic.
+    
+    Ready when the database answers and the async pool has a free
+    connection. Redis is reported but does not fail readiness: it is shared
+    by every worker, so taking them all out of rotation would not help, and
+    the trip endpoints work without it.
+    """
+    database_error = await db_manager.check(CHECK_TIMEOUT)
+    try:
+        redis_error = None if await asyncio.wait_for(redis_manager.ping(), CHECK_TIMEOUT) else "no reply"
+    except Exception as e:
+        redis_error = str(e) or type(e).__name__
+    
+    pool_exhausted = db_manager.pool_exhausted()
+    ready = database_error is None and not pool_exhausted
+    return JSONResponse(
+        {
+            "status": "ready" if ready else "unavailable",
+            "database": {"ok": database_error is None, "error": database_error},
+            "redis": {"ok": redis_error is None, "error": redis_error},
+            "pool": {"exhausted": pool_exhausted, **db_manager.pool_status()}
+        },
+        status_code=200 if ready else 503
+    )
@@ -0,0 +1,11 @@
+"""Prometheus scrape endpoint."""
+from fastapi import APIRouter, Response
+from ..monitoring.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Current metric values, totalled across workers in multiprocess mode."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
@@ -1,47 +1,162 @@
 """RESTful API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 from ..database.models import TaxiTrip
-from ..services.trip_service import TripService
-from ..data.ingestion import DataIngestionService
+from ..services.trip_service import MAX_PAGE_SIZE, TripService
+from ..services.spatial_service import SpatialService
+from ..data.ingestion import DataIngestionService, LOAD_MODES
+from ..data.export import TripExporter, EXPORT_FORMATS
+from ..data.rollup import HourlyRollup
+from ..data.route_matrix import RouteMatrix
+from ..data.sketch_rollup import HourlySketches
 from ..utils.validation import ValidationUtils
 import pandas as pd
-from ..database.session import get_db
+from ..database.session import get_db, get_async_db
+from ..database.partitions import PartitionManager
+from ..auth.jwt_handler import JWTHandler
+from ..config.settings import get_settings
+from .dependencies import get_job_service
 import os
 
 router = APIRouter()
 
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
 @router.get("/trips/")
 async def get_trips(
+    response: Response,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get taxi trips within a date range."""
+    """Get taxi trips within a date range.
+    
+    When more trips are available, the ``X-Next-Cursor`` response header
+    holds the cursor for the next page.
+    """
     ValidationUtils.validate_date_range(start_date, end_date)
+    ValidationUtils.validate_positive_int(limit, "limit", MAX_PAGE_SIZE)
     service = TripService(db)
-    return service.get_trips(start_date, end_date, limit)
+    trips, next_cursor = await service.get_trips_page(start_date, end_date, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return trips
+
+@router.get("/trips/stream")
+async def stream_trips(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    format: str = "ndjson",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream all trips in a date range as NDJSON or CSV."""
+    ValidationUtils.validate_date_range(start_date, end_date)
+    if format not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format '{format}'. Expected one of: {', '.join(STREAM_FORMATS)}"
+        )
+    
+    service = TripService(db)
+    return StreamingResponse(
+        service.stream_trips(start_date, end_date, format),
+        media_type=STREAM_FORMATS[format]
+    )
 
 @router.get("/trips/stats")
 async def get_trip_stats(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get statistical information about trips."""
     ValidationUtils.validate_date_range(start_date, end_date)
-    service = TripService(db)
-    return service.get_trip_stats(start_date, end_date)
+    service = TripService(db, use_rollup=get_settings().USE_ROLLUP)
+    return await service.get_trip_stats(start_date, end_date)
+
+@router.get("/trips/nearby")
+async def get_nearby_trips(
+    latitude: float,
+    longitude: float,
+    radius_m: float = 500,
+    limit: int = 100,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the trips picked up closest to a point, nearest first."""
+    ValidationUtils.validate_coordinates({'latitude': latitude, 'longitude': longitude})
+    ValidationUtils.validate_date_range(start_date, end_date)
+    ValidationUtils.validate_positive_int(limit, "limit", MAX_PAGE_SIZE)
+    max_radius_m = get_settings().SPATIAL_MAX_RADIUS_M
+    if not 0 < radius_m <= max_radius_m:
+        raise HTTPException(
+            status_code=400,
+            detail=f"radius_m must be between 0 and {max_radius_m}"
+        )
+    
+    service = SpatialService(db)
+    return await service.find_nearby(latitude, longitude, radius_m, limit, start_date, end_date)
+
+# Endpoints below work on the sync engine; FastAPI runs plain ``def``
+# endpoints in its threadpool, so they do not block the event loop
+
+@router.get("/trips/export")
+def export_trips(
+    format: str = "parquet",
+    columns: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Stream trips as a Parquet file or an Arrow IPC stream."""
+    ValidationUtils.validate_date_range(start_date, end_date)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format '{format}'. Expected one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    selected = [name.strip() for name in columns.split(",")] if columns else None
+    if selected:
+        unknown = [name for name in selected if name not in TaxiTrip.__table__.c]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown columns: {', '.join(unknown)}"
+            )
+    
+    exporter = TripExporter(db)
+    extension = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        exporter.stream(format, selected, start_date, end_date),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=trips.{extension}"}
+    )
 
 @router.get("/trips/process")
-async def process_trip_data(
+def process_trip_data(
     batch_size: int = 1000,
+    mode: str = "orm",
+    parallel: bool = False,
     db: Session = Depends(get_db)
 ):
     """Process taxi trip data from the dataset."""
+    if mode not in LOAD_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode '{mode}'. Expected one of: {', '.join(LOAD_MODES)}"
+        )
+    
     try:
         # Use Docker container path
         file_path = "/app/data/test.csv"
@@ -65,7 +180,17 @@ async def process_trip_data(
             )
 
         try:
-            stats = ingestion_service.ingest_csv(file_path, batch_size)
+            if parallel:
+                settings = get_settings()
+                stats = ingestion_service.ingest_file_parallel(
+                    file_path,
+                    batch_size,
+                    mode,
+                    workers=settings.INGESTION_WORKERS,
+                    queue_depth=settings.INGESTION_QUEUE_DEPTH
+                )
+            else:
+                stats = ingestion_service.ingest_csv(file_path, batch_size, mode)
             return {
                 "message": "Data processing completed successfully",
                 "statistics": stats
@@ -89,4 +214,104 @@ async def process_trip_data(
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+def _resolve_data_file(file_name: str) -> str:
+    """Resolve a file name inside the data directory."""
+    data_dir = os.path.realpath(get_settings().DATA_DIR)
+    file_path = os.path.realpath(os.path.join(data_dir, file_name))
+    if os.path.dirname(file_path) != data_dir:
+        raise HTTPException(
+            status_code=400,
+            detail="File must be inside the data directory"
+        )
+    if not os.path.exists(file_path):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Dataset not found at: {file_path}"
+        )
+    return file_path
+
+@router.post("/ingestion/jobs", status_code=202)
+def create_ingestion_job(
+    file_name: str = "test.csv",
+    batch_size: Optional[int] = None
+):
+    """Start a background ingestion job."""
+    if batch_size is None:
+        batch_size = get_settings().INGESTION_JOB_BATCH_SIZE
+    ValidationUtils.validate_positive_int(batch_size, "batch_size")
+    file_path = _resolve_data_file(file_name)
+    return get_job_service().create_job(file_path, batch_size)
+
+@router.get("/ingestion/jobs")
+def list_ingestion_jobs(limit: int = 20):
+    """List recent ingestion jobs."""
+    return get_job_service().list_jobs(limit)
+
+@router.get("/ingestion/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """Get progress and throughput of an ingestion job."""
+    job = get_job_service().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/ingestion/jobs/{job_id}/resume", status_code=202)
+def resume_ingestion_job(job_id: str):
+    """Resume an interrupted job from its last committed chunk."""
+    job = get_job_service().resume_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/ingestion/jobs/{job_id}", status_code=202)
+def cancel_ingestion_job(job_id: str):
+    """Cancel a running ingestion job."""
+    if get_job_service().get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not get_job_service().cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job is not running")
+    return {"message": "Cancellation requested", "job_id": job_id}
+
+@router.get("/partitions")
+def list_partitions(
+    db: Session = Depends(get_db),
+    _: dict = Depends(JWTHandler.verify_token)
+):
+    """List the monthly partitions of the trips table."""
+    return PartitionManager(db).list_partitions()
+
+@router.post("/partitions/{month}/detach")
+def detach_partition(
+    month: str,
+    db: Session = Depends(get_db),
+    _: dict = Depends(JWTHandler.verify_token)
+):
+    """Detach a month's partition (YYYY-MM) so it can be archived or dropped."""
+    try:
+        month_start = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Month must be formatted as YYYY-MM")
+    
+    manager = PartitionManager(db)
+    if not manager.is_partitioned():
+        raise HTTPException(status_code=409, detail="Trips table is not partitioned")
+    if manager.partition_name(month_start) not in {p["name"] for p in manager.list_partitions()}:
+        raise HTTPException(status_code=404, detail=f"No partition for {month}")
+    return {"detached": manager.detach_partition(month_start)}
+
+@router.post("/rollups/rebuild")
+def rebuild_rollup(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    _: dict = Depends(JWTHandler.verify_token)
+):
+    """Recompute the hourly rollup, route matrix and hourly sketches from raw trips for a range."""
+    ValidationUtils.validate_date_range(start_date, end_date)
+    return {
+        "rows_written": HourlyRollup(db).rebuild(start_date, end_date),
+        "route_rows_written": RouteMatrix(db, get_settings().ROUTE_RESOLUTIONS).rebuild(start_date, end_date),
+        "sketch_rows_written": HourlySketches(db).rebuild(start_date, end_date)
+    }
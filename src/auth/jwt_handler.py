@@ -4,10 +4,9 @@ from typing import Optional, Dict
 from jose import JWTError, jwt
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from ..config.settings import Settings
+from ..config.settings import get_settings
 
 security = HTTPBearer()
-settings = Settings()
 
 class JWTHandler:
     """Handles JWT token operations."""
@@ -18,6 +17,7 @@ class JWTHandler:
         to_encode = data.copy()
         expire = datetime.utcnow() + (expires_delta or timedelta(minutes=30))
         to_encode.update({"exp": expire})
+        settings = get_settings()
         return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     
     @staticmethod
@@ -25,6 +25,7 @@ class JWTHandler:
         """Verify and decode JWT token."""
         try:
             token = credentials.credentials
+            settings = get_settings()
             payload = jwt.decode(
                 token,
                 settings.JWT_SECRET_KEY,
@@ -40,4 +41,17 @@ class JWTHandler:
             raise HTTPException(
                 status_code=401,
                 detail="Invalid authentication credentials"
-            )
\ No newline at end of file
+            )
+    
+    @staticmethod
+    def decode_token(token: str) -> Optional[Dict]:
+        """Decode a token, returning None if it is invalid or expired."""
+        settings = get_settings()
+        try:
+            return jwt.decode(
+                token,
+                settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM]
+            )
+        except JWTError:
+            return None
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""In-process LRU cache with TTL and size-aware eviction."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+MISSING = object()
+
+class LocalCache:
+    """Bounded in-process cache used in front of Redis.
+    
+    Entries expire after their TTL and the least recently used entries are
+    evicted once either the entry count or the total size of the entries
+    exceeds its bound. Sizes are supplied by the caller, normally the
+    length of the entry's JSON encoding. Cached values are shared between
+    callers and must be treated as read-only.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 30,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Any:
+        """
+        Get a value and mark it as recently used.
+        
+        Returns:
+            The value, or ``MISSING`` if absent or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at, _ = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return value
+            self._remove(key)
+        self._evicted("expired")
+        return MISSING
+    
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting least recently used entries to make room.
+        
+        Values larger than the whole cache are not stored.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            size: Size of the value in bytes
+            ttl: Seconds until the entry expires, defaults to ``default_ttl``
+        """
+        if size > self.max_bytes:
+            return
+        
+        evicted = 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+            self._entries[key] = (value, expires_at, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+        for _ in range(evicted):
+            self._evicted("size")
+    
+    def invalidate(self, prefix: Optional[str] = None) -> int:
+        """
+        Drop every entry, or every entry whose key starts with a prefix.
+        
+        Returns:
+            int: Number of entries dropped
+        """
+        with self._lock:
+            if prefix is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self.total_bytes = 0
+            else:
+                keys = [key for key in self._entries if key.startswith(prefix)]
+                for key in keys:
+                    self._remove(key)
+                dropped = len(keys)
+        for _ in range(dropped):
+            self._evicted("invalidated")
+        return dropped
+    
+    def _remove(self, key: str) -> None:
+        """Remove an entry; the caller holds the lock."""
+        _, _, size = self._entries.pop(key)
+        self.total_bytes -= size
+    
+    def _evicted(self, reason: str) -> None:
+        if self.on_evict:
+            self.on_evict(reason)
@@ -1,35 +1,158 @@
 """Redis cache management."""
-from typing import Optional, Any
+from typing import Any, Dict, Iterable, List, Optional
 import json
-import redis
+import redis.asyncio as redis
 from ..config.settings import Settings
 
 class RedisManager:
-    """Manages Redis cache operations."""
+    """Manages Redis cache operations.
     
-    def __init__(self, settings: Settings):
-        self.redis_client = redis.from_url(settings.REDIS_URL or "redis://localhost:6379/0")
+    Uses the asyncio Redis client over an explicit connection pool, so
+    cache lookups and rate-limit checks never block the event loop. Batch
+    operations send all their commands in a single round trip.
+    """
+    
+    def __init__(self, settings: Settings, client: Optional[redis.Redis] = None):
+        self.pool = None
+        if client is None:
+            self.pool = redis.ConnectionPool.from_url(
+                settings.REDIS_URL or "redis://localhost:6379/0",
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                health_check_interval=30
+            )
+            client = redis.Redis(connection_pool=self.pool)
+        self.redis_client = client
         self.ttl = settings.CACHE_TTL
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
-        value = self.redis_client.get(key)
+        value = await self.redis_client.get(key)
         if value:
             return json.loads(value)
         return None
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache."""
-        self.redis_client.setex(
+        await self.redis_client.setex(
             key,
             ttl or self.ttl,
             json.dumps(value)
         )
     
-    async def delete(self, key: str) -> None:
-        """Delete value from cache."""
-        self.redis_client.delete(key)
+    async def get_raw(self, key: str) -> Optional[bytes]:
+        """Get the encoded value without decoding it."""
+        return await self.redis_client.get(key)
+    
+    async def set_raw(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        """Set an already encoded value."""
+        await self.redis_client.setex(key, ttl or self.ttl, value)
+    
+    async def delete(self, *keys: str) -> None:
+        """Delete values from cache."""
+        if keys:
+            await self.redis_client.delete(*keys)
+    
+    async def mget(self, keys: Iterable[str]) -> List[Optional[Any]]:
+        """
+        Get several values in one round trip.
+        
+        Args:
+            keys: Cache keys
+        
+        Returns:
+            list: Values in key order, None for misses
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        values = await self.redis_client.mget(keys)
+        return [json.loads(value) if value else None for value in values]
+    
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """
+        Set several values with a TTL in one round trip.
+        
+        MSET cannot set expiry, so the SETEX commands are pipelined instead.
+        
+        Args:
+            mapping: Values by cache key
+            ttl: Expiry in seconds, defaults to ``CACHE_TTL``
+        """
+        if not mapping:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.setex(key, ttl or self.ttl, json.dumps(value))
+            await pipe.execute()
+    
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """
+        Delete every key matching a glob pattern.
+        
+        Keys are found with SCAN, so Redis is never blocked by a full KEYS
+        walk, and removed with UNLINK in batches.
+        
+        Returns:
+            int: Number of keys deleted
+        """
+        deleted = 0
+        batch = []
+        async for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await self.redis_client.unlink(*batch)
+        return deleted
+    
+    def lock(self, name: str, timeout: float):
+        """
+        Create a distributed lock that expires after ``timeout`` seconds.
+        
+        The lock token is kept on the lock object rather than in
+        thread-local storage, so it works across asyncio tasks.
+        """
+        return self.redis_client.lock(name, timeout=timeout, thread_local=False)
+    
+    async def publish(self, channel: str, message: str) -> None:
+        """Publish a message on a pub/sub channel."""
+        await self.redis_client.publish(channel, message)
+    
+    def pubsub(self):
+        """Create a pub/sub connection."""
+        return self.redis_client.pubsub()
+    
+    def pipeline(self, transaction: bool = False):
+        """
+        Start a pipeline whose commands are sent together on ``execute()``.
         
+        Args:
+            transaction: Wrap the commands in MULTI/EXEC
+        """
+        return self.redis_client.pipeline(transaction=transaction)
+    
+    def register_script(self, script: str):
+        """
+        Register a Lua script to run atomically on the server.
+        
+        Calling the returned object sends only the script's SHA1 with
+        EVALSHA, loading the script first if the server does not have it.
+        """
+        return self.redis_client.register_script(script)
+    
     async def clear_all(self) -> None:
         """Clear all cached data."""
-        self.redis_client.flushdb()
\ No newline at end of file
+        await self.redis_client.flushdb()
+    
+    async def ping(self) -> bool:
+        """Check that Redis is reachable."""
+        return await self.redis_client.ping()
+    
+    async def close(self) -> None:
+        """Close the client and its pooled connections."""
+        await self.redis_client.close()
+        if self.pool is not None:
+            await self.pool.disconnect()
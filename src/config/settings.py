@@ -1,7 +1,8 @@
 """Application configuration management."""
 import os
+from functools import lru_cache
 from pydantic import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     """Application settings and configuration."""
@@ -11,6 +12,11 @@ class Settings(BaseSettings):
         "DATABASE_URL",
         "postgresql://postgres:postgres@db:5432/taxi_db"
     )
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_PRE_PING: bool = True
     REDIS_URL: str = os.getenv(
         "REDIS_URL",
         "redis://redis:6380/0"
@@ -25,21 +31,82 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Ingestion
+    DATA_DIR: str = "/app/data"
+    INGESTION_JOB_BATCH_SIZE: int = 10000
+    INGESTION_WORKERS: int = 2
+    INGESTION_QUEUE_DEPTH: int = 4
+    
+    # Largest radius accepted by /trips/nearby, in meters
+    SPATIAL_MAX_RADIUS_M: int = 5000
+    
+    # Answer time-bounded aggregates from the hourly rollup
+    USE_ROLLUP: bool = True
+    # Grid resolutions kept in the route matrix for popular routes
+    ROUTE_RESOLUTIONS: List[int] = [6, 8]
+    
+    # In-memory store of recent trips for hourly and peak-hour analytics
+    HOT_STORE_ENABLED: bool = False
+    HOT_STORE_WINDOW_DAYS: int = 30
+    HOT_STORE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Bounds how long trips committed by other workers are missing
+    HOT_STORE_REFRESH_SECONDS: int = 300
+    # Directory of memory-mapped snapshots shared by the workers of a host;
+    # when set, HOT_STORE_REFRESH_SECONDS is the maximum snapshot age
+    HOT_STORE_SNAPSHOT_DIR: Optional[str] = None
+    HOT_STORE_SNAPSHOT_POLL_SECONDS: int = 5
+    
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 100
+    # Per-route overrides keyed by route template, e.g.
+    # RATE_LIMIT_ROUTES='{"/api/v1/trips/stream": 10}'
+    RATE_LIMIT_ROUTES: Dict[str, int] = {}
     
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
-    # Monitoring
+    # Monitoring; under gunicorn the master serves every worker's totals on
+    # PROMETHEUS_PORT, and each worker serves them on /metrics
     ENABLE_METRICS: bool = True
     PROMETHEUS_PORT: int = 9090
     
+    # Multi-worker server, see gunicorn.conf.py
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = os.cpu_count() or 1
+    # Import the app once in the master so workers share its pages; code
+    # changes then need a restart instead of a HUP reload
+    WEB_PRELOAD: bool = False
+    WEB_TIMEOUT: int = 120
+    WEB_GRACEFUL_TIMEOUT: int = 30
+    # Recycle workers after this many requests (0 disables)
+    WEB_MAX_REQUESTS: int = 0
+    
     # Cache Settings
     REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
     CACHE_TTL: int = 3600  # 1 hour
+    # In-process tier in front of Redis; its short TTL bounds staleness
+    # if an invalidation message is missed
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_L1_TTL: int = 30
+    # Expired results are served for this long while one caller refreshes them
+    CACHE_STALE_TTL: int = 300
+    CACHE_LOCK_TIMEOUT: int = 30
+    # Higher values refresh hot keys earlier before they expire
+    CACHE_EARLY_EXPIRY_BETA: float = 1.0
+    ANALYTICS_CACHE_TTL: int = 300
+    # max-age sent to clients and proxies for analytics responses
+    ANALYTICS_MAX_AGE: int = 60
     
     class Config:
         """Pydantic config class."""
-        env_file = ".env"
\ No newline at end of file
+        env_file = ".env"
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Application settings, read once per process."""
+    return Settings()
@@ -0,0 +1,120 @@
+"""Streaming export of trip data as Parquet or Arrow IPC."""
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import select, Integer, Float, DateTime
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip
+
+EXPORT_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+class _StreamSink:
+    """Write-only file object that hands written bytes back to a generator."""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        """Return and forget everything written so far."""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+class TripExporter:
+    """Streams query results as columnar files without building dicts."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    @staticmethod
+    def arrow_type(column):
+        """Map a SQLAlchemy column to an Arrow type."""
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        return pa.string()
+    
+    def stream(
+        self,
+        file_format: str = "parquet",
+        columns: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        batch_size: int = 50000
+    ) -> Iterator[bytes]:
+        """
+        Stream trips as a Parquet file or an Arrow IPC stream.
+        
+        Each batch of rows becomes one Parquet row group or Arrow record
+        batch and is yielded as soon as it is encoded.
+        
+        Args:
+            file_format: "parquet" or "arrow"
+            columns: Columns to export, defaults to all
+            start_date: Only export trips picked up at or after this time
+            end_date: Only export trips picked up at or before this time
+            batch_size: Number of rows fetched and encoded at a time
+        
+        Yields:
+            bytes: Encoded file content
+        """
+        table = TaxiTrip.__table__
+        selected = [table.c[name] for name in columns] if columns else list(table.columns)
+        schema = pa.schema([(col.name, self.arrow_type(col)) for col in selected])
+        
+        query = select(*selected)
+        if start_date:
+            query = query.where(table.c.pickup_datetime >= start_date)
+        if end_date:
+            query = query.where(table.c.pickup_datetime <= end_date)
+        
+        result = self.db.execute(query.execution_options(stream_results=True))
+        
+        sink = _StreamSink()
+        if file_format == "parquet":
+            writer = pq.ParquetWriter(sink, schema)
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        
+        try:
+            for rows in result.partitions(batch_size):
+                values = list(zip(*rows))
+                batch = pa.Table.from_arrays(
+                    [pa.array(values[i], type=schema.field(i).type) for i in range(len(selected))],
+                    schema=schema
+                )
+                writer.write_table(batch)
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+            result.close()
+        
+        data = sink.drain()
+        if data:
+            yield data
@@ -0,0 +1,206 @@
+"""Chunked readers for CSV, Parquet and Arrow IPC trip files."""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+FILE_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".arrows": "arrow_stream"
+}
+
+DATETIME_COLUMN = "pickup_datetime"
+
+class ChunkReader:
+    """Reads trip files as a stream of DataFrame chunks."""
+    
+    @staticmethod
+    def detect_format(file_path: str) -> str:
+        """
+        Detect the file format from its extension.
+        
+        Args:
+            file_path: Path to the input file
+        
+        Returns:
+            str: One of "csv", "parquet", "arrow" (IPC file) or
+                "arrow_stream" (IPC stream, as written by /trips/export)
+        
+        Raises:
+            ValueError: If the extension is not supported
+        """
+        suffix = Path(file_path).suffix.lower()
+        if suffix not in FILE_FORMATS:
+            raise ValueError(f"Unsupported file format: {suffix}")
+        return FILE_FORMATS[suffix]
+    
+    @staticmethod
+    def read(
+        file_path: str,
+        batch_size: int = 1000,
+        skip_chunks: int = 0,
+        columns: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        dtypes: Optional[Dict[str, str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read a file in chunks.
+        
+        Args:
+            file_path: Path to the input file
+            batch_size: Number of records in each chunk
+            skip_chunks: Number of leading chunks to skip
+            columns: Columns to read; columnar formats skip the others
+            start_date: Drop rows picked up before this time
+            end_date: Drop rows picked up after this time
+            dtypes: Column dtypes applied while parsing CSV; columnar
+                formats already carry their own types
+        
+        Yields:
+            DataFrame: Chunk of the file
+        """
+        file_format = ChunkReader.detect_format(file_path)
+        if file_format == "csv":
+            chunks = ChunkReader._read_csv(file_path, batch_size, skip_chunks, columns, dtypes)
+        elif file_format == "parquet":
+            chunks = ChunkReader._read_parquet(
+                file_path, batch_size, skip_chunks, columns, start_date, end_date
+            )
+        else:
+            chunks = ChunkReader._read_arrow(
+                file_path, batch_size, skip_chunks, columns, stream=file_format == "arrow_stream"
+            )
+        
+        for chunk in chunks:
+            if start_date is not None:
+                chunk = chunk[chunk[DATETIME_COLUMN] >= start_date]
+            if end_date is not None:
+                chunk = chunk[chunk[DATETIME_COLUMN] <= end_date]
+            yield chunk
+    
+    @staticmethod
+    def _read_csv(file_path, batch_size, skip_chunks, columns, dtypes) -> Iterator[pd.DataFrame]:
+        """Read CSV chunks, skipping already processed rows unparsed."""
+        return pd.read_csv(
+            file_path,
+            chunksize=batch_size,
+            usecols=ChunkReader._usecols(columns),
+            dtype=dtypes,
+            parse_dates=[DATETIME_COLUMN],
+            skiprows=range(1, skip_chunks * batch_size + 1) if skip_chunks else None
+        )
+    
+    @staticmethod
+    def _read_parquet(
+        file_path,
+        batch_size,
+        skip_chunks,
+        columns,
+        start_date,
+        end_date
+    ) -> Iterator[pd.DataFrame]:
+        """Stream Parquet record batches from the row groups that can match."""
+        parquet_file = pq.ParquetFile(file_path)
+        available = parquet_file.schema_arrow.names
+        row_groups = ChunkReader.matching_row_groups(parquet_file, start_date, end_date)
+        if not row_groups:
+            return
+        
+        batches = parquet_file.iter_batches(
+            batch_size=batch_size,
+            row_groups=row_groups,
+            columns=[col for col in columns if col in available] if columns else None
+        )
+        for index, batch in enumerate(batches):
+            if index >= skip_chunks:
+                yield batch.to_pandas()
+    
+    @staticmethod
+    def _read_arrow(file_path, batch_size, skip_chunks, columns, stream=False) -> Iterator[pd.DataFrame]:
+        """Stream record batches from a memory-mapped Arrow IPC file or stream."""
+        with pa.memory_map(file_path) as source:
+            if stream:
+                batches = pa.ipc.open_stream(source)
+            else:
+                reader = pa.ipc.open_file(source)
+                batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            for index, table in enumerate(ChunkReader._rebatch(batches, batch_size)):
+                if index < skip_chunks:
+                    continue
+                if columns:
+                    table = table.select([col for col in columns if col in table.column_names])
+                yield table.to_pandas()
+    
+    @staticmethod
+    def _rebatch(batches: Iterator[pa.RecordBatch], batch_size: int) -> Iterator[pa.Table]:
+        """Regroup record batches into tables of ``batch_size`` rows; only the last is shorter."""
+        pending, rows = [], 0
+        for batch in batches:
+            offset = 0
+            while offset < batch.num_rows:
+                piece = batch.slice(offset, batch_size - rows)
+                pending.append(piece)
+                rows += piece.num_rows
+                offset += piece.num_rows
+                if rows == batch_size:
+                    yield pa.Table.from_batches(pending)
+                    pending, rows = [], 0
+        if rows:
+            yield pa.Table.from_batches(pending)
+    
+    @staticmethod
+    def matching_row_groups(
+        parquet_file: pq.ParquetFile,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[int]:
+        """
+        Select row groups whose pickup_datetime statistics overlap a range.
+        
+        Row groups without statistics are always kept.
+        
+        Args:
+            parquet_file: Open Parquet file
+            start_date: Start of the range
+            end_date: End of the range
+        
+        Returns:
+            list: Indices of the row groups to read
+        """
+        metadata = parquet_file.metadata
+        if start_date is None and end_date is None:
+            return list(range(metadata.num_row_groups))
+        
+        names = parquet_file.schema_arrow.names
+        if DATETIME_COLUMN not in names:
+            return list(range(metadata.num_row_groups))
+        column_index = names.index(DATETIME_COLUMN)
+        
+        selected = []
+        for index in range(metadata.num_row_groups):
+            statistics = metadata.row_group(index).column(column_index).statistics
+            if statistics is None or not statistics.has_min_max:
+                selected.append(index)
+                continue
+            if start_date is not None and pd.Timestamp(statistics.max) < pd.Timestamp(start_date):
+                continue
+            if end_date is not None and pd.Timestamp(statistics.min) > pd.Timestamp(end_date):
+                continue
+            selected.append(index)
+        return selected
+    
+    @staticmethod
+    def _usecols(columns: Optional[List[str]]):
+        """Build a read_csv usecols filter that tolerates absent columns."""
+        if not columns:
+            return None
+        wanted = set(columns)
+        return lambda name: name.split('__')[0] in wanted
@@ -0,0 +1,406 @@
+"""In-process columnar store of recent trips for hot-window analytics."""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Column name -> dtype; pickup_datetime is stored as microseconds since the epoch
+COLUMNS = {
+    'pickup_datetime': np.int64,
+    'vendor_id': np.int16,
+    'passenger_count': np.int16,
+    'pickup_latitude': np.float32,
+    'pickup_longitude': np.float32,
+    'dropoff_latitude': np.float32,
+    'dropoff_longitude': np.float32
+}
+ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in COLUMNS.values())
+
+# Appended chunks are merged into one sorted segment past this many segments
+MAX_SEGMENTS = 8
+
+# 1970-01-01 was a Thursday; day-of-week numbering starts at Sunday like SQL's dow
+EPOCH_DAY_OF_WEEK = 4
+
+MICROSECONDS_PER_HOUR = 3600 * 10 ** 6
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+Segment = Dict[str, np.ndarray]
+
+def to_microseconds(value: datetime) -> int:
+    """Convert a naive timestamp to the stored integer representation."""
+    return int(np.datetime64(value, 'us').astype(np.int64))
+
+class HotTripStore:
+    """Recent trips as NumPy columns sorted by pickup time.
+    
+    The store holds every trip picked up since ``covered_from`` once it has
+    been loaded, so aggregations over ranges starting at or after it can be
+    answered with ``searchsorted`` and ``bincount`` instead of a database
+    round trip. Committed ingestion chunks are appended as they arrive.
+    
+    Data is kept in immutable segments that are replaced as a whole, so
+    readers never take a lock; writers serialise on one. Rows older than
+    the window, or the oldest rows beyond the memory budget, are evicted
+    and ``covered_from`` moves forward accordingly.
+    
+    Only commits made by this process are appended, so the store is
+    reloaded periodically to pick up trips loaded by other workers;
+    ``on_replace`` is called after each reload or newly mapped snapshot,
+    e.g. to drop results computed from the previous contents. With
+    ``TripSnapshots``, one worker exports the window to memory-mapped files
+    and every worker maps them read-only as its base segment, so workers
+    share the pages and start without querying the database.
+    """
+    
+    def __init__(
+        self,
+        window: timedelta = timedelta(days=7),
+        max_bytes: int = 256 * 1024 * 1024,
+        clock: Callable[[], datetime] = datetime.now,
+        on_replace: Optional[Callable[[], None]] = None
+    ):
+        self.window = window
+        self.max_rows = max_bytes // ROW_BYTES
+        self.clock = clock
+        self.on_replace = on_replace
+        self._lock = threading.Lock()
+        self._segments: Tuple[Segment, ...] = ()
+        self._covered_from: Optional[int] = None
+        self._mapped = False
+        self._export_requested = False
+        self._refresher: Optional[asyncio.Task] = None
+        self.snapshot_version: Optional[str] = None
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether the store has been loaded and can answer queries."""
+        return self._covered_from is not None
+    
+    @property
+    def covered_from(self) -> Optional[datetime]:
+        """Earliest pickup time from which the store holds every trip."""
+        if self._covered_from is None:
+            return None
+        return np.datetime64(self._covered_from, 'us').astype(datetime)
+    
+    @property
+    def row_count(self) -> int:
+        """Number of trips held."""
+        return sum(len(segment['pickup_datetime']) for segment in self._segments)
+    
+    def covers(self, start_date: Optional[datetime]) -> bool:
+        """Whether a range starting at ``start_date`` can be answered from the store."""
+        covered_from = self._covered_from
+        return covered_from is not None and start_date is not None and to_microseconds(start_date) >= covered_from
+    
+    @staticmethod
+    def segment(df: pd.DataFrame) -> Segment:
+        """
+        Build a sorted segment from trip data.
+        
+        Missing numeric values are stored as 0 for integers and NaN for
+        coordinates.
+        
+        Args:
+            df: Trips with at least ``pickup_datetime``
+        
+        Returns:
+            dict: Column arrays sorted by pickup time
+        """
+        pickups = pd.to_datetime(df['pickup_datetime']).values.astype('datetime64[us]').astype(np.int64)
+        order = np.argsort(pickups, kind='stable')
+        segment = {'pickup_datetime': pickups[order]}
+        for name, dtype in COLUMNS.items():
+            if name == 'pickup_datetime':
+                continue
+            if name in df.columns:
+                values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                values = np.full(len(df), np.nan)
+            if np.issubdtype(dtype, np.integer):
+                values = np.nan_to_num(values, nan=0)
+            segment[name] = values[order].astype(dtype)
+        return segment
+    
+    def load(self, db: Session, batch_size: int = 100000) -> int:
+        """
+        Replace the contents with the trips in the window from the database.
+        
+        Args:
+            db: Sync session
+            batch_size: Rows fetched per round trip
+        
+        Returns:
+            int: Number of trips loaded
+        """
+        start = self.clock() - self.window
+        query = select(*[TaxiTrip.__table__.c[name] for name in COLUMNS]).where(
+            TaxiTrip.pickup_datetime >= start
+        ).execution_options(stream_results=True)
+        
+        segments = []
+        result = db.execute(query)
+        for rows in result.partitions(batch_size):
+            segments.append(self.segment(pd.DataFrame(rows, columns=list(COLUMNS))))
+        
+        with self._lock:
+            self._segments = tuple(segments)
+            self._covered_from = to_microseconds(start)
+            self._mapped = False
+            self.snapshot_version = None
+            self._compact()
+        logger.info(f"Loaded {self.row_count} trips picked up since {start}")
+        self._replaced()
+        return self.row_count
+    
+    def load_snapshot(self, snapshots) -> bool:
+        """
+        Map the current snapshot as the base segment if it is not mapped yet.
+        
+        Args:
+            snapshots: ``TripSnapshots`` directory
+        
+        Returns:
+            bool: True if a new snapshot was mapped
+        """
+        manifest = snapshots.current()
+        if manifest is None or manifest['version'] == self.snapshot_version:
+            return False
+        segment = snapshots.open(manifest)
+        
+        with self._lock:
+            self._segments = (segment,)
+            self._covered_from = manifest['covered_from']
+            self._mapped = True
+            self.snapshot_version = manifest['version']
+            self._compact()
+        logger.info(f"Mapped trip snapshot {manifest['version']} with {manifest['row_count']} trips")
+        self._replaced()
+        return True
+    
+    def export(self, db: Session, snapshots) -> dict:
+        """
+        Reload from the database, publish the contents as a new snapshot and map it.
+        
+        Args:
+            db: Sync session
+            snapshots: ``TripSnapshots`` directory
+        
+        Returns:
+            dict: Manifest of the new snapshot
+        """
+        self.load(db)
+        with self._lock:
+            segment = self._merge(self._segments)
+            covered_from = self._covered_from
+        manifest = snapshots.write(segment, covered_from)
+        self.load_snapshot(snapshots)
+        return manifest
+    
+    def request_export(self, *args) -> None:
+        """Export a snapshot on the next refresh; used as an ingestion run listener."""
+        self._export_requested = True
+    
+    def refresh(self, session_factory: Callable[[], Session], max_age: float, snapshots=None) -> None:
+        """
+        Bring the store up to date once.
+        
+        Without snapshots the store is reloaded from the database. With
+        them, a newer snapshot is mapped, and the snapshot is re-exported
+        when it is older than ``max_age`` seconds or an export was
+        requested; only the worker holding the snapshot lock exports.
+        """
+        if snapshots is None:
+            db = session_factory()
+            try:
+                self.load(db)
+            finally:
+                db.close()
+            return
+        
+        self.load_snapshot(snapshots)
+        manifest = snapshots.current()
+        if manifest is not None and not self._export_requested and time.time() - manifest['created_at'] < max_age:
+            return
+        with snapshots.exclusive() as acquired:
+            if acquired:
+                self._export_requested = False
+                db = session_factory()
+                try:
+                    self.export(db, snapshots)
+                finally:
+                    db.close()
+    
+    def start_refresh(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float,
+        snapshots=None,
+        poll_interval: float = 5.0
+    ) -> None:
+        """
+        Refresh the store now and periodically in a worker thread.
+        
+        Args:
+            session_factory: Creates sync sessions
+            interval: Seconds between database reloads, or the maximum
+                snapshot age when ``snapshots`` is given
+            snapshots: Optional ``TripSnapshots`` directory shared by workers
+            poll_interval: Seconds between checks for a new snapshot
+        """
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(
+                self._refresh(session_factory, interval, snapshots, poll_interval)
+            )
+    
+    async def stop_refresh(self) -> None:
+        """Stop the periodic refresh."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+    
+    async def _refresh(self, session_factory: Callable[[], Session], interval: float, snapshots, poll_interval: float) -> None:
+        """Refresh in a loop; failures keep the previous contents."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.refresh, session_factory, interval, snapshots)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Hot trip store refresh failed: {str(e)}")
+            await asyncio.sleep(interval if snapshots is None else poll_interval)
+    
+    def _replaced(self) -> None:
+        """Call ``on_replace``; its failures never fail a refresh."""
+        if self.on_replace is None:
+            return
+        try:
+            self.on_replace()
+        except Exception as e:
+            logger.error(f"Hot trip store replace callback failed: {str(e)}")
+    
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Add committed trips; used as an ingestion commit listener.
+        
+        Does nothing until the store is loaded, since older trips would be
+        missing from the ranges it claims to cover.
+        
+        Returns:
+            int: Number of trips added
+        """
+        if not self.loaded or df.empty or 'pickup_datetime' not in df.columns:
+            return 0
+        segment = self.segment(df)
+        keep = segment['pickup_datetime'] >= self._covered_from
+        segment = {name: values[keep] for name, values in segment.items()}
+        if not len(segment['pickup_datetime']):
+            return 0
+        
+        with self._lock:
+            self._segments = self._segments + (segment,)
+            if len(self._segments) > MAX_SEGMENTS or self.row_count > self.max_rows:
+                self._compact()
+        return len(segment['pickup_datetime'])
+    
+    @staticmethod
+    def _merge(segments) -> Segment:
+        """Merge segments into one sorted segment."""
+        if not segments:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        merged = {
+            name: np.concatenate([segment[name] for segment in segments])
+            for name in COLUMNS
+        }
+        order = np.argsort(merged['pickup_datetime'], kind='stable')
+        return {name: values[order] for name, values in merged.items()}
+    
+    def _compact(self) -> None:
+        """
+        Merge appended segments into one, evicting rows outside the window or budget. Needs the lock.
+        
+        A mapped snapshot stays a separate base segment and is only sliced,
+        so its pages remain shared with the other workers.
+        """
+        segments = list(self._segments)
+        base = segments.pop(0) if self._mapped and segments else None
+        parts = [self._merge(segments)] if base is None else [base, self._merge(segments)]
+        
+        covered_from = max(self._covered_from, to_microseconds(self.clock() - self.window))
+        firsts = [int(np.searchsorted(part['pickup_datetime'], covered_from, side='left')) for part in parts]
+        kept = sum(len(part['pickup_datetime']) - first for part, first in zip(parts, firsts))
+        if kept > self.max_rows:
+            # Coverage starts just after the newest evicted trip; trips
+            # sharing its timestamp are evicted too
+            pickups = np.concatenate([part['pickup_datetime'][first:] for part, first in zip(parts, firsts)])
+            evicted = kept - self.max_rows
+            covered_from = int(np.partition(pickups, evicted - 1)[evicted - 1]) + 1
+            firsts = [int(np.searchsorted(part['pickup_datetime'], covered_from, side='left')) for part in parts]
+        
+        parts = [{name: values[first:] for name, values in part.items()} for part, first in zip(parts, firsts)]
+        if base is not None and not len(parts[0]['pickup_datetime']):
+            parts.pop(0)
+            self._mapped = False
+        self._segments = tuple(part for part in parts if len(part['pickup_datetime'])) or (parts[-1],)
+        self._covered_from = covered_from
+    
+    def _select(self, start_date: datetime, end_date: Optional[datetime], column: str) -> List[np.ndarray]:
+        """Values of a column for pickups in an inclusive range, one array per segment."""
+        start = to_microseconds(start_date)
+        end = to_microseconds(end_date) if end_date is not None else None
+        selected = []
+        for segment in self._segments:
+            pickups = segment['pickup_datetime']
+            low = int(np.searchsorted(pickups, start, side='left'))
+            high = int(np.searchsorted(pickups, end, side='right')) if end is not None else len(pickups)
+            selected.append(segment[column][low:high])
+        return selected
+    
+    def count_by_hour(self, start_date: datetime, end_date: Optional[datetime] = None) -> Dict[int, int]:
+        """
+        Trip counts by hour of day for pickups in an inclusive range.
+        
+        Returns:
+            dict: Count per hour with at least one trip, like
+                ``AnalyticsService.get_hourly_distribution``
+        """
+        counts = np.zeros(24, dtype=np.int64)
+        for pickups in self._select(start_date, end_date, 'pickup_datetime'):
+            counts += np.bincount(pickups // MICROSECONDS_PER_HOUR % 24, minlength=24)
+        return {hour: int(count) for hour, count in enumerate(counts) if count}
+    
+    def count_by_day_and_hour(
+        self,
+        start_date: datetime,
+        end_date: Optional[datetime] = None
+    ) -> Dict[Tuple[int, int], int]:
+        """
+        Trip counts by day of week (0 is Sunday) and hour for pickups in an inclusive range.
+        
+        Returns:
+            dict: Count per (day_of_week, hour) with at least one trip
+        """
+        counts = np.zeros(7 * 24, dtype=np.int64)
+        for pickups in self._select(start_date, end_date, 'pickup_datetime'):
+            day_of_week = (pickups // MICROSECONDS_PER_DAY + EPOCH_DAY_OF_WEEK) % 7
+            hour = pickups // MICROSECONDS_PER_HOUR % 24
+            counts += np.bincount(day_of_week * 24 + hour, minlength=7 * 24)
+        return {
+            (index // 24, index % 24): int(count)
+            for index, count in enumerate(counts) if count
+        }
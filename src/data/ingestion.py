@@ -1,10 +1,54 @@
 """Data ingestion functionality for taxi trip data."""
+import time
 import pandas as pd
-from typing import List
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 from sqlalchemy.orm import Session
 from .processor import DataProcessor
+from .loader import BulkLoader
+from .pipeline import IngestionPipeline
+from .formats import ChunkReader
 from ..database.models import TaxiTrip
+from ..database.partitions import PartitionManager
+from .rollup import HourlyRollup
+from .route_matrix import RouteMatrix
+from .sketch_rollup import HourlySketches
+from ..config.settings import get_settings
+from ..monitoring.metrics import INGESTION_RECORDS, INGESTION_ROWS_PER_SECOND
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+LOAD_MODES = ("orm", "copy")
+
+# Called with each committed chunk, e.g. to invalidate cached results
+CommitListener = Callable[[pd.DataFrame], None]
+_commit_listeners: List[CommitListener] = []
+
+def add_commit_listener(listener: CommitListener) -> None:
+    """Register a function called with every chunk after it is committed."""
+    if listener not in _commit_listeners:
+        _commit_listeners.append(listener)
+
+def remove_commit_listener(listener: CommitListener) -> None:
+    """Unregister a commit listener."""
+    if listener in _commit_listeners:
+        _commit_listeners.remove(listener)
+
+# Called with the statistics of each finished ingestion run, e.g. to export snapshots
+RunListener = Callable[[dict], None]
+_run_listeners: List[RunListener] = []
+
+def add_run_listener(listener: RunListener) -> None:
+    """Register a function called after every ingestion run."""
+    if listener not in _run_listeners:
+        _run_listeners.append(listener)
+
+def remove_run_listener(listener: RunListener) -> None:
+    """Unregister a run listener."""
+    if listener in _run_listeners:
+        _run_listeners.remove(listener)
 
 class DataIngestionService:
     """Service for handling data ingestion operations."""
@@ -12,52 +56,271 @@ class DataIngestionService:
     def __init__(self, db: Session):
         self.db = db
         self.processor = DataProcessor()
+        self.loader = BulkLoader(db)
+        self.partitions = PartitionManager(db)
+        self.rollup = HourlyRollup(db)
+        self.routes = RouteMatrix(db, get_settings().ROUTE_RESOLUTIONS)
+        self.sketches = HourlySketches(db)
     
-    def ingest_csv(self, file_path: str, batch_size: int = 1000) -> dict:
+    def ingest_csv(self, file_path: str, batch_size: int = 1000, mode: str = "orm") -> dict:
         """
         Ingest data from CSV file in batches.
         
         Args:
             file_path: Path to the CSV file
             batch_size: Number of records to process in each batch
-            
+            mode: "orm" to save TaxiTrip objects, "copy" to bulk load
+                cleaned chunks directly (COPY on PostgreSQL)
+        
         Returns:
             dict: Statistics about the ingestion process
         """
-        if not Path(file_path).exists():
-            raise FileNotFoundError(f"CSV file not found: {file_path}")
-            
+        return self.ingest_file(file_path, batch_size, mode)
+    
+    def ingest_file(
+        self,
+        file_path: str,
+        batch_size: int = 1000,
+        mode: str = "orm",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> dict:
+        """
+        Ingest data from a CSV, Parquet or Arrow IPC file in batches.
+        
+        Args:
+            file_path: Path to the input file
+            batch_size: Number of records to process in each batch
+            mode: Load mode, see ``ingest_csv``
+            start_date: Only ingest trips picked up at or after this time
+            end_date: Only ingest trips picked up at or before this time
+        
+        Returns:
+            dict: Statistics about the ingestion process
+        """
+        self._check_input(file_path, mode)
+        self.partitions.ensure_upcoming()
+        
         stats = {
             "total_records": 0,
             "processed_records": 0,
-            "failed_records": 0
+            "failed_records": 0,
+            "rejected_by_rule": dict.fromkeys(DataProcessor.REJECTION_RULES, 0),
+            "mode": mode
         }
+        started = time.perf_counter()
         
-        # Read CSV in chunks with specific date parsing
-        for chunk in pd.read_csv(
-            file_path,
-            chunksize=batch_size,
-            parse_dates=['pickup_datetime']
-        ):
+        for _, chunk in self.read_chunks(file_path, batch_size, start_date=start_date, end_date=end_date):
             try:
                 # Clean data
-                cleaned_chunk = self.processor.clean_data(chunk)
-                
-                # Convert to models
-                models = self.processor.to_models(cleaned_chunk)
-                
-                # Bulk insert
-                self.db.bulk_save_objects(models)
-                self.db.commit()
-                
-                stats["processed_records"] += len(models)
-                stats["failed_records"] += len(chunk) - len(models)
+                cleaned_chunk, report = self.processor.clean_data_with_report(chunk)
+                self.add_rejections(stats, report)
+                loaded = self.write_chunk(cleaned_chunk, mode)
                 
+                stats["processed_records"] += loaded
+                stats["failed_records"] += len(chunk) - loaded
+            
             except Exception as e:
-                self.db.rollback()
                 stats["failed_records"] += len(chunk)
-                print(f"Error processing batch: {str(e)}")
-                
+                logger.error(f"Error processing batch: {str(e)}")
+            
             stats["total_records"] += len(chunk)
+        
+        self._add_throughput(stats, time.perf_counter() - started, "serial")
+        self.notify_run(stats)
+        return stats
+    
+    def ingest_file_parallel(
+        self,
+        file_path: str,
+        batch_size: int = 1000,
+        mode: str = "copy",
+        workers: int = 2,
+        queue_depth: int = 4
+    ) -> dict:
+        """
+        Ingest data from a file with parsing, cleaning and writing overlapped.
+        
+        Args:
+            file_path: Path to the input file
+            batch_size: Number of records to process in each batch
+            mode: Load mode, see ``ingest_csv``
+            workers: Number of processes cleaning chunks
+            queue_depth: Maximum number of chunks waiting to be written
+        
+        Returns:
+            dict: Statistics about the ingestion process, including
+                per-stage timings
+        """
+        self._check_input(file_path, mode)
+        self.partitions.ensure_upcoming()
+        
+        started = time.perf_counter()
+        pipeline = IngestionPipeline(
+            lambda cleaned: self.write_chunk(cleaned, mode),
+            workers=workers,
+            queue_depth=queue_depth
+        )
+        chunks = (chunk for _, chunk in self.read_chunks(file_path, batch_size))
+        stats = pipeline.run(chunks)
+        stats["mode"] = mode
+        stats["workers"] = pipeline.workers
+        
+        self._add_throughput(stats, time.perf_counter() - started, "parallel")
+        self.notify_run(stats)
+        return stats
+    
+    def read_chunks(
+        self,
+        file_path: str,
+        batch_size: int = 1000,
+        skip_chunks: int = 0,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """
+        Read a CSV, Parquet or Arrow IPC file in numbered chunks.
+        
+        Only the columns stored in ``taxi_trips`` are read, and Parquet row
+        groups outside the requested pickup range are never decoded.
+        
+        Args:
+            file_path: Path to the input file
+            batch_size: Number of records in each chunk
+            skip_chunks: Number of leading chunks to skip, used to resume
+                from a checkpoint
+            start_date: Only ingest trips picked up at or after this time
+            end_date: Only ingest trips picked up at or before this time
+        
+        Yields:
+            tuple: (chunk index, DataFrame)
+        """
+        chunks = ChunkReader.read(
+            file_path,
+            batch_size=batch_size,
+            skip_chunks=skip_chunks,
+            columns=[col.name for col in TaxiTrip.__table__.columns],
+            start_date=start_date,
+            end_date=end_date
+        )
+        for index, chunk in enumerate(chunks, start=skip_chunks):
+            yield index, chunk
+    
+    def write_chunk(
+        self,
+        cleaned_chunk: pd.DataFrame,
+        mode: str = "orm",
+        skip_duplicates: bool = False,
+        checkpoint: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Write a cleaned chunk and commit it.
+        
+        Monthly partitions for the chunk's pickup times are created first
+        when the table is partitioned. The hourly rollup, route matrix and
+        hourly sketches are updated in the same transaction as the rows, and
+        commit listeners are called after the commit with the rows that were
+        actually inserted, without any skipped duplicates. Written records are
+        counted in ``ingestion_records_total`` as each chunk commits.
+        
+        Args:
+            cleaned_chunk: Output of ``DataProcessor.clean_data``
+            mode: Load mode, see ``ingest_csv``
+            skip_duplicates: Skip rows whose id is already stored (copy mode)
+            checkpoint: Called with the number of written records before the
+                commit, so progress is recorded in the same transaction
+        
+        Returns:
+            int: Number of records written
+        """
+        try:
+            if 'pickup_datetime' in cleaned_chunk.columns and not cleaned_chunk.empty:
+                months = pd.unique(cleaned_chunk['pickup_datetime'].values.astype('datetime64[M]'))
+                self.partitions.ensure_partitions(pd.to_datetime(months).to_pydatetime())
             
-        return stats
\ No newline at end of file
+            inserted = cleaned_chunk
+            if mode == "copy":
+                if skip_duplicates:
+                    inserted = self._unstored_rows(cleaned_chunk)
+                loaded = self.loader.load(cleaned_chunk, skip_duplicates=skip_duplicates)
+            else:
+                # Convert to models and bulk insert
+                models = self.processor.to_models(cleaned_chunk)
+                self.db.bulk_save_objects(models)
+                loaded = len(models)
+            if loaded == len(cleaned_chunk):
+                self.rollup.apply(cleaned_chunk)
+                self.routes.apply(cleaned_chunk)
+                self.sketches.apply(cleaned_chunk)
+            else:
+                # Some rows were skipped as duplicates; recount their hours
+                self.rollup.rebuild_hours(cleaned_chunk['pickup_datetime'])
+                self.routes.rebuild_days(cleaned_chunk['pickup_datetime'])
+                self.sketches.rebuild_hours(cleaned_chunk['pickup_datetime'])
+            if checkpoint:
+                checkpoint(loaded)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        INGESTION_RECORDS.labels(status="loaded").inc(loaded)
+        self._notify_commit(inserted if loaded != len(cleaned_chunk) else cleaned_chunk)
+        return loaded
+    
+    def _unstored_rows(self, cleaned_chunk: pd.DataFrame) -> pd.DataFrame:
+        """Rows of a chunk whose primary key is not stored yet, first of each key."""
+        keys = ['id', 'pickup_datetime']
+        if cleaned_chunk.empty or not set(keys) <= set(cleaned_chunk.columns):
+            return cleaned_chunk
+        stored = self.db.query(TaxiTrip.id, TaxiTrip.pickup_datetime).filter(
+            TaxiTrip.id.in_(cleaned_chunk['id'].unique().tolist())
+        ).all()
+        stored = pd.MultiIndex.from_arrays(
+            [[trip_id for trip_id, _ in stored], pd.to_datetime([pickup for _, pickup in stored])],
+            names=keys
+        )
+        unstored = ~pd.MultiIndex.from_frame(cleaned_chunk[keys]).isin(stored)
+        return cleaned_chunk[unstored].drop_duplicates(subset=keys)
+    
+    @staticmethod
+    def _notify_commit(cleaned_chunk: pd.DataFrame) -> None:
+        """Call the commit listeners; their failures never fail the load."""
+        for listener in list(_commit_listeners):
+            try:
+                listener(cleaned_chunk)
+            except Exception as e:
+                logger.error(f"Commit listener failed: {str(e)}")
+    
+    @staticmethod
+    def notify_run(stats: dict) -> None:
+        """Call the run listeners; their failures never fail the load."""
+        for listener in list(_run_listeners):
+            try:
+                listener(stats)
+            except Exception as e:
+                logger.error(f"Run listener failed: {str(e)}")
+    
+    @staticmethod
+    def add_rejections(stats: dict, report: Dict[str, int]) -> None:
+        """Accumulate a chunk's per-rule rejection counts into the statistics."""
+        rejected = stats.setdefault("rejected_by_rule", {})
+        for rule, count in report.items():
+            rejected[rule] = rejected.get(rule, 0) + count
+    
+    @staticmethod
+    def _check_input(file_path: str, mode: str) -> None:
+        """Validate the input file and load mode before ingesting."""
+        if not Path(file_path).exists():
+            raise FileNotFoundError(f"Input file not found: {file_path}")
+        ChunkReader.detect_format(file_path)
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode: {mode}")
+    
+    @staticmethod
+    def _add_throughput(stats: dict, elapsed: float, runner: str) -> None:
+        """Record elapsed time and rows/sec in the statistics and the run metrics."""
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["rows_per_second"] = round(stats["processed_records"] / elapsed, 1) if elapsed else 0.0
+        INGESTION_RECORDS.labels(status="failed").inc(stats["failed_records"])
+        INGESTION_ROWS_PER_SECOND.labels(runner=runner).set(stats["rows_per_second"])
@@ -0,0 +1,99 @@
+"""Bulk loading of cleaned trip data into the database."""
+import io
+import pandas as pd
+from typing import List
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip
+
+class BulkLoader:
+    """Writes cleaned DataFrame chunks without building ORM objects.
+    
+    PostgreSQL connections stream each chunk through ``COPY FROM STDIN``;
+    every other dialect (SQLite in tests) falls back to a single
+    ``executemany`` insert per chunk.
+    """
+    
+    def __init__(self, db: Session, table=TaxiTrip.__table__):
+        self.db = db
+        self.table = table
+    
+    def columns_for(self, df: pd.DataFrame) -> List[str]:
+        """Return the table columns present in the DataFrame, in table order."""
+        return [col.name for col in self.table.columns if col.name in df.columns]
+    
+    def load(self, df: pd.DataFrame, skip_duplicates: bool = False) -> int:
+        """
+        Insert a cleaned chunk in the current transaction.
+        
+        Args:
+            df: Cleaned DataFrame whose columns match the table
+            skip_duplicates: Silently skip rows whose primary key already
+                exists, making re-loads of the same chunk idempotent
+        
+        Returns:
+            int: Number of rows written
+        """
+        if df.empty:
+            return 0
+        
+        columns = self.columns_for(df)
+        connection = self.db.connection()
+        
+        if connection.dialect.name == "postgresql":
+            return self._copy(connection, df[columns], columns, skip_duplicates)
+        return self._executemany(connection, df[columns], skip_duplicates)
+    
+    def _copy(
+        self,
+        connection,
+        df: pd.DataFrame,
+        columns: List[str],
+        skip_duplicates: bool
+    ) -> int:
+        """Stream a chunk through COPY FROM STDIN as CSV.
+        
+        COPY cannot skip conflicting rows, so duplicate-tolerant loads copy
+        into a temporary staging table and move rows over with
+        ``INSERT ... ON CONFLICT DO NOTHING``.
+        """
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        
+        column_list = ', '.join(columns)
+        target = self.table.name
+        cursor = connection.connection.cursor()
+        try:
+            if skip_duplicates:
+                target = f"_stage_{self.table.name}"
+                cursor.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {target} "
+                    f"(LIKE {self.table.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                )
+            
+            cursor.copy_expert(
+                f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+            
+            if not skip_duplicates:
+                return len(df)
+            
+            cursor.execute(
+                f"INSERT INTO {self.table.name} ({column_list}) "
+                f"SELECT {column_list} FROM {target} ON CONFLICT DO NOTHING"
+            )
+            inserted = cursor.rowcount
+            cursor.execute(f"TRUNCATE {target}")
+            return inserted
+        finally:
+            cursor.close()
+    
+    def _executemany(self, connection, df: pd.DataFrame, skip_duplicates: bool) -> int:
+        """Insert a chunk with a single executemany call."""
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        statement = self.table.insert()
+        if skip_duplicates:
+            statement = statement.prefix_with("OR IGNORE", dialect="sqlite")
+        result = connection.execute(statement, records)
+        return result.rowcount if result.rowcount >= 0 else len(records)
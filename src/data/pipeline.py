@@ -0,0 +1,127 @@
+"""Parallel, multi-stage ingestion pipeline."""
+import time
+import threading
+import pandas as pd
+from queue import Queue
+from typing import Callable, Dict, Iterator, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from .processor import DataProcessor
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+def _clean_chunk(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int], float]:
+    """Clean a chunk in a worker process and report the time it took."""
+    started = time.perf_counter()
+    cleaned, report = DataProcessor.clean_data_with_report(chunk)
+    return cleaned, report, time.perf_counter() - started
+
+class IngestionPipeline:
+    """Runs parse, clean and write as overlapping stages.
+    
+    A reader thread parses chunks and submits them to a process pool for
+    cleaning. Pending results flow through a bounded queue, so the reader
+    blocks once ``queue_depth`` chunks are waiting (backpressure). The calling
+    thread writes and commits chunks in file order as their results arrive.
+    """
+    
+    def __init__(
+        self,
+        write_chunk: Callable[[pd.DataFrame], int],
+        workers: int = 2,
+        queue_depth: int = 4
+    ):
+        self.write_chunk = write_chunk
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+    
+    def run(self, chunks: Iterator[pd.DataFrame]) -> dict:
+        """
+        Ingest a stream of raw chunks through the pipeline.
+        
+        Args:
+            chunks: Iterator of parsed, uncleaned chunks; it is consumed on
+                the reader thread so parsing overlaps the other stages
+        
+        Returns:
+            dict: Record counts and per-stage timings
+        """
+        stats = {
+            "total_records": 0,
+            "processed_records": 0,
+            "failed_records": 0,
+            "rejected_by_rule": dict.fromkeys(DataProcessor.REJECTION_RULES, 0),
+            "stage_timings": {
+                "parse_seconds": 0.0,
+                "clean_seconds": 0.0,
+                "write_seconds": 0.0,
+                "write_wait_seconds": 0.0
+            }
+        }
+        timings = stats["stage_timings"]
+        queue = Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            reader = threading.Thread(
+                target=self._read,
+                args=(chunks, pool, queue, stop, timings),
+                daemon=True
+            )
+            reader.start()
+            
+            try:
+                while True:
+                    waited = time.perf_counter()
+                    item = queue.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    
+                    size, future = item
+                    try:
+                        cleaned, report, clean_seconds = future.result()
+                        timings["write_wait_seconds"] += time.perf_counter() - waited
+                        timings["clean_seconds"] += clean_seconds
+                        for rule, count in report.items():
+                            stats["rejected_by_rule"][rule] += count
+                        
+                        started = time.perf_counter()
+                        loaded = self.write_chunk(cleaned)
+                        timings["write_seconds"] += time.perf_counter() - started
+                        
+                        stats["processed_records"] += loaded
+                        stats["failed_records"] += size - loaded
+                    except Exception as e:
+                        stats["failed_records"] += size
+                        logger.error(f"Error processing batch: {str(e)}")
+                    
+                    stats["total_records"] += size
+            finally:
+                stop.set()
+                while reader.is_alive():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    reader.join(timeout=0.1)
+        
+        for key, value in timings.items():
+            timings[key] = round(value, 3)
+        return stats
+    
+    def _read(self, chunks, pool, queue, stop, timings) -> None:
+        """Parse chunks and hand them to the process pool."""
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                chunk = next(chunks, None)
+                timings["parse_seconds"] += time.perf_counter() - started
+                if chunk is None:
+                    break
+                queue.put((len(chunk), pool.submit(_clean_chunk, chunk)))
+        except Exception as e:
+            queue.put(e)
+        finally:
+            queue.put(_DONE)
@@ -1,48 +1,182 @@
 """Data processing and ingestion utilities."""
+import numpy as np
 import pandas as pd
-from typing import List
+from typing import Dict, List, Tuple
 from ..database.models import TaxiTrip
+from ..utils.geo import GeoUtils
 
 class DataProcessor:
     """Handles data processing and cleaning operations."""
     
+    # Compact dtypes numeric columns are downcast to once parsed. Files are
+    # read without dtypes, so one malformed value only rejects its own row;
+    # integer columns stay float until cleaning because bad values become NaN
+    COERCE_DTYPES = {
+        'vendor_id': 'float32',
+        'passenger_count': 'float32',
+        'pickup_longitude': 'float32',
+        'pickup_latitude': 'float32',
+        'dropoff_longitude': 'float32',
+        'dropoff_latitude': 'float32'
+    }
+    
+    # Final dtypes of a cleaned chunk
+    CLEAN_DTYPES = {
+        'vendor_id': 'int8',
+        'passenger_count': 'int8',
+        'pickup_longitude': 'float32',
+        'pickup_latitude': 'float32',
+        'dropoff_longitude': 'float32',
+        'dropoff_latitude': 'float32'
+    }
+    
+    DATETIME_COLUMNS = ['pickup_datetime', 'dropoff_datetime']
+    
+    REQUIRED_COLUMNS = [
+        'id',
+        'vendor_id',
+        'pickup_datetime',
+        'passenger_count',
+        'pickup_longitude',
+        'pickup_latitude',
+        'dropoff_longitude',
+        'dropoff_latitude'
+    ]
+    
+    MAX_PASSENGERS = 9
+    MAX_TRIP_DURATION = 86400  # 24 hours
+    
+    REJECTION_RULES = [
+        'malformed_values',
+        'missing_values',
+        'pickup_outside_nyc',
+        'dropoff_outside_nyc',
+        'invalid_passenger_count',
+        'invalid_trip_duration'
+    ]
+    
     @staticmethod
     def clean_data(df: pd.DataFrame) -> pd.DataFrame:
         """Clean and preprocess the taxi trip data."""
-        # Remove rows with missing values
-        df = df.dropna()
+        cleaned, _ = DataProcessor.clean_data_with_report(df)
+        return cleaned
+    
+    @staticmethod
+    def clean_data_with_report(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """
+        Clean the taxi trip data and count rejected rows per rule.
+        
+        Every rule is a vectorized boolean mask. A row is attributed to the
+        first rule it fails, in the order of ``REJECTION_RULES``, so the
+        counts add up to the number of dropped rows.
         
+        Args:
+            df: Raw chunk of trip data
+        
+        Returns:
+            tuple: (cleaned DataFrame, rejected row count per rule)
+        """
         # Remove suffix from column names if they exist
-        df.columns = [col.split('__')[0] for col in df.columns]
+        df = df.rename(columns=lambda col: col.split('__')[0])
+        df, malformed = DataProcessor._coerce_types(df)
+        
+        report = dict.fromkeys(DataProcessor.REJECTION_RULES, 0)
+        keep = np.ones(len(df), dtype=bool)
+        
+        def apply_rule(rule: str, valid: np.ndarray) -> None:
+            nonlocal keep
+            report[rule] = int(np.count_nonzero(keep & ~valid))
+            keep &= valid
+        
+        # Remove rows with values that are not numbers or dates
+        apply_rule('malformed_values', ~malformed)
+        
+        # Remove rows with missing values in the stored columns
+        required = [col for col in DataProcessor.REQUIRED_COLUMNS if col in df.columns]
+        apply_rule('missing_values', df[required].notna().all(axis=1).to_numpy())
         
-        # Remove trips with invalid coordinates
-        df = df[
-            (df['pickup_longitude'] != 0) &
-            (df['pickup_latitude'] != 0) &
-            (df['dropoff_longitude'] != 0) &
-            (df['dropoff_latitude'] != 0)
-        ]
+        # Remove trips that start or end outside New York City
+        for prefix in ('pickup', 'dropoff'):
+            lat, lon = f'{prefix}_latitude', f'{prefix}_longitude'
+            if lat in df.columns and lon in df.columns:
+                apply_rule(
+                    f'{prefix}_outside_nyc',
+                    GeoUtils.coordinates_mask(df[lat], df[lon], GeoUtils.NYC_BOUNDS)
+                )
+        
+        if 'passenger_count' in df.columns:
+            passengers = df['passenger_count'].to_numpy(dtype=np.float64, na_value=np.nan)
+            apply_rule(
+                'invalid_passenger_count',
+                (passengers >= 1) & (passengers <= DataProcessor.MAX_PASSENGERS)
+            )
+        
+        if 'trip_duration' in df.columns:
+            durations = pd.to_numeric(df['trip_duration'], errors='coerce').to_numpy(dtype=np.float64)
+            apply_rule(
+                'invalid_trip_duration',
+                (durations > 0) & (durations <= DataProcessor.MAX_TRIP_DURATION)
+            )
+        
+        df = df[keep]
         
         # Ensure id column starts with 'id'
         if 'id' in df.columns:
-            df['id'] = df['id'].apply(lambda x: f"id{x}" if not str(x).startswith('id') else x)
+            ids = df['id'].astype(str)
+            df = df.assign(id=np.where(ids.str.startswith('id'), ids, 'id' + ids))
         
-        return df
+        dtypes = {col: dtype for col, dtype in DataProcessor.CLEAN_DTYPES.items() if col in df.columns}
+        return DataProcessor.add_trip_distance(DataProcessor.add_grid_cells(df.astype(dtypes))), report
+    
+    @staticmethod
+    def add_grid_cells(df: pd.DataFrame) -> pd.DataFrame:
+        """Add the pickup and dropoff grid cell columns used for spatial queries."""
+        cells = {}
+        for prefix in ('pickup', 'dropoff'):
+            lat, lon = f'{prefix}_latitude', f'{prefix}_longitude'
+            if lat in df.columns and lon in df.columns:
+                cells[f'{prefix}_cell'] = GeoUtils.grid_cell(df[lat], df[lon])
+        return df.assign(**cells) if cells else df
+    
+    @staticmethod
+    def add_trip_distance(df: pd.DataFrame) -> pd.DataFrame:
+        """Add the haversine pickup-to-dropoff distance in kilometers."""
+        coordinates = ['pickup_latitude', 'pickup_longitude', 'dropoff_latitude', 'dropoff_longitude']
+        if not all(col in df.columns for col in coordinates):
+            return df
+        distances = GeoUtils.haversine_array(*(df[col] for col in coordinates))
+        return df.assign(trip_distance_km=distances.astype('float32'))
+    
+    @staticmethod
+    def _coerce_types(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Parse numeric and ``DATETIME_COLUMNS``, downcasting numbers to ``COERCE_DTYPES``.
+        
+        Returns:
+            tuple: (DataFrame with unparseable values set to NaN/NaT, mask
+                of the rows that held such a value)
+        """
+        malformed = np.zeros(len(df), dtype=bool)
+        converted = {}
+        for col, dtype in DataProcessor.COERCE_DTYPES.items():
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                parsed = pd.to_numeric(values, errors='coerce')
+                malformed |= (parsed.isna() & values.notna()).to_numpy()
+                values = parsed
+            converted[col] = values.astype(dtype)
+        for col in DataProcessor.DATETIME_COLUMNS:
+            if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                parsed = pd.to_datetime(df[col], errors='coerce')
+                malformed |= (parsed.isna() & df[col].notna()).to_numpy()
+                converted[col] = parsed
+        return (df.assign(**converted) if converted else df), malformed
     
     @staticmethod
     def to_models(df: pd.DataFrame) -> List[TaxiTrip]:
         """Convert DataFrame rows to TaxiTrip models."""
-        models = []
-        for _, row in df.iterrows():
-            trip = TaxiTrip(
-                id=row['id'],
-                vendor_id=row['vendor_id'],
-                pickup_datetime=row['pickup_datetime'],
-                passenger_count=row['passenger_count'],
-                pickup_longitude=row['pickup_longitude'],
-                pickup_latitude=row['pickup_latitude'],
-                dropoff_longitude=row['dropoff_longitude'],
-                dropoff_latitude=row['dropoff_latitude']
-            )
-            models.append(trip)
-        return models
\ No newline at end of file
+        columns = [col.name for col in TaxiTrip.__table__.columns if col.name in df.columns]
+        records = df[columns].astype(object).where(df[columns].notna(), None).to_dict('records')
+        return [TaxiTrip(**record) for record in records]
@@ -0,0 +1,277 @@
+"""Hourly trip rollup maintained alongside ingestion."""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func, literal_column, select, delete, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip, TripHourlyRollup
+
+BUCKET = timedelta(hours=1)
+
+# Stored for trips without coordinates, since the cell is part of the key
+UNKNOWN_CELL = -1
+
+KEY_COLUMNS = ['hour_bucket', 'vendor_id', 'pickup_cell']
+SUM_COLUMNS = ['trip_count', 'passenger_sum', 'duration_sum', 'duration_count']
+
+DateRange = Tuple[Optional[datetime], Optional[datetime]]
+
+class HourlyRollup:
+    """Keeps ``trip_hourly_rollup`` in step with ``taxi_trips``.
+    
+    Chunks are added with an upsert in the same transaction as the rows
+    they summarise, so the rollup never counts uncommitted trips.
+    """
+    
+    UPSERT_DIALECTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert
+    }
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+    
+    @staticmethod
+    def floor_hour(value: datetime) -> datetime:
+        """Truncate a timestamp to the start of its hour."""
+        return value.replace(minute=0, second=0, microsecond=0)
+    
+    @staticmethod
+    def canonical_range(
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> DateRange:
+        """
+        Widen an inclusive range to whole hour buckets.
+        
+        The start is rounded down and the end up to an hour boundary, so
+        near-identical ranges map to the same range and the rollup answers
+        it without scanning raw trips at the edges.
+        
+        Returns:
+            tuple: (start, inclusive end) on hour boundaries
+        """
+        if start_date is not None:
+            start_date = HourlyRollup.floor_hour(start_date)
+        if end_date is not None:
+            stop = HourlyRollup.floor_hour(end_date)
+            if stop < end_date:
+                stop += BUCKET
+            if start_date is not None and stop <= start_date:
+                stop = start_date + BUCKET
+            end_date = stop - timedelta(microseconds=1)
+        return start_date, end_date
+    
+    @staticmethod
+    def split_range(
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Tuple[Optional[DateRange], List[DateRange]]:
+        """
+        Split an inclusive pickup range into whole hours and partial edges.
+        
+        All returned ranges are half-open, [start, end), with None meaning
+        unbounded.
+        
+        Args:
+            start_date: Start of the range, unbounded if None
+            end_date: End of the range (inclusive), unbounded if None
+        
+        Returns:
+            tuple: (range of whole hour buckets or None, list of raw ranges
+                for the partial hours at the edges)
+        """
+        # Timestamps have microsecond resolution, so this makes the end exclusive
+        stop = end_date + timedelta(microseconds=1) if end_date is not None else None
+        
+        bucket_start = None
+        if start_date is not None:
+            bucket_start = HourlyRollup.floor_hour(start_date)
+            if bucket_start < start_date:
+                bucket_start += BUCKET
+        bucket_end = HourlyRollup.floor_hour(stop) if stop is not None else None
+        
+        if bucket_start is not None and bucket_end is not None and bucket_start >= bucket_end:
+            return None, [(start_date, stop)]
+        
+        edges = []
+        if start_date is not None and start_date < bucket_start:
+            edges.append((start_date, bucket_start))
+        if stop is not None and bucket_end < stop:
+            edges.append((bucket_end, stop))
+        return (bucket_start, bucket_end), edges
+    
+    @staticmethod
+    def plan(
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        use_rollup: bool = True
+    ) -> Tuple[Optional[DateRange], List[DateRange]]:
+        """Split a range like ``split_range``, or scan it all raw without the rollup."""
+        if use_rollup:
+            return HourlyRollup.split_range(start_date, end_date)
+        stop = end_date + timedelta(microseconds=1) if end_date is not None else None
+        return None, [(start_date, stop)]
+    
+    @staticmethod
+    def range_filter(column, date_range: DateRange) -> list:
+        """Build the conditions selecting a half-open range on a column."""
+        start, end = date_range
+        conditions = []
+        if start is not None:
+            conditions.append(column >= start)
+        if end is not None:
+            conditions.append(column < end)
+        return conditions
+    
+    @staticmethod
+    def aggregate(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Summarise cleaned trips per hour, vendor and pickup cell.
+        
+        Args:
+            df: Cleaned chunk of trip data
+        
+        Returns:
+            DataFrame: One row per key with the rollup sums
+        """
+        durations = df['trip_duration'] if 'trip_duration' in df.columns else pd.Series(np.nan, index=df.index)
+        cells = df['pickup_cell'] if 'pickup_cell' in df.columns else pd.Series(UNKNOWN_CELL, index=df.index)
+        frame = pd.DataFrame({
+            'hour_bucket': pd.to_datetime(df['pickup_datetime']).dt.floor('H'),
+            'vendor_id': df['vendor_id'].astype('int64'),
+            'pickup_cell': cells.fillna(UNKNOWN_CELL).astype('int64'),
+            'passenger_count': pd.to_numeric(df['passenger_count']).fillna(0),
+            'trip_duration': pd.to_numeric(durations)
+        })
+        grouped = frame.groupby(KEY_COLUMNS).agg(
+            trip_count=('vendor_id', 'size'),
+            passenger_sum=('passenger_count', 'sum'),
+            duration_sum=('trip_duration', 'sum'),
+            duration_count=('trip_duration', 'count')
+        )
+        return grouped.astype('int64').reset_index()
+    
+    def apply(self, df: pd.DataFrame) -> int:
+        """
+        Add a chunk of newly inserted trips to the rollup without committing.
+        
+        Dialects without an upsert recompute the touched hours instead.
+        
+        Args:
+            df: Cleaned trips that were inserted in the current transaction
+        
+        Returns:
+            int: Number of rollup rows written
+        """
+        if df.empty:
+            return 0
+        if self.dialect not in self.UPSERT_DIALECTS:
+            return self.rebuild_hours(df['pickup_datetime'])
+        
+        summary = self.aggregate(df)
+        records = summary.astype(object).to_dict('records')
+        for record in records:
+            record['hour_bucket'] = record['hour_bucket'].to_pydatetime()
+        
+        table = TripHourlyRollup.__table__
+        statement = self.UPSERT_DIALECTS[self.dialect](table)
+        statement = statement.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={col: table.c[col] + statement.excluded[col] for col in SUM_COLUMNS}
+        )
+        self.db.execute(statement, records)
+        return len(records)
+    
+    def rebuild_hours(self, timestamps: Iterable[datetime]) -> int:
+        """
+        Recompute the rollup for the hours containing the given timestamps.
+        
+        Used when a chunk's inserted rows are not known exactly, e.g. when
+        duplicates were skipped. Does not commit.
+        
+        Returns:
+            int: Number of rollup rows written
+        """
+        hours = sorted({self.floor_hour(pd.Timestamp(value).to_pydatetime()) for value in timestamps})
+        if not hours:
+            return 0
+        
+        table = TripHourlyRollup.__table__
+        hour_filter = or_(*[
+            (TaxiTrip.pickup_datetime >= hour) & (TaxiTrip.pickup_datetime < hour + BUCKET)
+            for hour in hours
+        ])
+        self.db.execute(delete(table).where(table.c.hour_bucket.in_(hours)))
+        return self._insert_from_trips(hour_filter)
+    
+    def rebuild(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> int:
+        """
+        Recompute the rollup from raw trips for the hours in a range and commit.
+        
+        Args:
+            start_date: Start of the range, rounded down to the hour
+            end_date: End of the range, rounded up to the hour
+        
+        Returns:
+            int: Number of rollup rows written
+        """
+        table = TripHourlyRollup.__table__
+        conditions = []
+        cleanup = delete(table)
+        if start_date is not None:
+            start_date = self.floor_hour(start_date)
+            conditions.append(TaxiTrip.pickup_datetime >= start_date)
+            cleanup = cleanup.where(table.c.hour_bucket >= start_date)
+        if end_date is not None:
+            end_date = self.floor_hour(end_date) + BUCKET
+            conditions.append(TaxiTrip.pickup_datetime < end_date)
+            cleanup = cleanup.where(table.c.hour_bucket < end_date)
+        
+        try:
+            self.db.execute(cleanup)
+            written = self._insert_from_trips(*conditions)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return written
+    
+    def hour_bucket(self, column):
+        """SQL expression truncating a timestamp column to its hour."""
+        if self.dialect == "sqlite":
+            # Same text layout SQLAlchemy uses for DateTime values on SQLite
+            return func.strftime('%Y-%m-%d %H:00:00.000000', column)
+        return func.date_trunc('hour', column)
+    
+    def _insert_from_trips(self, *conditions) -> int:
+        """Insert rollup rows aggregated from the trips matching the conditions."""
+        bucket = self.hour_bucket(TaxiTrip.pickup_datetime).label('hour_bucket')
+        cell = func.coalesce(TaxiTrip.pickup_cell, UNKNOWN_CELL).label('pickup_cell')
+        query = select(
+            bucket,
+            TaxiTrip.vendor_id,
+            cell,
+            func.count().label('trip_count'),
+            func.coalesce(func.sum(TaxiTrip.passenger_count), 0).label('passenger_sum'),
+            func.coalesce(func.sum(TaxiTrip.trip_duration), 0).label('duration_sum'),
+            func.count(TaxiTrip.trip_duration).label('duration_count')
+        ).where(
+            TaxiTrip.pickup_datetime.isnot(None),
+            TaxiTrip.vendor_id.isnot(None),
+            *conditions
+        ).group_by(
+            # Positional, so the hour expression is not repeated with new parameters
+            literal_column('1'), literal_column('2'), literal_column('3')
+        )
+        
+        table = TripHourlyRollup.__table__
+        result = self.db.execute(table.insert().from_select(KEY_COLUMNS + SUM_COLUMNS, query))
+        return result.rowcount
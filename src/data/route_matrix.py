@@ -0,0 +1,199 @@
+"""Origin-destination route matrix maintained alongside ingestion."""
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+from sqlalchemy import Date, cast, delete, func, literal_column, select, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip, TripRouteMatrix
+from ..utils.geo import GeoUtils
+
+DEFAULT_RESOLUTIONS = (6, 8)
+
+KEY_COLUMNS = ['resolution', 'day_bucket', 'vendor_id', 'pickup_cell', 'dropoff_cell']
+SUM_COLUMNS = ['trip_count', 'duration_sum', 'duration_count']
+
+class RouteMatrix:
+    """Keeps ``trip_route_matrix`` in step with ``taxi_trips``.
+    
+    A route is a (pickup cell, dropoff cell) pair at one of the configured
+    grid resolutions. Like ``HourlyRollup``, chunks are added with an
+    upsert in the same transaction as the trips they count.
+    """
+    
+    UPSERT_DIALECTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert
+    }
+    
+    def __init__(self, db: Session, resolutions: Sequence[int] = DEFAULT_RESOLUTIONS):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+        self.resolutions = sorted(set(resolutions))
+        if any(not 0 <= r <= GeoUtils.GRID_RESOLUTION for r in self.resolutions):
+            raise ValueError(f"Route resolutions must be between 0 and {GeoUtils.GRID_RESOLUTION}")
+    
+    @staticmethod
+    def aggregate(df: pd.DataFrame, resolution: int) -> pd.DataFrame:
+        """
+        Count cleaned trips per day, vendor and route at one resolution.
+        
+        Trips without both grid cells are left out.
+        
+        Args:
+            df: Cleaned chunk of trip data
+            resolution: Grid resolution of the routes
+        
+        Returns:
+            DataFrame: One row per key with the matrix sums
+        """
+        df = df.dropna(subset=['pickup_cell', 'dropoff_cell', 'vendor_id', 'pickup_datetime'])
+        durations = df['trip_duration'] if 'trip_duration' in df.columns else pd.Series(float('nan'), index=df.index)
+        frame = pd.DataFrame({
+            'day_bucket': pd.to_datetime(df['pickup_datetime']).dt.floor('D'),
+            'vendor_id': df['vendor_id'].astype('int64'),
+            'pickup_cell': GeoUtils.coarsen_cell(df['pickup_cell'], resolution),
+            'dropoff_cell': GeoUtils.coarsen_cell(df['dropoff_cell'], resolution),
+            'trip_duration': pd.to_numeric(durations)
+        }, index=df.index)
+        grouped = frame.groupby(KEY_COLUMNS[1:]).agg(
+            trip_count=('vendor_id', 'size'),
+            duration_sum=('trip_duration', 'sum'),
+            duration_count=('trip_duration', 'count')
+        ).astype('int64').reset_index()
+        grouped.insert(0, 'resolution', resolution)
+        return grouped
+    
+    def apply(self, df: pd.DataFrame) -> int:
+        """
+        Add a chunk of newly inserted trips to the matrix without committing.
+        
+        Dialects without an upsert recompute the touched days instead.
+        
+        Args:
+            df: Cleaned trips that were inserted in the current transaction
+        
+        Returns:
+            int: Number of matrix rows written
+        """
+        if df.empty or 'pickup_cell' not in df.columns or 'dropoff_cell' not in df.columns:
+            return 0
+        if self.dialect not in self.UPSERT_DIALECTS:
+            return self.rebuild_days(df['pickup_datetime'])
+        
+        records = []
+        for resolution in self.resolutions:
+            summary = self.aggregate(df, resolution)
+            summary['day_bucket'] = summary['day_bucket'].dt.date
+            records.extend(summary.astype(object).to_dict('records'))
+        if not records:
+            return 0
+        
+        table = TripRouteMatrix.__table__
+        statement = self.UPSERT_DIALECTS[self.dialect](table)
+        statement = statement.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={col: table.c[col] + statement.excluded[col] for col in SUM_COLUMNS}
+        )
+        self.db.execute(statement, records)
+        return len(records)
+    
+    def rebuild_days(self, timestamps: Iterable[datetime]) -> int:
+        """
+        Recompute the matrix for the days containing the given timestamps.
+        
+        Does not commit.
+        
+        Returns:
+            int: Number of matrix rows written
+        """
+        days = sorted({pd.Timestamp(value).date() for value in timestamps})
+        if not days:
+            return 0
+        
+        written = 0
+        for day in days:
+            start = datetime.combine(day, datetime.min.time())
+            written += self._replace(start, start + timedelta(days=1))
+        return written
+    
+    def rebuild(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> int:
+        """
+        Recompute the matrix from raw trips for the days in a range and commit.
+        
+        Args:
+            start_date: Start of the range, rounded down to the day
+            end_date: End of the range, rounded up to the day
+        
+        Returns:
+            int: Number of matrix rows written
+        """
+        start = datetime.combine(start_date.date(), datetime.min.time()) if start_date else None
+        stop = datetime.combine(end_date.date(), datetime.min.time()) + timedelta(days=1) if end_date else None
+        try:
+            written = self._replace(start, stop)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return written
+    
+    def day_bucket(self, column):
+        """SQL expression truncating a timestamp column to its date."""
+        if self.dialect == "sqlite":
+            # Same text layout SQLAlchemy uses for Date values on SQLite
+            return func.date(column)
+        return cast(column, Date)
+    
+    @staticmethod
+    def coarsen(column, resolution: int):
+        """SQL equivalent of ``GeoUtils.coarsen_cell``."""
+        base = GeoUtils.GRID_RESOLUTION
+        shift = base - resolution
+        lat_index = column.op('>>')(base + 9 + shift)
+        lon_index = column.op('&')((1 << (base + 9)) - 1).op('>>')(shift)
+        return lat_index.op('<<')(resolution + 9).op('|')(lon_index)
+    
+    def _replace(self, start: Optional[datetime], stop: Optional[datetime]) -> int:
+        """Delete and re-insert the matrix rows for a half-open range of days."""
+        table = TripRouteMatrix.__table__
+        cleanup = delete(table).where(table.c.resolution.in_(self.resolutions))
+        conditions = []
+        if start is not None:
+            cleanup = cleanup.where(table.c.day_bucket >= start.date())
+            conditions.append(TaxiTrip.pickup_datetime >= start)
+        if stop is not None:
+            cleanup = cleanup.where(table.c.day_bucket < stop.date())
+            conditions.append(TaxiTrip.pickup_datetime < stop)
+        self.db.execute(cleanup)
+        
+        written = 0
+        for resolution in self.resolutions:
+            query = select(
+                literal_column(str(int(resolution))).label('resolution'),
+                self.day_bucket(TaxiTrip.pickup_datetime).label('day_bucket'),
+                TaxiTrip.vendor_id,
+                self.coarsen(TaxiTrip.pickup_cell, resolution).label('pickup_cell'),
+                self.coarsen(TaxiTrip.dropoff_cell, resolution).label('dropoff_cell'),
+                func.count().label('trip_count'),
+                func.coalesce(func.sum(TaxiTrip.trip_duration), 0).label('duration_sum'),
+                func.count(TaxiTrip.trip_duration).label('duration_count')
+            ).where(
+                and_(
+                    TaxiTrip.pickup_datetime.isnot(None),
+                    TaxiTrip.vendor_id.isnot(None),
+                    TaxiTrip.pickup_cell.isnot(None),
+                    TaxiTrip.dropoff_cell.isnot(None),
+                    *conditions
+                )
+            ).group_by(
+                # Positional, so the bucket and cell expressions are not repeated
+                literal_column('2'), literal_column('3'), literal_column('4'), literal_column('5')
+            )
+            result = self.db.execute(table.insert().from_select(KEY_COLUMNS + SUM_COLUMNS, query))
+            written += result.rowcount
+        return written
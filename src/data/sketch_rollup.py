@@ -0,0 +1,236 @@
+"""Hourly trip sketches maintained alongside ingestion."""
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..database.models import TaxiTrip, TripHourlySketch
+from ..utils.sketches import CountMinSketch, HyperLogLog, QuantileSketch
+from .rollup import BUCKET, HourlyRollup
+
+# Sketch parameters; stored sketches can only be merged with equal ones
+HLL_PRECISION = 12
+QUANTILE_ACCURACY = 0.01
+HOT_ROUTE_WIDTH = 1024
+HOT_ROUTE_DEPTH = 4
+HOT_ROUTE_CANDIDATES = 64
+
+SKETCH_COLUMNS = ['routes', 'durations', 'distances', 'hot_routes']
+
+# Raw trips are read one window at a time when rebuilding
+REBUILD_WINDOW = timedelta(days=1)
+
+TRIP_COLUMNS = [
+    TaxiTrip.pickup_datetime,
+    TaxiTrip.pickup_cell,
+    TaxiTrip.dropoff_cell,
+    TaxiTrip.trip_duration,
+    TaxiTrip.trip_distance_km
+]
+
+class TripSketch:
+    """Mergeable summary of a set of trips.
+    
+    Holds the exact trip count, a HyperLogLog of distinct (pickup cell,
+    dropoff cell) routes, quantile sketches of durations and distances and
+    a count-min sketch of route frequencies.
+    """
+    
+    def __init__(self):
+        self.trip_count = 0
+        self.routes = HyperLogLog(HLL_PRECISION)
+        self.durations = QuantileSketch(QUANTILE_ACCURACY)
+        self.distances = QuantileSketch(QUANTILE_ACCURACY)
+        self.hot_routes = CountMinSketch(HOT_ROUTE_WIDTH, HOT_ROUTE_DEPTH, top_k=HOT_ROUTE_CANDIDATES)
+    
+    def add(self, df: pd.DataFrame) -> "TripSketch":
+        """Add cleaned trips; missing columns are skipped."""
+        self.trip_count += len(df)
+        if 'pickup_cell' in df.columns and 'dropoff_cell' in df.columns:
+            routes = df[['pickup_cell', 'dropoff_cell']].dropna().to_numpy(dtype=np.int64)
+            self.routes.add(routes)
+            self.hot_routes.add(routes)
+        if 'trip_duration' in df.columns:
+            self.durations.add(pd.to_numeric(df['trip_duration'], errors='coerce'))
+        if 'trip_distance_km' in df.columns:
+            self.distances.add(pd.to_numeric(df['trip_distance_km'], errors='coerce'))
+        return self
+    
+    def merge(self, other: "TripSketch") -> "TripSketch":
+        """Combine with another summary in place."""
+        self.trip_count += other.trip_count
+        for name in SKETCH_COLUMNS:
+            getattr(self, name).merge(getattr(other, name))
+        return self
+    
+    def to_row(self) -> dict:
+        """Column values for ``trip_hourly_sketch``."""
+        row = {name: getattr(self, name).to_bytes() for name in SKETCH_COLUMNS}
+        row['trip_count'] = self.trip_count
+        return row
+    
+    @classmethod
+    def from_row(cls, row) -> "TripSketch":
+        """Load a ``trip_hourly_sketch`` row; empty columns give empty sketches."""
+        sketch = cls()
+        sketch.trip_count = int(row.trip_count or 0)
+        if row.routes is not None:
+            sketch.routes = HyperLogLog.from_bytes(row.routes)
+        if row.durations is not None:
+            sketch.durations = QuantileSketch.from_bytes(row.durations, QUANTILE_ACCURACY)
+        if row.distances is not None:
+            sketch.distances = QuantileSketch.from_bytes(row.distances, QUANTILE_ACCURACY)
+        if row.hot_routes is not None:
+            sketch.hot_routes = CountMinSketch.from_bytes(row.hot_routes)
+        return sketch
+
+class HourlySketches:
+    """Keeps ``trip_hourly_sketch`` in step with ``taxi_trips``.
+    
+    Sketches cannot be added with SQL arithmetic, so chunks are merged
+    into the stored rows in Python. The rows are locked first, so
+    concurrent ingestion workers touching the same hour serialise instead
+    of losing updates.
+    """
+    
+    UPSERT_DIALECTS = {
+        "postgresql": postgresql.insert,
+        "sqlite": sqlite.insert
+    }
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+    
+    @staticmethod
+    def summarize(df: pd.DataFrame) -> Dict[datetime, TripSketch]:
+        """
+        Build one sketch per pickup hour.
+        
+        Args:
+            df: Cleaned chunk of trip data
+        
+        Returns:
+            dict: Sketch per hour bucket
+        """
+        if df.empty:
+            return {}
+        hours = pd.to_datetime(df['pickup_datetime']).dt.floor('H')
+        return {
+            hour.to_pydatetime(): TripSketch().add(group)
+            for hour, group in df.groupby(hours)
+        }
+    
+    def apply(self, df: pd.DataFrame) -> int:
+        """
+        Merge a chunk of newly inserted trips into the stored sketches without committing.
+        
+        Dialects without an upsert recompute the touched hours instead.
+        
+        Args:
+            df: Cleaned trips that were inserted in the current transaction
+        
+        Returns:
+            int: Number of sketch rows written
+        """
+        if df.empty:
+            return 0
+        if self.dialect not in self.UPSERT_DIALECTS:
+            return self.rebuild_hours(df['pickup_datetime'])
+        
+        sketches = self.summarize(df)
+        table = TripHourlySketch.__table__
+        # Create missing rows first so every touched hour can be locked
+        self.db.execute(
+            self.UPSERT_DIALECTS[self.dialect](table).on_conflict_do_nothing(index_elements=['hour_bucket']),
+            [{'hour_bucket': hour, 'trip_count': 0} for hour in sketches]
+        )
+        stored = self.db.execute(
+            select(table).where(table.c.hour_bucket.in_(list(sketches))).with_for_update()
+        ).all()
+        
+        records = []
+        for row in stored:
+            record = TripSketch.from_row(row).merge(sketches[row.hour_bucket]).to_row()
+            record['bucket'] = row.hour_bucket
+            records.append(record)
+        self.db.execute(
+            table.update().where(table.c.hour_bucket == bindparam('bucket')),
+            records
+        )
+        return len(records)
+    
+    def rebuild_hours(self, timestamps: Iterable[datetime]) -> int:
+        """
+        Recompute the sketches for the hours containing the given timestamps.
+        
+        Does not commit.
+        
+        Returns:
+            int: Number of sketch rows written
+        """
+        hours = sorted({HourlyRollup.floor_hour(pd.Timestamp(value).to_pydatetime()) for value in timestamps})
+        return sum(self._replace(hour, hour + BUCKET) for hour in hours)
+    
+    def rebuild(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> int:
+        """
+        Recompute the sketches from raw trips for the hours in a range and commit.
+        
+        Args:
+            start_date: Start of the range, rounded down to the hour
+            end_date: End of the range, rounded up to the hour
+        
+        Returns:
+            int: Number of sketch rows written
+        """
+        start = HourlyRollup.floor_hour(start_date) if start_date is not None else None
+        stop = HourlyRollup.floor_hour(end_date) + BUCKET if end_date is not None else None
+        try:
+            written = self._replace(start, stop)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return written
+    
+    def _replace(self, start: Optional[datetime], stop: Optional[datetime]) -> int:
+        """Delete and rebuild the sketches for a half-open range of whole hours."""
+        table = TripHourlySketch.__table__
+        self.db.execute(delete(table).where(*HourlyRollup.range_filter(table.c.hour_bucket, (start, stop))))
+        
+        if start is None or stop is None:
+            first, last = self.db.execute(
+                select(func.min(TaxiTrip.pickup_datetime), func.max(TaxiTrip.pickup_datetime)).where(
+                    *HourlyRollup.range_filter(TaxiTrip.pickup_datetime, (start, stop))
+                )
+            ).one()
+            if first is None:
+                return 0
+            start = start if start is not None else HourlyRollup.floor_hour(first)
+            stop = stop if stop is not None else HourlyRollup.floor_hour(last) + BUCKET
+        
+        written = 0
+        # Windows keep memory bounded by the trips of one window
+        while start < stop:
+            window_stop = min(start + REBUILD_WINDOW, stop)
+            rows = self.db.execute(
+                select(*TRIP_COLUMNS).where(
+                    *HourlyRollup.range_filter(TaxiTrip.pickup_datetime, (start, window_stop))
+                )
+            ).all()
+            trips = pd.DataFrame(rows, columns=[column.key for column in TRIP_COLUMNS])
+            records = [
+                {'hour_bucket': hour, **sketch.to_row()}
+                for hour, sketch in self.summarize(trips).items()
+            ]
+            if records:
+                self.db.execute(table.insert(), records)
+            written += len(records)
+            start = window_stop
+        return written
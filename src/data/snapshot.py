@@ -0,0 +1,140 @@
+"""Versioned, memory-mapped snapshots of the hot trip store."""
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+from .hot_store import COLUMNS, Segment
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+
+# Bumped when the file layout changes; older snapshots are ignored
+SNAPSHOT_FORMAT = 1
+
+class TripSnapshots:
+    """A directory of immutable trip snapshots shared by the workers of a host.
+    
+    Layout::
+        
+        <root>/CURRENT                    name of the live version
+        <root>/<version>/manifest.json    coverage, row count and dtypes
+        <root>/<version>/<column>.npy     one array per column
+    
+    A version is written under a hidden name and renamed into place, then
+    ``CURRENT`` is replaced with ``os.replace``, so readers see either the
+    old or the new snapshot and never a partial one. Columns are opened
+    with ``np.load(mmap_mode='r')``, so every worker shares the same pages
+    in the OS cache. Old versions are deleted after ``keep`` newer ones
+    exist; workers still mapping them keep reading their pages until they
+    unmap.
+    """
+    
+    def __init__(self, root: str, keep: int = 3):
+        self.root = Path(root)
+        self.keep = keep
+    
+    def current(self) -> Optional[dict]:
+        """
+        Read the manifest of the live snapshot.
+        
+        Returns:
+            dict: Manifest, or None if there is no readable snapshot
+        """
+        try:
+            version = (self.root / CURRENT).read_text().strip()
+            manifest = json.loads((self.root / version / MANIFEST).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('columns') != self._dtypes():
+            logger.warning(f"Ignoring trip snapshot {version} with an incompatible layout")
+            return None
+        return manifest
+    
+    def open(self, manifest: dict) -> Segment:
+        """Map the columns of a snapshot read-only."""
+        directory = self.root / manifest['version']
+        return {
+            name: np.load(directory / f"{name}.npy", mmap_mode='r')
+            for name in COLUMNS
+        }
+    
+    def write(self, segment: Segment, covered_from: int) -> dict:
+        """
+        Write a segment as a new version and make it the live snapshot.
+        
+        Args:
+            segment: Columns sorted by pickup time
+            covered_from: Earliest pickup time, in microseconds, from which
+                the segment holds every trip
+        
+        Returns:
+            dict: Manifest of the new snapshot
+        """
+        version = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+        staging = self.root / f".{version}"
+        staging.mkdir(parents=True)
+        for name in COLUMNS:
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(segment[name]))
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'version': version,
+            'created_at': time.time(),
+            'covered_from': int(covered_from),
+            'row_count': int(len(segment['pickup_datetime'])),
+            'columns': self._dtypes()
+        }
+        (staging / MANIFEST).write_text(json.dumps(manifest))
+        os.replace(staging, self.root / version)
+        
+        pointer = self.root / f".{CURRENT}.{version}"
+        pointer.write_text(version)
+        os.replace(pointer, self.root / CURRENT)
+        logger.info(f"Published trip snapshot {version} with {manifest['row_count']} trips")
+        
+        self._prune(version)
+        return manifest
+    
+    @contextmanager
+    def exclusive(self) -> Iterator[bool]:
+        """Try to take the export lock without waiting; yields whether it was taken."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def versions(self) -> list:
+        """Published versions, oldest first."""
+        if not self.root.exists():
+            return []
+        return sorted(
+            path.name for path in self.root.iterdir()
+            if path.is_dir() and not path.name.startswith('.')
+        )
+    
+    def _prune(self, live: str) -> None:
+        """Delete all but the newest ``keep`` versions, never the live one."""
+        for version in self.versions()[:-self.keep]:
+            if version != live:
+                shutil.rmtree(self.root / version, ignore_errors=True)
+    
+    @staticmethod
+    def _dtypes() -> dict:
+        """Column dtypes as stored in the manifest."""
+        return {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}
@@ -1,5 +1,6 @@
 """Database models for the TaxiTripDataService."""
-from sqlalchemy import Column, Integer, Float, String, DateTime
+from datetime import datetime
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, Float, String, Date, DateTime, Text, LargeBinary, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -8,14 +9,39 @@ class TaxiTrip(Base):
     """Model representing a taxi trip."""
     __tablename__ = 'taxi_trips'
 
+    # Partitioned tables need the partition key in the primary key; a trip
+    # id always comes with the same pickup time, so ids stay unique
     id = Column(String, primary_key=True)
     vendor_id = Column(Integer)
-    pickup_datetime = Column(DateTime)
+    pickup_datetime = Column(DateTime, primary_key=True)
+    dropoff_datetime = Column(DateTime)
     passenger_count = Column(Integer)
     pickup_longitude = Column(Float)
     pickup_latitude = Column(Float)
     dropoff_longitude = Column(Float)
     dropoff_latitude = Column(Float)
+    trip_duration = Column(Integer)
+    pickup_cell = Column(BigInteger)
+    dropoff_cell = Column(BigInteger)
+    # Haversine pickup-to-dropoff distance, computed at ingestion
+    trip_distance_km = Column(Float)
+
+    __table_args__ = (
+        # Block-range index for large time-range scans; rows arrive roughly
+        # in pickup order, so it stays tiny compared to a B-tree
+        Index('ix_taxi_trips_pickup_datetime_brin', 'pickup_datetime', postgresql_using='brin'),
+        # Keyset pagination order, covering the columns the stats queries read
+        Index(
+            'ix_taxi_trips_pickup_datetime_id',
+            'pickup_datetime',
+            'id',
+            postgresql_include=['trip_duration', 'vendor_id', 'passenger_count']
+        ),
+        Index('ix_taxi_trips_route_cells', 'pickup_cell', 'dropoff_cell'),
+        Index('ix_taxi_trips_trip_distance_km', 'trip_distance_km'),
+        # Monthly partitions are created on demand by PartitionManager
+        {'postgresql_partition_by': 'RANGE (pickup_datetime)'},
+    )
 
     def to_dict(self):
         """Convert model instance to dictionary."""
@@ -28,4 +54,88 @@ class TaxiTrip(Base):
             'pickup_latitude': self.pickup_latitude,
             'dropoff_longitude': self.dropoff_longitude,
             'dropoff_latitude': self.dropoff_latitude
-        }
\ No newline at end of file
+        }
+
+
+class IngestionJob(Base):
+    """Background ingestion job and its resume checkpoint."""
+    __tablename__ = 'ingestion_jobs'
+
+    id = Column(String(32), primary_key=True)
+    file_path = Column(String, nullable=False)
+    batch_size = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')
+    chunk_offset = Column(Integer, nullable=False, default=0)
+    total_records = Column(Integer, nullable=False, default=0)
+    processed_records = Column(Integer, nullable=False, default=0)
+    failed_records = Column(Integer, nullable=False, default=0)
+    elapsed_seconds = Column(Float, nullable=False, default=0.0)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model instance to dictionary."""
+        return {
+            'id': self.id,
+            'file_path': self.file_path,
+            'batch_size': self.batch_size,
+            'status': self.status,
+            'chunk_offset': self.chunk_offset,
+            'total_records': self.total_records,
+            'processed_records': self.processed_records,
+            'failed_records': self.failed_records,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'rows_per_second': round(self.processed_records / self.elapsed_seconds, 1)
+                if self.elapsed_seconds else 0.0,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+class TripHourlyRollup(Base):
+    """Trip counts and sums per pickup hour, vendor and pickup grid cell."""
+    __tablename__ = 'trip_hourly_rollup'
+
+    hour_bucket = Column(DateTime, primary_key=True)
+    vendor_id = Column(Integer, primary_key=True)
+    pickup_cell = Column(BigInteger, primary_key=True)
+    trip_count = Column(BigInteger, nullable=False, default=0)
+    passenger_sum = Column(BigInteger, nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0)
+    duration_count = Column(BigInteger, nullable=False, default=0)
+
+
+class TripRouteMatrix(Base):
+    """Trip counts per day, vendor and (pickup cell, dropoff cell) route.
+
+    Routes are kept at several grid resolutions; cells at a resolution are
+    ``GeoUtils.grid_cell`` ids computed at that resolution.
+    """
+    __tablename__ = 'trip_route_matrix'
+
+    resolution = Column(SmallInteger, primary_key=True)
+    day_bucket = Column(Date, primary_key=True)
+    vendor_id = Column(Integer, primary_key=True)
+    pickup_cell = Column(BigInteger, primary_key=True)
+    dropoff_cell = Column(BigInteger, primary_key=True)
+    trip_count = Column(BigInteger, nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0)
+    duration_count = Column(BigInteger, nullable=False, default=0)
+
+
+class TripHourlySketch(Base):
+    """Mergeable sketches of the trips picked up in each hour.
+
+    Each blob is a serialised sketch from ``src.utils.sketches``; rows for
+    a range are merged to answer approximate analytics queries.
+    """
+    __tablename__ = 'trip_hourly_sketch'
+
+    hour_bucket = Column(DateTime, primary_key=True)
+    trip_count = Column(BigInteger, nullable=False, default=0)
+    routes = Column(LargeBinary)
+    durations = Column(LargeBinary)
+    distances = Column(LargeBinary)
+    hot_routes = Column(LargeBinary)
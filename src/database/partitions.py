@@ -0,0 +1,164 @@
+"""Monthly range partitions of the taxi_trips table."""
+import threading
+from datetime import date, datetime
+from typing import Iterable, List, Set, Tuple
+from sqlalchemy import delete, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from .models import TripHourlyRollup, TripHourlySketch, TripRouteMatrix
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+class PartitionManager:
+    """Creates, lists and detaches monthly partitions of taxi_trips.
+    
+    Partitioning only exists on PostgreSQL; on other databases, or before
+    the partitioning migration has run, every operation is a no-op.
+    Partitions are created in their own short transaction so the parent
+    table is not locked for the duration of a chunk load.
+    """
+    
+    _partitioned: dict = {}
+    _known_months: Set[Tuple[str, date]] = set()
+    _lock = threading.Lock()
+    
+    def __init__(self, db: Session, table: str = "taxi_trips", premake_months: int = 2):
+        self.db = db
+        self.table = table
+        self.premake_months = premake_months
+        self.engine = db.get_bind()
+    
+    def is_partitioned(self) -> bool:
+        """Check whether the table is a partitioned PostgreSQL table."""
+        key = (str(self.engine.url), self.table)
+        if key not in PartitionManager._partitioned:
+            partitioned = False
+            if self.engine.dialect.name == "postgresql":
+                with self.engine.connect() as connection:
+                    partitioned = connection.execute(
+                        text(
+                            "SELECT 1 FROM pg_partitioned_table p "
+                            "JOIN pg_class c ON c.oid = p.partrelid "
+                            "WHERE c.relname = :table"
+                        ),
+                        {"table": self.table}
+                    ).first() is not None
+            PartitionManager._partitioned[key] = partitioned
+        return PartitionManager._partitioned[key]
+    
+    @staticmethod
+    def month_start(value: datetime) -> date:
+        """Get the first day of the month containing a timestamp."""
+        return date(value.year, value.month, 1)
+    
+    @staticmethod
+    def next_month(month: date) -> date:
+        """Get the first day of the following month."""
+        return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    
+    def partition_name(self, month: date) -> str:
+        """Name of the partition holding a month, e.g. taxi_trips_y2016m01."""
+        return f"{self.table}_y{month.year:04d}m{month.month:02d}"
+    
+    def ensure_partitions(self, timestamps: Iterable[datetime]) -> List[str]:
+        """
+        Create any missing partitions for the months of the given timestamps.
+        
+        Args:
+            timestamps: Pickup times about to be inserted
+        
+        Returns:
+            list: Names of the partitions that were created
+        """
+        if not self.is_partitioned():
+            return []
+        
+        url = str(self.engine.url)
+        months = {self.month_start(value) for value in timestamps if value is not None}
+        with PartitionManager._lock:
+            missing = sorted(month for month in months if (url, month) not in PartitionManager._known_months)
+        if not missing:
+            return []
+        
+        created = []
+        with self.engine.begin() as connection:
+            for month in missing:
+                name = self.partition_name(month)
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {self.table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{self.next_month(month).isoformat()}')"
+                ))
+                created.append(name)
+        
+        with PartitionManager._lock:
+            PartitionManager._known_months.update((url, month) for month in missing)
+        logger.info(f"Ensured partitions: {', '.join(created)}")
+        return created
+    
+    def ensure_upcoming(self) -> List[str]:
+        """Create partitions for the current month and the next few months."""
+        month = self.month_start(datetime.utcnow())
+        months = [month]
+        for _ in range(self.premake_months):
+            month = self.next_month(month)
+            months.append(month)
+        return self.ensure_partitions(datetime(m.year, m.month, 1) for m in months)
+    
+    def list_partitions(self) -> List[dict]:
+        """List the table's partitions and their bounds."""
+        if not self.is_partitioned():
+            return []
+        
+        rows = self.db.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table ORDER BY c.relname"
+            ),
+            {"table": self.table}
+        ).all()
+        return [{"name": name, "bounds": bounds} for name, bounds in rows]
+    
+    def detach_partition(self, month: date) -> str:
+        """
+        Detach a month's partition from the table.
+        
+        The detached table keeps its rows and can be archived or dropped
+        without touching the remaining partitions. The month's rollup,
+        route matrix and sketch rows are deleted in the same transaction,
+        so aggregate queries stop counting the detached trips.
+        
+        Args:
+            month: Any date in the month to detach
+        
+        Returns:
+            str: Name of the detached table
+        
+        Raises:
+            ValueError: If the table is not partitioned
+        """
+        if not self.is_partitioned():
+            raise ValueError(f"{self.table} is not partitioned")
+        
+        month = date(month.year, month.month, 1)
+        name = self.partition_name(month)
+        with self.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {self.table} DETACH PARTITION {name}"))
+            self.delete_derived_rows(connection, month)
+        
+        with PartitionManager._lock:
+            PartitionManager._known_months.discard((str(self.engine.url), month))
+        logger.info(f"Detached partition {name}")
+        return name
+    
+    def delete_derived_rows(self, connection: Connection, month: date) -> None:
+        """Delete the rows aggregated from a month's trips; does not commit."""
+        start = datetime(month.year, month.month, 1)
+        stop = datetime.combine(self.next_month(month), datetime.min.time())
+        for table in (TripHourlyRollup.__table__, TripHourlySketch.__table__):
+            connection.execute(delete(table).where(table.c.hour_bucket >= start, table.c.hour_bucket < stop))
+        matrix = TripRouteMatrix.__table__
+        connection.execute(delete(matrix).where(matrix.c.day_bucket >= start.date(), matrix.c.day_bucket < stop.date()))
@@ -1,29 +1,220 @@
 """Database session management."""
-from sqlalchemy import create_engine
+import asyncio
+import threading
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from ..database.models import Base
-import os
+from ..config.settings import Settings, get_settings
+from ..monitoring.queries import instrument_engine
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite"
+}
 
 class DatabaseManager:
-    """Manages database connections and sessions."""
+    """Manages database connections and sessions.
+    
+    API requests use the async engine; ingestion, background jobs and
+    migrations run in threads and use the sync engine. Both engines are
+    built from the same pool settings on first use, so creating a manager
+    never connects or imports a database driver. With ``instrument`` every
+    statement either engine runs is timed by fingerprint.
+    """
+    
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        pool_timeout: int = 30,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        instrument: bool = False
+    ):
+        self.database_url = database_url
+        self.instrument = instrument
+        self.pool_options = self.build_pool_options(
+            database_url, pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping
+        )
+        self._lock = threading.Lock()
+        self._engine: Optional[Engine] = None
+        self._session_factory: Optional[sessionmaker] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._async_session_factory: Optional[sessionmaker] = None
+    
+    @property
+    def engine(self) -> Engine:
+        """Sync engine, created on first use."""
+        return self._sync()[0]
+    
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """Async engine, created on first use."""
+        return self._async()[0]
+    
+    def _sync(self):
+        """Sync engine and session factory, creating them if needed."""
+        with self._lock:
+            if self._engine is None:
+                self._engine = create_engine(self.database_url, **self.pool_options)
+                if self.instrument:
+                    instrument_engine(self._engine)
+                self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self._engine)
+            return self._engine, self._session_factory
+    
+    def _async(self):
+        """Async engine and session factory, creating them if needed."""
+        with self._lock:
+            if self._async_engine is None:
+                self._async_engine = create_async_engine(self.async_url(self.database_url), **self.pool_options)
+                if self.instrument:
+                    instrument_engine(self._async_engine.sync_engine)
+                self._async_session_factory = sessionmaker(
+                    bind=self._async_engine,
+                    class_=AsyncSession,
+                    autoflush=False,
+                    expire_on_commit=False
+                )
+            return self._async_engine, self._async_session_factory
+    
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "DatabaseManager":
+        """Create a manager configured from application settings."""
+        return cls(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            instrument=settings.ENABLE_METRICS
+        )
+    
+    @staticmethod
+    def async_url(database_url: str) -> str:
+        """Switch a database URL to its asyncio driver."""
+        url = make_url(database_url)
+        backend = url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError(f"No async driver configured for {backend}")
+        return str(url.set(drivername=ASYNC_DRIVERS[backend]))
+    
+    @staticmethod
+    def build_pool_options(
+        database_url: str,
+        pool_size: int,
+        max_overflow: int,
+        pool_timeout: int,
+        pool_recycle: int,
+        pool_pre_ping: bool
+    ) -> dict:
+        """Build engine pool arguments; SQLite does not use a sized queue pool."""
+        if make_url(database_url).get_backend_name() == "sqlite":
+            return {"pool_pre_ping": pool_pre_ping}
+        return {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": pool_pre_ping
+        }
     
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-
     def get_session(self) -> Session:
-        return self.SessionLocal()
-
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/taxi_db")
-db_manager = DatabaseManager(DATABASE_URL)
+        """Get a new sync session."""
+        return self._sync()[1]()
+    
+    def get_async_session(self) -> AsyncSession:
+        """Get a new async session."""
+        return self._async()[1]()
+    
+    def pool_status(self) -> dict:
+        """
+        Connection counts of the engines created so far.
+        
+        Returns:
+            dict: Per engine, None if not created yet, otherwise the pool
+                size and checked-out and overflow connections where the
+                pool type reports them
+        """
+        def status(engine) -> Optional[dict]:
+            if engine is None:
+                return None
+            pool = engine.pool
+            return {
+                name: getattr(pool, method)()
+                for name, method in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"))
+                if hasattr(pool, method)
+            }
+        
+        return {
+            "sync": status(self._engine),
+            "async": status(self._async_engine.sync_engine if self._async_engine is not None else None)
+        }
+    
+    def pool_exhausted(self) -> bool:
+        """Whether every async connection, overflow included, is checked out."""
+        status = self.pool_status()["async"]
+        if not status or "size" not in status:
+            return False
+        return status["checked_out"] >= status["size"] + self.pool_options.get("max_overflow", 0)
+    
+    async def check(self, timeout: float = 2.0) -> Optional[str]:
+        """
+        Run a trivial query on the async engine.
+        
+        Returns:
+            str: The error, or None if the database answered in time
+        """
+        try:
+            async with self.get_async_session() as db:
+                await asyncio.wait_for(db.execute(text("SELECT 1")), timeout)
+        except Exception as e:
+            return str(e) or type(e).__name__
+        return None
+    
+    def reset_after_fork(self) -> None:
+        """
+        Forget engines inherited from a parent process.
+        
+        The pooled connections belong to the parent, so they are dropped
+        without being closed; new engines are created on next use.
+        """
+        self._lock = threading.Lock()
+        for engine in (self._engine, self._async_engine.sync_engine if self._async_engine is not None else None):
+            if engine is not None:
+                engine.dispose(close=False)
+        self._engine = self._session_factory = None
+        self._async_engine = self._async_session_factory = None
+    
+    async def dispose(self) -> None:
+        """Close every pooled connection; engines are recreated on next use."""
+        with self._lock:
+            engine, async_engine = self._engine, self._async_engine
+            self._engine = self._session_factory = None
+            self._async_engine = self._async_session_factory = None
+        if async_engine is not None:
+            await async_engine.dispose()
+        if engine is not None:
+            engine.dispose()
 
-# Create tables
-Base.metadata.create_all(bind=db_manager.engine)
+@lru_cache()
+def get_db_manager() -> DatabaseManager:
+    """The process-wide database manager."""
+    return DatabaseManager.from_settings(get_settings())
 
-def get_db() -> Session:
+def get_db() -> Iterator[Session]:
     """Get database session."""
-    db = db_manager.get_session()
+    db = get_db_manager().get_session()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Get an async database session."""
+    async with get_db_manager().get_async_session() as db:
+        yield db
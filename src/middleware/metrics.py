@@ -0,0 +1,44 @@
+"""Request metrics middleware."""
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..monitoring.metrics import REQUEST_COUNT, REQUEST_LATENCY
+from .routes import RouteTemplates
+
+# Label of requests no route matched, so unknown paths share one series
+UNMATCHED = "<unmatched>"
+
+class MetricsMiddleware:
+    """Counts and times every HTTP request by method, route template and status.
+    
+    A plain ASGI middleware rather than an ``http`` middleware, so responses
+    are streamed through unchanged and the time includes sending the body.
+    The route is resolved after the request is handled, once routing has
+    recorded its endpoint in the scope.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.routes = RouteTemplates()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Reported when the app fails before starting a response
+        status = 500
+        
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = self.routes.resolve(scope) or UNMATCHED
+            REQUEST_COUNT.labels(method=scope["method"], endpoint=route, status=str(status)).inc()
+            REQUEST_LATENCY.labels(method=scope["method"], endpoint=route).observe(elapsed)
@@ -1,29 +1,170 @@
 """Rate limiting middleware."""
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from collections import OrderedDict
+import math
+import threading
+import time
 from fastapi import Request, HTTPException
+from ..auth.jwt_handler import JWTHandler
 from ..cache.redis_manager import RedisManager
+from .routes import RouteTemplates
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# GCRA: the key holds the theoretical arrival time (TAT) of the next request
+# in milliseconds. A request is allowed while the TAT is less than one period
+# ahead of now, which permits bursts of up to ``limit`` requests and then one
+# request per ``period / limit``. Reading and updating the TAT happen in one
+# atomic script, so concurrent requests cannot both take the last slot.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local interval = period / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+class TokenBucket:
+    """In-process token bucket used to shed requests before Redis.
+    
+    Each process only sees part of a client's requests, so a bucket with
+    the same limit as the shared one never runs dry before it does. An
+    empty local bucket, or a recent rejection from Redis, therefore means
+    the request would be rejected anyway.
+    """
+    
+    __slots__ = ("tokens", "updated", "blocked_until")
+    
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+    
+    def take(self, capacity: float, rate: float, now: float) -> float:
+        """
+        Take a token if one is available.
+        
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return (1 - self.tokens) / rate
+        self.tokens -= 1
+        return 0.0
 
 class RateLimiter:
-    """Rate limiting implementation."""
+    """Rate limiting implementation.
     
-    def __init__(self, redis_manager: RedisManager, requests_per_minute: int = 60):
+    Requests are limited per route template and per client, where the
+    client is the JWT subject for authenticated requests and the remote
+    address otherwise. The shared limit is enforced by a GCRA script run
+    with a single EVALSHA; a local token bucket rejects clients that are
+    clearly over their limit without a Redis round trip.
+    """
+    
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        requests_per_minute: int = 60,
+        route_limits: Optional[Dict[str, int]] = None,
+        period: int = 60,
+        max_local_keys: int = 10000,
+        clock: Callable[[], float] = time.time
+    ):
         self.redis = redis_manager
         self.requests_per_minute = requests_per_minute
+        self.route_limits = route_limits or {}
+        self.period = period
+        self.max_local_keys = max_local_keys
+        self.clock = clock
+        self.script = redis_manager.register_script(GCRA_SCRIPT)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._routes = RouteTemplates()
     
     async def check_rate_limit(self, request: Request) -> None:
-        """Check if request is within rate limits."""
-        client_ip = request.client.host
-        key = f"rate_limit:{client_ip}"
+        """
+        Check if request is within rate limits.
+        
+        Raises:
+            HTTPException: 429 with a ``Retry-After`` header if it is not
+        """
+        route = self._route(request)
+        limit = self.route_limits.get(route, self.requests_per_minute)
+        key = f"rate_limit:{route}:{self._client(request)}"
+        now = self.clock()
         
-        # Get current count
-        count = await self.redis.get(key) or 0
+        retry_after = self._take_local(key, limit, now)
+        if retry_after == 0:
+            retry_after = await self._take_shared(key, limit, now)
         
-        if count >= self.requests_per_minute:
+        if retry_after > 0:
             raise HTTPException(
                 status_code=429,
-                detail="Too many requests. Please try again later."
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
             )
+    
+    def _take_local(self, key: str, limit: int, now: float) -> float:
+        """Take a token from the process-local bucket for a key."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(limit, now)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_local_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(limit, limit / self.period, now)
+    
+    async def _take_shared(self, key: str, limit: int, now: float) -> float:
+        """Run the GCRA script, returning seconds to wait if rejected."""
+        try:
+            allowed, retry_ms = await self.script(
+                keys=[key],
+                args=[int(now * 1000), self.period * 1000, limit]
+            )
+        except Exception as e:
+            # Fail open on the shared limit; the local bucket still applies
+            logger.warning(f"Rate limit check failed: {str(e)}")
+            return 0.0
         
-        # Increment count
-        await self.redis.set(key, count + 1, ttl=60)  # Reset after 1 minute
\ No newline at end of file
+        if allowed:
+            return 0.0
+        retry_after = int(retry_ms) / 1000
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.blocked_until = now + retry_after
+        return retry_after
+    
+    def _route(self, request: Request) -> str:
+        """Route template of the request, e.g. ``/api/v1/ingestion/jobs/{job_id}``."""
+        return self._routes.resolve(request.scope) or request.url.path
+    
+    @staticmethod
+    def _client(request: Request) -> str:
+        """JWT subject of an authenticated request, else the client address."""
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            payload = JWTHandler.decode_token(token)
+            if payload and payload.get("sub"):
+                return f"user:{payload['sub']}"
+        host = request.client.host if request.client else "unknown"
+        return f"ip:{host}"
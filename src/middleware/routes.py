@@ -0,0 +1,35 @@
+"""Route template lookup shared by rate limiting and metrics."""
+from typing import Callable, Dict, Optional
+
+class RouteTemplates:
+    """Maps the endpoint a request was routed to back to its path template.
+    
+    Keying limits and metric labels by template, e.g.
+    ``/api/v1/ingestion/jobs/{job_id}``, rather than by the raw path keeps
+    one key or time series per route however many ids are requested.
+    """
+    
+    def __init__(self):
+        self._templates: Dict[Callable, str] = {}
+    
+    def resolve(self, scope: dict) -> Optional[str]:
+        """
+        Template of the route that handled a request.
+        
+        Args:
+            scope: ASGI scope, after routing has set its ``endpoint``
+        
+        Returns:
+            str: The template, or None if no route matched
+        """
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return None
+        template = self._templates.get(endpoint)
+        if template is None:
+            for route in getattr(scope.get("router"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    self._templates[endpoint] = template
+                    break
+        return template
@@ -1,9 +1,28 @@
-"""Prometheus metrics configuration."""
-from prometheus_client import Counter, Histogram, start_http_server
-from functools import wraps
-import time
+"""Prometheus metrics configuration.
 
-# Define metrics
+Under gunicorn every worker has its own copy of these metrics. With
+``PROMETHEUS_MULTIPROC_DIR`` set, prometheus_client keeps the values in
+per-process files in that directory and ``metrics_registry`` aggregates
+them, so a scrape of any worker, or of the master's metrics port, reports
+totals across workers.
+"""
+import os
+from typing import Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server
+)
+
+MULTIPROCESS_DIR_VARIABLE = "PROMETHEUS_MULTIPROC_DIR"
+
+# Define metrics; ``endpoint`` is the route template, not the raw path
 REQUEST_COUNT = Counter(
     'http_requests_total',
     'Total HTTP requests',
@@ -16,33 +35,71 @@ REQUEST_LATENCY = Histogram(
     ['method', 'endpoint']
 )
 
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds',
+    'SQL statement latency by operation, table and statement fingerprint',
+    ['operation', 'table', 'fingerprint'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+)
+
 INGESTION_RECORDS = Counter(
     'ingestion_records_total',
     'Total records processed during ingestion',
     ['status']
 )
 
-def track_request_metrics():
-    """Decorator to track request metrics."""
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            method = kwargs.get('request').method
-            endpoint = kwargs.get('request').url.path
-            
-            start_time = time.time()
-            try:
-                response = await func(*args, **kwargs)
-                REQUEST_COUNT.labels(
-                    method=method,
-                    endpoint=endpoint,
-                    status=response.status_code
-                ).inc()
-                return response
-            finally:
-                REQUEST_LATENCY.labels(
-                    method=method,
-                    endpoint=endpoint
-                ).observe(time.time() - start_time)
-        return wrapper
-    return decorator
\ No newline at end of file
+# A series per live worker in multiprocess mode, labelled with its pid
+INGESTION_ROWS_PER_SECOND = Gauge(
+    'ingestion_rows_per_second',
+    'Throughput of the last finished ingestion run',
+    ['runner'],
+    multiprocess_mode='liveall'
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by tier and result',
+    ['tier', 'result']
+)
+
+CACHE_EVICTIONS = Counter(
+    'cache_evictions_total',
+    'Cache entries removed by tier and reason',
+    ['tier', 'reason']
+)
+
+CACHE_COMPUTE_LATENCY = Histogram(
+    'cache_compute_duration_seconds',
+    'Time to compute a value on a cache miss or refresh',
+    ['prefix', 'function']
+)
+
+def multiprocess_mode() -> bool:
+    """Whether metric values are shared with other worker processes."""
+    return bool(os.environ.get(MULTIPROCESS_DIR_VARIABLE))
+
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: the totals of every worker in multiprocess mode."""
+    if not multiprocess_mode():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render the metrics in the Prometheus text format.
+    
+    Returns:
+        tuple: Body and its content type
+    """
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+def start_metrics_server(port: int) -> None:
+    """Serve the metrics on their own port from a background thread."""
+    start_http_server(port, registry=metrics_registry())
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop the live-process gauge values of an exited worker."""
+    if multiprocess_mode():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,91 @@
+"""Timing of SQL statements by fingerprint."""
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .metrics import DB_QUERY_LATENCY
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Statements beyond this many distinct fingerprints share one label
+MAX_FINGERPRINTS = 500
+OTHER = "other"
+
+_STARTED = "query_started"
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"\?|%s|%\(\w+\)s|\$\d+|(?<![:\w]):\w+")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\?(?:, \?)+\)")
+_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+\"?([\w.]+)", re.IGNORECASE)
+
+_seen = set()
+_seen_lock = threading.Lock()
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> Tuple[str, str, str]:
+    """
+    Label a statement by its shape rather than its values.
+    
+    Literals and bind parameters become ``?``, ``IN`` lists and multi-row
+    ``VALUES`` collapse to one element, and whitespace is normalized, so a
+    query run with different arguments always gets the same fingerprint.
+    
+    Args:
+        statement: SQL as sent to the driver
+    
+    Returns:
+        tuple: (operation, first table, 12-character hash of the
+            normalized statement), e.g. ``("SELECT", "taxi_trips", "3f0c...")``
+    """
+    normalized = " ".join(statement.split())
+    normalized = _STRINGS.sub("?", normalized)
+    normalized = _PLACEHOLDERS.sub("?", normalized)
+    normalized = _NUMBERS.sub("?", normalized)
+    normalized = _ROWS.sub(r"\1", normalized)
+    normalized = _LISTS.sub("(?+)", normalized)
+    
+    operation = normalized.split(" ", 1)[0].upper() or "-"
+    table = _TABLE.search(normalized)
+    digest = hashlib.md5(normalized.encode()).hexdigest()[:12]
+    with _seen_lock:
+        if digest not in _seen:
+            if len(_seen) >= MAX_FINGERPRINTS:
+                return operation, table.group(1) if table else "-", OTHER
+            _seen.add(digest)
+            logger.debug(f"Query fingerprint {digest}: {normalized}")
+    return operation, table.group(1) if table else "-", digest
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement an engine runs; calling it again has no effect."""
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # A stack, as a listener may run a statement of its own on the connection
+    conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    _observe(conn, statement)
+
+def _on_error(context) -> None:
+    if context.connection is not None and context.statement is not None:
+        _observe(context.connection, context.statement)
+
+def _observe(conn, statement: str) -> None:
+    """Record the time since the matching ``before_cursor_execute``."""
+    started = conn.info.get(_STARTED)
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    operation, table, digest = fingerprint(statement)
+    DB_QUERY_LATENCY.labels(operation=operation, table=table, fingerprint=digest).observe(elapsed)
@@ -1,20 +1,51 @@
 """Advanced analytics service for taxi trip data."""
-from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta
-from sqlalchemy import func, and_, extract
-from sqlalchemy.orm import Session
-from ..database.models import TaxiTrip
+from typing import Any, Dict, List, Optional, Sequence
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import case, func, extract, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+import pandas as pd
+from ..database.models import TaxiTrip, TripHourlyRollup, TripHourlySketch, TripRouteMatrix
+from ..data.hot_store import HotTripStore
+from ..data.rollup import HourlyRollup
+from ..data.sketch_rollup import TRIP_COLUMNS as SKETCH_TRIP_COLUMNS, TripSketch
+from ..utils.metrics import MetricsUtils
+from ..utils.geo import GeoUtils
 from ..utils.logging import get_logger
 from ..cache.redis_manager import RedisManager
 
 logger = get_logger(__name__)
 
+DEFAULT_DISTANCE_BINS_KM = (0, 1, 2, 3, 5, 10, 20, 50)
+DEFAULT_SUMMARY_PERCENTILES = (50, 90, 99)
+# Longest look-back of the peak hours analysis, in days
+MAX_PEAK_HOURS_DAYS = 366
+
+# Hourly sketch rows fetched per round trip when merging
+SKETCH_BATCH_SIZE = 500
+
 class AnalyticsService:
-    """Service for advanced analytics operations."""
+    """Service for advanced analytics operations.
     
-    def __init__(self, db: Session, redis_manager: RedisManager):
+    With ``use_rollup`` enabled, time-bounded aggregates read whole hours
+    from ``trip_hourly_rollup`` and only scan raw trips for the partial
+    hours at either end of the range. With a loaded ``hot_store``, hourly
+    and peak-hour counts for ranges inside its window are computed in
+    memory without touching the database.
+    """
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        redis_manager: RedisManager,
+        use_rollup: bool = False,
+        hot_store: Optional[HotTripStore] = None
+    ):
         self.db = db
         self.redis = redis_manager
+        self.use_rollup = use_rollup
+        self.hot_store = hot_store
     
     async def get_hourly_distribution(
         self,
@@ -23,55 +54,84 @@ class AnalyticsService:
     ) -> Dict[int, int]:
         """Get hourly distribution of trips."""
         logger.info("Calculating hourly trip distribution")
+        if self.hot_store is not None and self.hot_store.covers(start_date):
+            return self.hot_store.count_by_hour(start_date, end_date)
         
-        query = self.db.query(
-            func.extract('hour', TaxiTrip.pickup_datetime).label('hour'),
-            func.count().label('count')
+        counts = await self._count_by(
+            lambda column: [extract('hour', column).label('hour')],
+            start_date,
+            end_date
         )
-        
-        if start_date:
-            query = query.filter(TaxiTrip.pickup_datetime >= start_date)
-        if end_date:
-            query = query.filter(TaxiTrip.pickup_datetime <= end_date)
-            
-        result = query.group_by('hour').all()
-        return {int(hour): count for hour, count in result}
+        return {int(hour): count for (hour,), count in sorted(counts.items())}
     
     async def get_popular_routes(
         self,
         limit: int = 10,
-        min_trips: int = 5
+        min_trips: int = 5,
+        resolution: int = GeoUtils.GRID_RESOLUTION,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        vendor_id: Optional[int] = None
     ) -> List[Dict]:
-        """Get most popular routes."""
-        logger.info(f"Finding top {limit} popular routes")
-        
-        query = self.db.query(
-            TaxiTrip.pickup_latitude,
-            TaxiTrip.pickup_longitude,
-            TaxiTrip.dropoff_latitude,
-            TaxiTrip.dropoff_longitude,
-            func.count().label('trip_count'),
-            func.avg(TaxiTrip.trip_duration).label('avg_duration')
+        """
+        Get the most popular routes between grid cells.
+        
+        Routes are read from ``trip_route_matrix``, so they cluster nearby
+        coordinates instead of requiring identical ones, and only whole
+        days can be filtered.
+        
+        Args:
+            limit: Maximum number of routes
+            min_trips: Minimum number of trips on a route
+            resolution: Grid resolution of the routes, one of ROUTE_RESOLUTIONS
+            start_date: First pickup day
+            end_date: Last pickup day, inclusive
+            vendor_id: Only count trips of this vendor
+        
+        Returns:
+            list: Routes with the centers of their cells, busiest first
+        """
+        logger.info(f"Finding top {limit} popular routes at resolution {resolution}")
+        
+        trip_count = func.sum(TripRouteMatrix.trip_count)
+        query = select(
+            TripRouteMatrix.pickup_cell,
+            TripRouteMatrix.dropoff_cell,
+            trip_count.label('trip_count'),
+            func.sum(TripRouteMatrix.duration_sum).label('duration_sum'),
+            func.sum(TripRouteMatrix.duration_count).label('duration_count')
+        ).where(
+            TripRouteMatrix.resolution == resolution
         ).group_by(
-            TaxiTrip.pickup_latitude,
-            TaxiTrip.pickup_longitude,
-            TaxiTrip.dropoff_latitude,
-            TaxiTrip.dropoff_longitude
+            TripRouteMatrix.pickup_cell,
+            TripRouteMatrix.dropoff_cell
         ).having(
-            func.count() >= min_trips
+            trip_count >= min_trips
         ).order_by(
-            func.count().desc()
+            trip_count.desc(),
+            TripRouteMatrix.pickup_cell,
+            TripRouteMatrix.dropoff_cell
         ).limit(limit)
+        if start_date:
+            query = query.where(TripRouteMatrix.day_bucket >= start_date)
+        if end_date:
+            query = query.where(TripRouteMatrix.day_bucket <= end_date)
+        if vendor_id is not None:
+            query = query.where(TripRouteMatrix.vendor_id == vendor_id)
         
-        return [
-            {
-                'pickup': {'lat': r.pickup_latitude, 'lng': r.pickup_longitude},
-                'dropoff': {'lat': r.dropoff_latitude, 'lng': r.dropoff_longitude},
-                'trip_count': r.trip_count,
-                'avg_duration': r.avg_duration
-            }
-            for r in query.all()
-        ]
+        routes = []
+        for r in (await self.db.execute(query)).all():
+            pickup = GeoUtils.cell_center(r.pickup_cell, resolution)
+            dropoff = GeoUtils.cell_center(r.dropoff_cell, resolution)
+            routes.append({
+                'pickup': {'lat': pickup[0], 'lng': pickup[1]},
+                'dropoff': {'lat': dropoff[0], 'lng': dropoff[1]},
+                'pickup_cell': int(r.pickup_cell),
+                'dropoff_cell': int(r.dropoff_cell),
+                'trip_count': int(r.trip_count),
+                'avg_duration': float(r.duration_sum) / r.duration_count if r.duration_count else None
+            })
+        return routes
     
     async def get_peak_hours(
         self,
@@ -81,49 +141,283 @@ class AnalyticsService:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        query = self.db.query(
-            extract('dow', TaxiTrip.pickup_datetime).label('day_of_week'),
-            extract('hour', TaxiTrip.pickup_datetime).label('hour'),
-            func.count().label('trip_count')
-        ).filter(
-            and_(
-                TaxiTrip.pickup_datetime >= start_date,
-                TaxiTrip.pickup_datetime <= end_date
+        if self.hot_store is not None and self.hot_store.covers(start_date):
+            counts = self.hot_store.count_by_day_and_hour(start_date, end_date)
+        else:
+            counts = await self._count_by(
+                lambda column: [
+                    extract('dow', column).label('day_of_week'),
+                    extract('hour', column).label('hour')
+                ],
+                start_date,
+                end_date
             )
-        ).group_by(
-            'day_of_week',
-            'hour'
-        ).order_by(
-            'day_of_week',
-            'hour'
-        )
-        
-        results = query.all()
         return [
             {
-                'day_of_week': int(r.day_of_week),
-                'hour': int(r.hour),
-                'trip_count': int(r.trip_count)
+                'day_of_week': int(day_of_week),
+                'hour': int(hour),
+                'trip_count': int(trip_count)
             }
-            for r in results
+            for (day_of_week, hour), trip_count in sorted(counts.items())
         ]
     
-    async def get_distance_distribution(self) -> List[Tuple[float, int]]:
-        """Get distribution of trip distances."""
-        query = self.db.query(
-            func.round(
-                func.sqrt(
-                    func.power(TaxiTrip.dropoff_longitude - TaxiTrip.pickup_longitude, 2) +
-                    func.power(TaxiTrip.dropoff_latitude - TaxiTrip.pickup_latitude, 2)
-                ) * 111.32,  # Convert to kilometers (approximate)
-                1
-            ).label('distance'),
+    async def _count_by(self, keys, start_date: Optional[datetime], end_date: Optional[datetime]) -> Counter:
+        """
+        Count trips grouped by time-derived keys, using the rollup where possible.
+        
+        Args:
+            keys: Builds the labelled group-by expressions from a timestamp
+                column; applied to the rollup's hour bucket and to the raw
+                pickup time, so keys must not be finer than an hour
+            start_date: Start of the pickup range
+            end_date: End of the pickup range (inclusive)
+        
+        Returns:
+            Counter: Trip count per key tuple
+        """
+        buckets, edges = HourlyRollup.plan(start_date, end_date, self.use_rollup)
+        counts = Counter()
+        
+        if buckets is not None:
+            columns = keys(TripHourlyRollup.hour_bucket)
+            query = select(
+                *columns,
+                func.sum(TripHourlyRollup.trip_count)
+            ).where(
+                *HourlyRollup.range_filter(TripHourlyRollup.hour_bucket, buckets)
+            ).group_by(*[column.name for column in columns])
+            for row in (await self.db.execute(query)).all():
+                counts[tuple(int(value) for value in row[:-1])] += int(row[-1])
+        
+        for edge in edges:
+            columns = keys(TaxiTrip.pickup_datetime)
+            query = select(
+                *columns,
+                func.count()
+            ).where(
+                *HourlyRollup.range_filter(TaxiTrip.pickup_datetime, edge)
+            ).group_by(*[column.name for column in columns])
+            for row in (await self.db.execute(query)).all():
+                counts[tuple(int(value) for value in row[:-1])] += int(row[-1])
+        
+        return counts
+    
+    async def get_distance_distribution(
+        self,
+        bin_edges: Sequence[float] = DEFAULT_DISTANCE_BINS_KM,
+        percentiles: Sequence[float] = ()
+    ) -> Dict[str, Any]:
+        """
+        Get a histogram of stored trip distances.
+        
+        Trips are counted per bin in SQL, with ``width_bucket`` on PostgreSQL
+        and an equivalent CASE expression elsewhere.
+        
+        Args:
+            bin_edges: Increasing bin edges in kilometers; bins are closed
+                on the left, and trips outside the edges are counted in
+                open-ended bins at either end
+            percentiles: Distance percentiles to compute, from 0 to 100
+        
+        Returns:
+            dict: ``bins`` with min_km, max_km (None when open-ended) and
+                count, and ``percentiles`` with percentile and distance_km
+        """
+        bin_edges = [float(edge) for edge in bin_edges]
+        distance = TaxiTrip.trip_distance_km
+        
+        if self.db.bind.dialect.name == 'postgresql':
+            bucket = func.width_bucket(distance, postgresql.array(bin_edges))
+        else:
+            # Bucket i + 1 holds edges[i] <= distance < edges[i + 1], as width_bucket does
+            bucket = case(
+                *[(distance < edge, index) for index, edge in enumerate(bin_edges)],
+                else_=len(bin_edges)
+            )
+        query = select(
+            bucket.label('bucket'),
             func.count().label('count')
+        ).where(
+            distance.isnot(None)
+        ).group_by('bucket')
+        counts = {int(row.bucket): int(row.count) for row in (await self.db.execute(query)).all()}
+        
+        bounds = [None, *bin_edges, None]
+        bins = [
+            {'min_km': bounds[index], 'max_km': bounds[index + 1], 'count': counts.get(index, 0)}
+            for index in range(len(bounds) - 1)
+        ]
+        # Only report the open-ended bins when trips fall in them
+        bins = [b for b in bins if b['min_km'] is not None and b['max_km'] is not None or b['count']]
+        
+        return {
+            'bins': bins,
+            'percentiles': await self._distance_percentiles(percentiles)
+        }
+    
+    async def get_trip_summary(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        percentiles: Sequence[float] = DEFAULT_SUMMARY_PERCENTILES,
+        top_routes: int = 10,
+        approximate: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Summarise the trips picked up in a range.
+        
+        Exact summaries scan the raw trips. Approximate ones merge the
+        hourly sketches for the whole hours in the range and only scan raw
+        trips for the partial hours at either end, so their cost depends on
+        the number of hours rather than trips. Counts of trips are exact
+        either way; distinct routes are within about 2%, percentiles within
+        1% of the value and hot-route counts may be slightly overestimated.
+        
+        Args:
+            start_date: Start of the pickup range
+            end_date: End of the pickup range (inclusive)
+            percentiles: Duration and distance percentiles, from 0 to 100
+            top_routes: Number of busiest routes to return
+            approximate: Answer from the sketches
+        
+        Returns:
+            dict: trip_count, distinct_routes, duration_percentiles and
+                distance_percentiles (shaped like
+                ``MetricsUtils.calculate_percentiles``), hot_routes and
+                whether the answer is approximate
+        """
+        logger.info(f"Summarising trips ({'approximate' if approximate else 'exact'})")
+        if approximate:
+            return await self._approximate_summary(start_date, end_date, percentiles, top_routes)
+        
+        stop = end_date + timedelta(microseconds=1) if end_date is not None else None
+        conditions = HourlyRollup.range_filter(TaxiTrip.pickup_datetime, (start_date, stop))
+        has_route = [TaxiTrip.pickup_cell.isnot(None), TaxiTrip.dropoff_cell.isnot(None)]
+        
+        trip_count = (await self.db.execute(select(func.count()).select_from(TaxiTrip).where(*conditions))).scalar()
+        routes = select(TaxiTrip.pickup_cell, TaxiTrip.dropoff_cell).where(*conditions, *has_route).distinct().subquery()
+        distinct_routes = (await self.db.execute(select(func.count()).select_from(routes))).scalar()
+        
+        route_count = func.count()
+        hot = select(
+            TaxiTrip.pickup_cell,
+            TaxiTrip.dropoff_cell,
+            route_count.label('trip_count')
+        ).where(
+            *conditions, *has_route
         ).group_by(
-            'distance'
+            TaxiTrip.pickup_cell,
+            TaxiTrip.dropoff_cell
         ).order_by(
-            'distance'
-        )
+            route_count.desc(),
+            TaxiTrip.pickup_cell,
+            TaxiTrip.dropoff_cell
+        ).limit(top_routes)
+        
+        summary = {
+            'trip_count': int(trip_count),
+            'distinct_routes': int(distinct_routes),
+            'approximate': False,
+            'hot_routes': [
+                self._cell_route(r.pickup_cell, r.dropoff_cell, r.trip_count)
+                for r in (await self.db.execute(hot)).all()
+            ]
+        }
+        for name, column in (('duration', TaxiTrip.trip_duration), ('distance', TaxiTrip.trip_distance_km)):
+            values = await self._percentiles(column, percentiles, conditions)
+            summary[f'{name}_percentiles'] = {
+                f"p{p}": float(value) if value is not None else 0
+                for p, value in zip(percentiles, values)
+            }
+        return summary
+    
+    async def _approximate_summary(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        percentiles: Sequence[float],
+        top_routes: int
+    ) -> Dict[str, Any]:
+        """Trip summary merged from the hourly sketches."""
+        buckets, edges = HourlyRollup.split_range(start_date, end_date)
+        sketch = TripSketch()
+        
+        if buckets is not None:
+            query = select(TripHourlySketch).where(
+                *HourlyRollup.range_filter(TripHourlySketch.hour_bucket, buckets)
+            )
+            result = await self.db.stream(query)
+            try:
+                async for rows in result.scalars().partitions(SKETCH_BATCH_SIZE):
+                    for row in rows:
+                        sketch.merge(TripSketch.from_row(row))
+            finally:
+                await result.close()
+        
+        for edge in edges:
+            rows = (await self.db.execute(
+                select(*SKETCH_TRIP_COLUMNS).where(*HourlyRollup.range_filter(TaxiTrip.pickup_datetime, edge))
+            )).all()
+            sketch.add(pd.DataFrame(rows, columns=[column.key for column in SKETCH_TRIP_COLUMNS]))
+        
+        return {
+            'trip_count': sketch.trip_count,
+            'distinct_routes': sketch.routes.count(),
+            'approximate': True,
+            'hot_routes': [
+                self._cell_route(pickup_cell, dropoff_cell, count)
+                for (pickup_cell, dropoff_cell), count in sketch.hot_routes.top(top_routes)
+            ],
+            'duration_percentiles': MetricsUtils.calculate_sketch_percentiles(sketch.durations, percentiles),
+            'distance_percentiles': MetricsUtils.calculate_sketch_percentiles(sketch.distances, percentiles)
+        }
+    
+    @staticmethod
+    def _cell_route(pickup_cell: int, dropoff_cell: int, trip_count: int) -> Dict[str, Any]:
+        """Route between two grid cells at the stored resolution."""
+        pickup = GeoUtils.cell_center(pickup_cell)
+        dropoff = GeoUtils.cell_center(dropoff_cell)
+        return {
+            'pickup': {'lat': pickup[0], 'lng': pickup[1]},
+            'dropoff': {'lat': dropoff[0], 'lng': dropoff[1]},
+            'pickup_cell': int(pickup_cell),
+            'dropoff_cell': int(dropoff_cell),
+            'trip_count': int(trip_count)
+        }
+    
+    async def _distance_percentiles(self, percentiles: Sequence[float]) -> List[Dict[str, float]]:
+        """Continuous percentiles of the stored trip distances."""
+        values = await self._percentiles(TaxiTrip.trip_distance_km, percentiles)
+        return [
+            {'percentile': float(p), 'distance_km': float(value) if value is not None else None}
+            for p, value in zip(percentiles, values)
+        ]
+    
+    async def _percentiles(self, column, percentiles: Sequence[float], conditions: Sequence = ()) -> List[Optional[float]]:
+        """Continuous percentiles of a column over the matching trips, None when there are none."""
+        if not percentiles:
+            return []
+        fractions = [float(p) / 100 for p in percentiles]
+        conditions = [column.isnot(None), *conditions]
+        
+        if self.db.bind.dialect.name == 'postgresql':
+            values = (await self.db.execute(select(
+                func.percentile_cont(postgresql.array(fractions)).within_group(column)
+            ).where(*conditions))).scalar()
+            return list(values) if values is not None else [None] * len(percentiles)
         
-        results = query.all()
-        return [(float(r.distance), int(r.count)) for r in results]
\ No newline at end of file
+        # Interpolate between the two nearest ranks, like percentile_cont
+        total = (await self.db.execute(select(func.count()).where(*conditions))).scalar()
+        values = []
+        for fraction in fractions:
+            if not total:
+                values.append(None)
+                continue
+            position = fraction * (total - 1)
+            lower = int(position)
+            rows = (await self.db.execute(
+                select(column).where(*conditions).order_by(column).offset(lower).limit(2)
+            )).scalars().all()
+            upper = rows[1] if len(rows) > 1 else rows[0]
+            values.append(rows[0] + (upper - rows[0]) * (position - lower))
+        return values
@@ -1,42 +1,373 @@
 """Service for handling cache operations."""
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, List
 from functools import wraps
+from redis.exceptions import LockError, RedisError
+import asyncio
 import hashlib
 import json
+import math
+import random
+import threading
+import time
 from ..cache.redis_manager import RedisManager
+from ..cache.local_cache import LocalCache, MISSING
+from ..monitoring.metrics import CACHE_REQUESTS, CACHE_EVICTIONS, CACHE_COMPUTE_LATENCY
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+KEY_NAMESPACE = "cache"
+INVALIDATION_CHANNEL = "cache:invalidate"
+INVALIDATE_ALL = "*"
+
 class CacheService:
-    """Service for cache operations."""
+    """Service for cache operations.
+    
+    Cached results live in two tiers: a per-process ``LocalCache`` (L1)
+    in front of Redis (L2). Invalidations are applied to both tiers and
+    published over Redis pub/sub, so every worker drops its L1 copies.
+    """
+    
+    LOCK_POLL_SECONDS = 0.05
     
-    def __init__(self, redis_manager: RedisManager):
+    def __init__(
+        self,
+        redis_manager: RedisManager,
+        local_cache: Optional[LocalCache] = None,
+        stale_ttl: int = 300,
+        lock_timeout: int = 30,
+        early_expiry_beta: float = 1.0
+    ):
         self.redis = redis_manager
+        self.local = local_cache or LocalCache()
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self.early_expiry_beta = early_expiry_beta
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Kept apart from _inflight: a miss must wait on a load, not a refresh
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self.local.on_evict = lambda reason: CACHE_EVICTIONS.labels(tier="l1", reason=reason).inc()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._pending_invalidation = False
+        self._pending_lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(prefix: str, name: str, args: Iterable = (), kwargs: Optional[Dict] = None) -> str:
+        """Build the cache key for a call; keys share a prefix so they can be invalidated together."""
+        key_parts = [prefix, name]
+        key_parts.extend(str(arg) for arg in args)
+        key_parts.extend(f"{k}:{v}" for k, v in sorted((kwargs or {}).items()))
+        digest = hashlib.md5(
+            json.dumps(key_parts).encode()
+        ).hexdigest()
+        return f"{KEY_NAMESPACE}:{prefix}:{digest}"
+    
+    async def get(self, key: str) -> Any:
+        """
+        Get a cached value, including a stale one.
+        
+        Returns:
+            The cached value, or ``MISSING``
+        """
+        entry = await self._get_entry(key)
+        return entry["value"] if entry is not None else MISSING
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, compute_seconds: float = 0.0) -> Any:
+        """
+        Store a value in both tiers.
+        
+        The value is fresh for ``ttl`` seconds and then served stale for
+        ``stale_ttl`` more seconds while it is refreshed.
+        
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            ttl: Seconds the value stays fresh, defaults to ``CACHE_TTL``
+            compute_seconds: Time taken to compute the value, used to
+                spread early refreshes
+        
+        Returns:
+            The value as every later reader will see it, i.e. after a JSON
+            round trip (tuples become lists, dict keys become strings)
+        """
+        ttl = ttl or self.redis.ttl
+        now = time.time()
+        entry = {"value": value, "expires": now + ttl, "delta": compute_seconds}
+        raw = json.dumps(entry).encode()
+        await self.redis.set_raw(key, raw, ttl + self.stale_ttl)
+        # Keep L1 consistent with what an L2 hit would decode
+        entry = json.loads(raw)
+        self.local.set(key, entry, len(raw), min(ttl + self.stale_ttl, self.local.default_ttl))
+        return entry["value"]
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several cached values in one round trip, omitting misses."""
+        entries = await self.redis.mget(keys)
+        found = {key: entry["value"] for key, entry in zip(keys, entries) if entry is not None}
+        CACHE_REQUESTS.labels(tier="l2", result="hit").inc(len(found))
+        CACHE_REQUESTS.labels(tier="l2", result="miss").inc(len(keys) - len(found))
+        return found
+    
+    async def set_many(self, values: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Cache several values in one round trip."""
+        ttl = ttl or self.redis.ttl
+        expires = time.time() + ttl
+        await self.redis.mset(
+            {key: {"value": value, "expires": expires, "delta": 0.0} for key, value in values.items()},
+            ttl + self.stale_ttl
+        )
     
     def cached(self, prefix: str, ttl: Optional[int] = None):
-        """Decorator for caching function results."""
+        """Decorator for caching function results.
+        
+        Concurrent misses for the same key are coalesced: one call per
+        process runs the function, and a Redis lock keeps other processes
+        waiting for its result instead of recomputing it. Expired values
+        are served stale while a single background refresh runs, and fresh
+        values are refreshed early with a probability that rises as expiry
+        approaches (XFetch), so hot keys rarely expire at all.
+        """
         def decorator(func: Callable):
             @wraps(func)
             async def wrapper(*args, **kwargs):
                 # Generate cache key
-                key_parts = [prefix, func.__name__]
-                key_parts.extend(str(arg) for arg in args)
-                key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-                cache_key = hashlib.md5(
-                    json.dumps(key_parts).encode()
-                ).hexdigest()
+                cache_key = self.make_key(prefix, func.__name__, args, kwargs)
                 
-                # Try to get from cache
-                cached_value = await self.redis.get(cache_key)
-                if cached_value is not None:
-                    logger.debug(f"Cache hit for key: {cache_key}")
-                    return cached_value
+                # Try to get from cache; without Redis, compute uncached
+                try:
+                    entry = await self._get_entry(cache_key)
+                except RedisError as e:
+                    logger.error(f"Cache lookup of {cache_key} failed, computing directly: {str(e)}")
+                    return await func(*args, **kwargs)
+                if entry is None:
+                    return await self._single_flight(
+                        cache_key,
+                        lambda: self._load(cache_key, func, args, kwargs, ttl)
+                    )
                 
-                # Execute function and cache result
-                result = await func(*args, **kwargs)
-                await self.redis.set(cache_key, result, ttl)
-                logger.debug(f"Cached result for key: {cache_key}")
-                return result
+                if self._should_refresh(entry):
+                    self._refresh_in_background(
+                        cache_key,
+                        lambda: self._load(cache_key, func, args, kwargs, ttl, replaces=entry)
+                    )
+                logger.debug(f"Cache hit for key: {cache_key}")
+                return entry["value"]
             return wrapper
-        return decorator
\ No newline at end of file
+        return decorator
+    
+    def _should_refresh(self, entry: dict) -> bool:
+        """Decide whether a cached entry is stale or due an early refresh."""
+        now = time.time()
+        if now >= entry["expires"]:
+            return True
+        # XFetch: refresh early with probability exp(-(expires - now) / (delta * beta))
+        early = entry["delta"] * self.early_expiry_beta * -math.log(1.0 - random.random())
+        return now + early >= entry["expires"]
+    
+    async def _single_flight(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``load`` once per key in this process, sharing its result."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the load other callers wait on
+        return await asyncio.shield(task)
+    
+    def _refresh_in_background(self, key: str, load: Callable[[], Awaitable[Any]]) -> None:
+        """Start a refresh unless one is already running in this process."""
+        if key in self._refreshing:
+            return
+        
+        async def refresh() -> None:
+            try:
+                await load()
+            except Exception as e:
+                logger.error(f"Background refresh of {key} failed: {str(e)}")
+        
+        task = asyncio.ensure_future(refresh())
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+    
+    async def _load(
+        self,
+        key: str,
+        func: Callable,
+        args,
+        kwargs,
+        ttl: Optional[int],
+        replaces: Optional[dict] = None
+    ) -> Any:
+        """
+        Compute and cache a value, coordinating with other processes.
+        
+        The process holding the Redis lock computes the value; the others
+        wait for it to appear in Redis and only compute it themselves if
+        the lock times out. If Redis fails, the value is computed without
+        the lock or the cache.
+        
+        Args:
+            replaces: The entry being refreshed; a stored entry only counts
+                as already refreshed if it expires later than this one
+        """
+        try:
+            return await self._load_locked(key, func, args, kwargs, ttl, replaces)
+        except RedisError as e:
+            logger.error(f"Cache lock for {key} failed, computing directly: {str(e)}")
+            return await func(*args, **kwargs)
+    
+    async def _load_locked(
+        self,
+        key: str,
+        func: Callable,
+        args,
+        kwargs,
+        ttl: Optional[int],
+        replaces: Optional[dict]
+    ) -> Any:
+        """The body of ``_load``; Redis errors are raised before computing, never after."""
+        def refreshed(entry: Optional[dict]) -> bool:
+            if entry is None or time.time() >= entry["expires"]:
+                return False
+            return replaces is None or entry["expires"] > replaces["expires"]
+        
+        lock = self.redis.lock(f"lock:{key}", timeout=self.lock_timeout)
+        deadline = time.monotonic() + self.lock_timeout
+        while not await lock.acquire(blocking=False):
+            entry = await self._get_entry(key, use_local=False)
+            if refreshed(entry):
+                return entry["value"]
+            if time.monotonic() >= deadline:
+                logger.warning(f"Timed out waiting for the cache lock on {key}")
+                return await self._compute(key, func, args, kwargs, ttl)
+            await asyncio.sleep(self.LOCK_POLL_SECONDS)
+        
+        try:
+            # Another process may have stored a fresh value before we got the lock
+            entry = await self._get_entry(key, use_local=False)
+            if refreshed(entry):
+                self.local.set(key, entry, len(json.dumps(entry)))
+                return entry["value"]
+            return await self._compute(key, func, args, kwargs, ttl)
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                # The lock expired while computing; another process may hold it now
+                pass
+            except RedisError as e:
+                # The lock expires on its own
+                logger.error(f"Releasing the cache lock for {key} failed: {str(e)}")
+    
+    async def _compute(self, key: str, func: Callable, args, kwargs, ttl: Optional[int]) -> Any:
+        """Run the function and cache its result."""
+        started = time.perf_counter()
+        result = await func(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        CACHE_COMPUTE_LATENCY.labels(prefix=key.split(":")[1], function=func.__name__).observe(elapsed)
+        try:
+            result = await self.set(key, result, ttl, elapsed)
+        except RedisError as e:
+            logger.error(f"Caching result for {key} failed: {str(e)}")
+            return result
+        logger.debug(f"Cached result for key: {key}")
+        return result
+    
+    async def _get_entry(self, key: str, use_local: bool = True) -> Optional[dict]:
+        """Look a key up in L1, then in L2, filling L1 on an L2 hit."""
+        if use_local:
+            entry = self.local.get(key)
+            if entry is not MISSING:
+                CACHE_REQUESTS.labels(tier="l1", result="hit").inc()
+                return entry
+            CACHE_REQUESTS.labels(tier="l1", result="miss").inc()
+        
+        raw = await self.redis.get_raw(key)
+        if raw is None:
+            CACHE_REQUESTS.labels(tier="l2", result="miss").inc()
+            return None
+        CACHE_REQUESTS.labels(tier="l2", result="hit").inc()
+        
+        entry = json.loads(raw)
+        if use_local:
+            self.local.set(key, entry, len(raw))
+        return entry
+    
+    async def invalidate(self, prefix: Optional[str] = None) -> None:
+        """
+        Drop cached results in every tier and every worker.
+        
+        Args:
+            prefix: Only drop results cached under this decorator prefix;
+                drops everything when None
+        """
+        key_prefix = f"{KEY_NAMESPACE}:{prefix}:" if prefix else f"{KEY_NAMESPACE}:"
+        self.local.invalidate(key_prefix)
+        deleted = await self.redis.delete_pattern(f"{key_prefix}*")
+        CACHE_EVICTIONS.labels(tier="l2", reason="invalidated").inc(deleted)
+        await self.redis.publish(INVALIDATION_CHANNEL, prefix or INVALIDATE_ALL)
+    
+    def invalidate_threadsafe(self, prefix: Optional[str] = None) -> None:
+        """
+        Schedule ``invalidate`` on the event loop from a worker thread.
+        
+        Calls made while an invalidation is already pending are coalesced
+        into it, so a burst of ingestion commits causes one invalidation.
+        Does nothing before ``start_invalidation_listener``.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        with self._pending_lock:
+            if self._pending_invalidation:
+                return
+            self._pending_invalidation = True
+        
+        async def run() -> None:
+            with self._pending_lock:
+                self._pending_invalidation = False
+            try:
+                await self.invalidate(prefix)
+            except Exception as e:
+                logger.error(f"Cache invalidation failed: {str(e)}")
+        
+        asyncio.run_coroutine_threadsafe(run(), self._loop)
+    
+    async def start_invalidation_listener(self) -> None:
+        """Subscribe to invalidations published by other workers."""
+        self._loop = asyncio.get_running_loop()
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def stop_invalidation_listener(self) -> None:
+        """Stop the pub/sub subscription."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+    
+    async def _listen(self) -> None:
+        """Apply published invalidations to L1, reconnecting on errors."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    prefix = message["data"].decode()
+                    self.local.invalidate(
+                        f"{KEY_NAMESPACE}:" if prefix == INVALIDATE_ALL else f"{KEY_NAMESPACE}:{prefix}:"
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations may have been missed while disconnected
+                logger.error(f"Cache invalidation listener failed: {str(e)}")
+                self.local.invalidate()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
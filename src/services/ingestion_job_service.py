@@ -0,0 +1,206 @@
+"""Background ingestion jobs with checkpointed resume."""
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from ..data.ingestion import DataIngestionService
+from ..database.models import IngestionJob
+from ..monitoring.metrics import INGESTION_RECORDS, INGESTION_ROWS_PER_SECOND
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+class IngestionJobService:
+    """Runs ingestion jobs on background threads.
+    
+    Every committed chunk advances the job's ``chunk_offset`` in the same
+    transaction as the inserted rows, so a resumed job continues after the
+    last committed chunk. Rows are loaded with duplicate ids skipped, which
+    keeps a chunk that is replayed after a crash from inserting twice.
+    """
+    
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._threads: Dict[str, threading.Thread] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+    
+    def create_job(self, file_path: str, batch_size: int = 10000) -> dict:
+        """
+        Create a job and start it in the background.
+        
+        Args:
+            file_path: Path to the CSV file
+            batch_size: Number of records committed per checkpoint
+        
+        Returns:
+            dict: The new job
+        """
+        db = self.session_factory()
+        try:
+            job = IngestionJob(
+                id=uuid.uuid4().hex,
+                file_path=file_path,
+                batch_size=batch_size,
+                status="pending"
+            )
+            db.add(job)
+            db.commit()
+            result = job.to_dict()
+        finally:
+            db.close()
+        
+        self._start(result["id"])
+        return result
+    
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job by id."""
+        db = self.session_factory()
+        try:
+            job = db.query(IngestionJob).get(job_id)
+            return job.to_dict() if job else None
+        finally:
+            db.close()
+    
+    def list_jobs(self, limit: int = 20) -> List[dict]:
+        """List the most recent jobs."""
+        db = self.session_factory()
+        try:
+            jobs = db.query(IngestionJob).order_by(
+                IngestionJob.created_at.desc()
+            ).limit(limit).all()
+            return [job.to_dict() for job in jobs]
+        finally:
+            db.close()
+    
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Request cancellation of a running job.
+        
+        The job stops after its current chunk commits.
+        
+        Returns:
+            bool: True if a running job was signalled
+        """
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+    
+    def resume_job(self, job_id: str) -> Optional[dict]:
+        """
+        Restart an interrupted, failed or cancelled job from its checkpoint.
+        
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        job = self.get_job(job_id)
+        if job is None or job["status"] == "completed":
+            return job
+        
+        self._start(job_id)
+        return job
+    
+    def is_running(self, job_id: str) -> bool:
+        """Check whether a job has a live worker thread in this process."""
+        with self._lock:
+            thread = self._threads.get(job_id)
+        return thread is not None and thread.is_alive()
+    
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> None:
+        """Block until a job's worker thread finishes."""
+        with self._lock:
+            thread = self._threads.get(job_id)
+        if thread is not None:
+            thread.join(timeout)
+    
+    def _start(self, job_id: str) -> bool:
+        """
+        Start the worker thread for a job unless one is already running.
+        
+        The check and the start happen under one lock, so concurrent
+        resumes of a job never run two threads on its checkpoint.
+        
+        Returns:
+            bool: True if a thread was started
+        """
+        event = threading.Event()
+        thread = threading.Thread(
+            target=self._run,
+            args=(job_id, event),
+            name=f"ingestion-{job_id}",
+            daemon=True
+        )
+        with self._lock:
+            running = self._threads.get(job_id)
+            if running is not None and running.is_alive():
+                return False
+            self._cancel_events[job_id] = event
+            self._threads[job_id] = thread
+            thread.start()
+        return True
+    
+    def _run(self, job_id: str, cancel_event: threading.Event) -> None:
+        """Ingest a job's file chunk by chunk, checkpointing each commit."""
+        db = self.session_factory()
+        try:
+            job = db.query(IngestionJob).get(job_id)
+            job.status = "running"
+            job.error = None
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            
+            ingestion = DataIngestionService(db)
+            chunks = ingestion.read_chunks(job.file_path, job.batch_size, skip_chunks=job.chunk_offset)
+            last_tick = time.perf_counter()
+            
+            for index, chunk in chunks:
+                if cancel_event.is_set():
+                    job.status = "cancelled"
+                    break
+                
+                def checkpoint(loaded: int) -> None:
+                    nonlocal last_tick
+                    now = time.perf_counter()
+                    job.chunk_offset = index + 1
+                    job.total_records += len(chunk)
+                    job.processed_records += loaded
+                    job.failed_records += len(chunk) - loaded
+                    job.elapsed_seconds += now - last_tick
+                    job.updated_at = datetime.utcnow()
+                    last_tick = now
+                
+                try:
+                    cleaned = ingestion.processor.clean_data(chunk)
+                    loaded = ingestion.write_chunk(cleaned, "copy", skip_duplicates=True, checkpoint=checkpoint)
+                    INGESTION_RECORDS.labels(status="failed").inc(len(chunk) - loaded)
+                except Exception as e:
+                    logger.error(f"Ingestion job {job_id} failed on chunk {index}: {str(e)}")
+                    checkpoint(0)
+                    db.commit()
+                    INGESTION_RECORDS.labels(status="failed").inc(len(chunk))
+            else:
+                job.status = "completed"
+            
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            stats = job.to_dict()
+            INGESTION_ROWS_PER_SECOND.labels(runner="job").set(stats["rows_per_second"])
+            DataIngestionService.notify_run(stats)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            job = db.query(IngestionJob).get(job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                job.updated_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
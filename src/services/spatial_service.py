@@ -0,0 +1,102 @@
+"""Service for spatial trip queries."""
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database.models import TaxiTrip
+from ..utils.geo import GeoUtils
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+NEARBY_COLUMNS = [
+    TaxiTrip.id,
+    TaxiTrip.pickup_datetime,
+    TaxiTrip.pickup_latitude,
+    TaxiTrip.pickup_longitude
+]
+
+class SpatialService:
+    """Service for spatial queries over trip pickups.
+    
+    Queries first prune trips by the indexed ``pickup_cell`` column to the
+    grid cells around the point, then compute exact distances for the
+    candidates with a vectorized haversine.
+    """
+    
+    def __init__(self, db: AsyncSession, batch_size: int = 50000):
+        self.db = db
+        self.batch_size = batch_size
+    
+    async def find_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float = 500,
+        limit: int = 100,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[dict]:
+        """
+        Get the trips picked up closest to a point within a radius.
+        
+        Candidates are read in batches and only the nearest ``limit`` are
+        kept between batches, so memory does not grow with the number of
+        trips in busy cells.
+        
+        Args:
+            latitude: Latitude of the point
+            longitude: Longitude of the point
+            radius_m: Search radius in meters
+            limit: Maximum number of trips
+            start_date: Start of the pickup range
+            end_date: End of the pickup range
+        
+        Returns:
+            list: Trips ordered by distance, each with ``distance_m``
+        """
+        radius_km = radius_m / 1000
+        cells = GeoUtils.cells_in_radius(latitude, longitude, radius_km)
+        query = select(*NEARBY_COLUMNS).where(TaxiTrip.pickup_cell.in_(cells))
+        if start_date:
+            query = query.where(TaxiTrip.pickup_datetime >= start_date)
+        if end_date:
+            query = query.where(TaxiTrip.pickup_datetime <= end_date)
+        
+        nearest_rows: list = []
+        nearest_distances = np.empty(0)
+        candidates = 0
+        result = await self.db.stream(query)
+        try:
+            async for rows in result.partitions(self.batch_size):
+                candidates += len(rows)
+                distances = GeoUtils.haversine_array(
+                    latitude,
+                    longitude,
+                    [row.pickup_latitude for row in rows],
+                    [row.pickup_longitude for row in rows]
+                )
+                within = np.flatnonzero(distances <= radius_km)
+                rows = nearest_rows + [rows[i] for i in within]
+                distances = np.concatenate([nearest_distances, distances[within]])
+                if len(rows) > limit:
+                    keep = np.argpartition(distances, limit)[:limit]
+                    rows = [rows[i] for i in keep]
+                    distances = distances[keep]
+                nearest_rows, nearest_distances = rows, distances
+        finally:
+            await result.close()
+        
+        logger.debug(f"Refined {candidates} candidates from {len(cells)} cells")
+        order = np.argsort(nearest_distances, kind="stable")
+        return [
+            {
+                'id': nearest_rows[i].id,
+                'pickup_datetime': nearest_rows[i].pickup_datetime.isoformat(),
+                'pickup_latitude': nearest_rows[i].pickup_latitude,
+                'pickup_longitude': nearest_rows[i].pickup_longitude,
+                'distance_m': round(float(nearest_distances[i]) * 1000, 1)
+            }
+            for i in order
+        ]
@@ -1,41 +1,158 @@
 """Service layer for taxi trip operations."""
+import io
+import csv
+import json
+import base64
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..database.models import TaxiTrip
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, and_, or_
+from ..database.models import TaxiTrip, TripHourlyRollup
+from ..data.rollup import HourlyRollup
 from fastapi import HTTPException
 
+TRIP_FIELDS = [
+    'id',
+    'vendor_id',
+    'pickup_datetime',
+    'passenger_count',
+    'pickup_longitude',
+    'pickup_latitude',
+    'dropoff_longitude',
+    'dropoff_latitude'
+]
+TRIP_COLUMNS = [TaxiTrip.__table__.c[name] for name in TRIP_FIELDS]
+# Keyset columns, selected even when a caller projects other columns
+KEY_FIELDS = ['pickup_datetime', 'id']
+# Largest page a caller may request; use the stream endpoint for more
+MAX_PAGE_SIZE = 1000
+
 class TripService:
     """Service for handling taxi trip operations."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, use_rollup: bool = False):
         self.db = db
-        
-    def get_trips(
+        self.use_rollup = use_rollup
+    
+    async def get_trips(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 100
-    ) -> List[TaxiTrip]:
+    ) -> List[dict]:
         """Get trips within a date range."""
+        trips, _ = await self.get_trips_page(start_date, end_date, limit)
+        return trips
+    
+    async def get_trips_page(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get one page of trips ordered by (pickup_datetime, id).
+        
+        Pages are addressed by keyset rather than offset, so fetching a deep
+        page costs the same as fetching the first one.
+        
+        Args:
+            start_date: Start of the pickup range
+            end_date: End of the pickup range
+            limit: Maximum number of trips in the page
+            cursor: Opaque cursor returned with the previous page
+        
+        Returns:
+            tuple: (trips, cursor for the next page or None on the last page)
+        """
+        rows, next_cursor = await self._fetch_page(start_date, end_date, limit, cursor)
+        return [self._row_to_dict(row) for row in rows], next_cursor
+    
+    async def get_trip_rows(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """
+        Get trips with only the requested columns, as raw column values.
+        
+        Args:
+            start_date: Start of the pickup range
+            end_date: End of the pickup range
+            limit: Maximum number of trips
+            columns: ``TaxiTrip`` column names to select; the keyset columns
+                are always included. Defaults to ``TRIP_FIELDS``
+        
+        Returns:
+            list: One dictionary per trip
+        """
+        rows, _ = await self._fetch_page(start_date, end_date, limit, columns=columns)
+        return [dict(row._mapping) for row in rows]
+    
+    async def get_vendor_stats(self, vendor_ids: Sequence[int]) -> Dict[int, dict]:
+        """
+        Get trip totals for several vendors in one query.
+        
+        With ``use_rollup`` enabled the totals are summed from the hourly
+        rollup instead of scanning raw trips.
+        
+        Returns:
+            dict: Stats by vendor id; vendors without trips are omitted
+        """
+        if self.use_rollup:
+            vendor_id = TripHourlyRollup.vendor_id
+            query = select(
+                vendor_id,
+                func.sum(TripHourlyRollup.trip_count),
+                func.sum(TripHourlyRollup.duration_sum),
+                func.sum(TripHourlyRollup.duration_count)
+            )
+        else:
+            vendor_id = TaxiTrip.vendor_id
+            query = select(
+                vendor_id,
+                func.count(),
+                func.sum(TaxiTrip.trip_duration),
+                func.count(TaxiTrip.trip_duration)
+            )
+        query = query.where(vendor_id.in_(list(vendor_ids))).group_by(vendor_id)
+        
+        return {
+            int(row[0]): {
+                "id": int(row[0]),
+                "total_trips": int(row[1] or 0),
+                "average_duration": float(row[2] or 0) / row[3] if row[3] else 0.0
+            }
+            for row in (await self.db.execute(query)).all()
+        }
+    
+    async def _fetch_page(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        limit: int,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Tuple[list, Optional[str]]:
+        """Fetch one keyset page of trip rows and the cursor after it."""
+        query = self._trip_query(start_date, end_date, columns)
+        if cursor:
+            after_datetime, after_id = self.decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    TaxiTrip.pickup_datetime > after_datetime,
+                    and_(
+                        TaxiTrip.pickup_datetime == after_datetime,
+                        TaxiTrip.id > after_id
+                    )
+                )
+            )
+        
         try:
-            query = self.db.query(TaxiTrip)
-            
-            if start_date:
-                query = query.filter(TaxiTrip.pickup_datetime >= start_date)
-            if end_date:
-                query = query.filter(TaxiTrip.pickup_datetime <= end_date)
-                
-            # Add debug logging
-            print(f"Executing query: {query}")
-            
-            trips = query.limit(limit).all()
-            
-            # Add debug logging
-            print(f"Found {len(trips)} trips")
-            
-            return [trip.to_dict() for trip in trips]  # Convert to dictionary
+            rows = (await self.db.execute(query.limit(limit + 1))).all()
         except Exception as e:
             import traceback
             print(f"Database error details: {str(e)}")
@@ -45,33 +162,147 @@ class TripService:
                 detail=f"Database error occurred: {str(e)}"
             )
         
-    def get_trip_stats(
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1].pickup_datetime, rows[-1].id)
+        return rows, next_cursor
+    
+    async def stream_trips(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        output_format: str = "ndjson",
+        batch_size: int = 10000
+    ) -> AsyncIterator[str]:
+        """
+        Stream trips as NDJSON lines or CSV in constant memory.
+        
+        Rows are pulled from a server-side cursor ``batch_size`` at a time
+        and encoded straight from column tuples.
+        
+        Args:
+            start_date: Start of the pickup range
+            end_date: End of the pickup range
+            output_format: "ndjson" or "csv"
+            batch_size: Number of rows fetched per round trip
+        
+        Yields:
+            str: Encoded rows, one batch at a time
+        """
+        query = self._trip_query(start_date, end_date)
+        result = await self.db.stream(query)
+        
+        try:
+            if output_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(TRIP_FIELDS)
+                async for rows in result.partitions(batch_size):
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                async for rows in result.partitions(batch_size):
+                    yield "".join(
+                        json.dumps(self._row_to_dict(row)) + "\n" for row in rows
+                    )
+        finally:
+            await result.close()
+    
+    @staticmethod
+    def encode_cursor(pickup_datetime: datetime, trip_id: str) -> str:
+        """Encode a keyset position as an opaque cursor."""
+        payload = json.dumps([pickup_datetime.isoformat(), trip_id])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        """Decode a cursor produced by ``encode_cursor``."""
+        try:
+            pickup_datetime, trip_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(pickup_datetime), trip_id
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid cursor"
+            )
+    
+    @staticmethod
+    def _trip_query(
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None
+    ):
+        """Build a column-tuple query over trips in keyset order."""
+        if columns is None:
+            query = select(*TRIP_COLUMNS)
+        else:
+            names = list(dict.fromkeys([*columns, *KEY_FIELDS]))
+            query = select(*[TaxiTrip.__table__.c[name] for name in names])
+        
+        if start_date:
+            query = query.where(TaxiTrip.pickup_datetime >= start_date)
+        if end_date:
+            query = query.where(TaxiTrip.pickup_datetime <= end_date)
+        
+        return query.order_by(TaxiTrip.pickup_datetime, TaxiTrip.id)
+    
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        """Convert a trip row to the same dictionary as ``TaxiTrip.to_dict``."""
+        trip = dict(row._mapping)
+        trip['pickup_datetime'] = trip['pickup_datetime'].isoformat()
+        return trip
+    
+    async def get_trip_stats(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> dict:
-        """Get statistical information about trips."""
+        """Get statistical information about trips.
+        
+        With ``use_rollup`` enabled, whole hours are read from the hourly
+        rollup and only the partial hours at the edges scan raw trips.
+        """
         try:
-            query = self.db.query(TaxiTrip)
+            buckets, edges = HourlyRollup.plan(start_date, end_date, self.use_rollup)
+            total_trips = duration_sum = duration_count = 0
+            
+            if buckets is not None:
+                row = (await self.db.execute(select(
+                    func.sum(TripHourlyRollup.trip_count),
+                    func.sum(TripHourlyRollup.duration_sum),
+                    func.sum(TripHourlyRollup.duration_count)
+                ).where(
+                    *HourlyRollup.range_filter(TripHourlyRollup.hour_bucket, buckets)
+                ))).one()
+                total_trips += int(row[0] or 0)
+                duration_sum += float(row[1] or 0)
+                duration_count += int(row[2] or 0)
             
-            if start_date:
-                query = query.filter(TaxiTrip.pickup_datetime >= start_date)
-            if end_date:
-                query = query.filter(TaxiTrip.pickup_datetime <= end_date)
-                
-            # Basic statistics calculation
-            total_trips = query.count()
-            avg_duration = query.with_entities(
-                func.avg(TaxiTrip.trip_duration)
-            ).scalar() or 0
+            for edge in edges:
+                row = (await self.db.execute(select(
+                    func.count(),
+                    func.sum(TaxiTrip.trip_duration),
+                    func.count(TaxiTrip.trip_duration)
+                ).where(
+                    *HourlyRollup.range_filter(TaxiTrip.pickup_datetime, edge)
+                ))).one()
+                total_trips += int(row[0] or 0)
+                duration_sum += float(row[1] or 0)
+                duration_count += int(row[2] or 0)
             
             return {
                 "total_trips": total_trips,
-                "average_duration": float(avg_duration)
+                "average_duration": duration_sum / duration_count if duration_count else 0.0
             }
         except Exception as e:
             print(f"Database error in get_trip_stats: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail="Database error occurred"
-            )
\ No newline at end of file
+            )
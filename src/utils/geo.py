@@ -1,12 +1,25 @@
 """Geographical utilities and calculations."""
 from math import radians, sin, cos, sqrt, atan2
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
+import numpy as np
 
 class GeoUtils:
     """Utility class for geographical calculations."""
     
     EARTH_RADIUS_KM = 6371.0
     
+    # Grid cells are 1/2**resolution degrees on each side; resolution 8 is
+    # roughly 430 m (north-south) by 330 m (east-west) in New York
+    GRID_RESOLUTION = 8
+    
+    # Generous bounding box around the five boroughs and the airports
+    NYC_BOUNDS = {
+        'min_latitude': 40.49,
+        'max_latitude': 40.92,
+        'min_longitude': -74.27,
+        'max_longitude': -73.68
+    }
+    
     @staticmethod
     def calculate_distance(
         point1: Tuple[float, float],
@@ -18,7 +31,7 @@ class GeoUtils:
         Args:
             point1: Tuple of (latitude, longitude) for first point
             point2: Tuple of (latitude, longitude) for second point
-            
+        
         Returns:
             float: Distance in kilometers
         """
@@ -40,10 +53,163 @@ class GeoUtils:
         
         Args:
             coords: Dictionary with 'latitude' and 'longitude' keys
-            
+        
         Returns:
             bool: True if coordinates are valid
         """
         lat = coords.get('latitude', 0)
         lon = coords.get('longitude', 0)
-        return -90 <= lat <= 90 and -180 <= lon <= 180
\ No newline at end of file
+        return -90 <= lat <= 90 and -180 <= lon <= 180
+    
+    @staticmethod
+    def coordinates_mask(
+        latitudes,
+        longitudes,
+        bounds: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        Vectorized coordinate validation.
+        
+        Args:
+            latitudes: Array-like of latitudes
+            longitudes: Array-like of longitudes
+            bounds: Optional bounding box with min/max latitude/longitude
+                keys; defaults to the valid range of the globe
+        
+        Returns:
+            ndarray: Boolean mask, True where coordinates are valid
+        """
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        bounds = bounds or {
+            'min_latitude': -90,
+            'max_latitude': 90,
+            'min_longitude': -180,
+            'max_longitude': 180
+        }
+        return (
+            (lat >= bounds['min_latitude']) & (lat <= bounds['max_latitude']) &
+            (lon >= bounds['min_longitude']) & (lon <= bounds['max_longitude'])
+        )
+    
+    @staticmethod
+    def grid_cell(latitudes, longitudes, resolution: int = GRID_RESOLUTION) -> np.ndarray:
+        """
+        Vectorized grid cell ids for coordinates.
+        
+        The id packs the latitude row above the longitude column, so a cell
+        at a coarser resolution r' is found by shifting both indexes right
+        by (resolution - r').
+        
+        Args:
+            latitudes: Array-like of latitudes
+            longitudes: Array-like of longitudes
+            resolution: Grid resolution
+        
+        Returns:
+            ndarray: int64 cell ids
+        """
+        scale = 2 ** resolution
+        lat_index = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) * scale).astype(np.int64)
+        lon_index = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) * scale).astype(np.int64)
+        return (lat_index << (resolution + 9)) | lon_index
+    
+    @staticmethod
+    def coarsen_cell(cells, target_resolution: int, resolution: int = GRID_RESOLUTION) -> np.ndarray:
+        """
+        Vectorized conversion of cell ids to a coarser resolution.
+        
+        Gives the same ids as ``grid_cell`` at ``target_resolution`` for the
+        original coordinates.
+        
+        Args:
+            cells: Array-like of cell ids at ``resolution``
+            target_resolution: Resolution to convert to, at most ``resolution``
+            resolution: Resolution the ids were computed at
+        
+        Returns:
+            ndarray: int64 cell ids
+        """
+        shift = resolution - target_resolution
+        cells = np.asarray(cells, dtype=np.int64)
+        lat_index = (cells >> (resolution + 9)) >> shift
+        lon_index = (cells & ((1 << (resolution + 9)) - 1)) >> shift
+        return (lat_index << (target_resolution + 9)) | lon_index
+    
+    @staticmethod
+    def cell_center(cell: int, resolution: int = GRID_RESOLUTION) -> Tuple[float, float]:
+        """
+        Get the center of a grid cell.
+        
+        Args:
+            cell: Cell id from ``grid_cell``
+            resolution: Resolution the id was computed at
+        
+        Returns:
+            tuple: (latitude, longitude) of the cell center
+        """
+        scale = 2 ** resolution
+        lat_index = int(cell) >> (resolution + 9)
+        lon_index = int(cell) & ((1 << (resolution + 9)) - 1)
+        return (lat_index + 0.5) / scale - 90, (lon_index + 0.5) / scale - 180
+    
+    @staticmethod
+    def haversine_array(latitudes1, longitudes1, latitudes2, longitudes2) -> np.ndarray:
+        """
+        Vectorized haversine distance between arrays of points.
+        
+        Arguments broadcast against each other, so one point can be compared
+        with an array of points by passing scalars for it.
+        
+        Args:
+            latitudes1: Array-like of latitudes of the first points
+            longitudes1: Array-like of longitudes of the first points
+            latitudes2: Array-like of latitudes of the second points
+            longitudes2: Array-like of longitudes of the second points
+        
+        Returns:
+            ndarray: Distances in kilometers
+        """
+        lat1 = np.radians(np.asarray(latitudes1, dtype=np.float64))
+        lon1 = np.radians(np.asarray(longitudes1, dtype=np.float64))
+        lat2 = np.radians(np.asarray(latitudes2, dtype=np.float64))
+        lon2 = np.radians(np.asarray(longitudes2, dtype=np.float64))
+        
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * GeoUtils.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    
+    @staticmethod
+    def cells_in_radius(
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        resolution: int = GRID_RESOLUTION
+    ) -> List[int]:
+        """
+        Grid cells that may contain points within a radius of a point.
+        
+        Covers the bounding box of the circle, so the cells include every
+        point in range plus some outside it; callers refine with
+        ``haversine_array``.
+        
+        Args:
+            latitude: Latitude of the center
+            longitude: Longitude of the center
+            radius_km: Radius in kilometers
+            resolution: Grid resolution of the cell ids
+        
+        Returns:
+            list: Cell ids from ``grid_cell``
+        """
+        lat_delta = np.degrees(radius_km / GeoUtils.EARTH_RADIUS_KM)
+        # Meridians converge towards the poles, so a degree of longitude shrinks
+        lon_delta = lat_delta / max(np.cos(np.radians(min(abs(latitude) + lat_delta, 89.0))), 1e-6)
+        
+        scale = 2 ** resolution
+        lat_range = np.floor((np.array([latitude - lat_delta, latitude + lat_delta]) + 90) * scale).astype(np.int64)
+        lon_range = np.floor((np.array([longitude - lon_delta, longitude + lon_delta]) + 180) * scale).astype(np.int64)
+        return [
+            (int(lat_index) << (resolution + 9)) | int(lon_index)
+            for lat_index in range(lat_range[0], lat_range[1] + 1)
+            for lon_index in range(lon_range[0], lon_range[1] + 1)
+        ]
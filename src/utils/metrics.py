@@ -2,6 +2,7 @@
 from typing import List, Dict, Any
 import numpy as np
 from statistics import mean, median, stdev
+from .sketches import QuantileSketch
 
 class MetricsUtils:
     """Utility class for statistical calculations."""
@@ -13,7 +14,7 @@ class MetricsUtils:
         
         Args:
             values: List of numerical values
-            
+        
         Returns:
             dict: Statistical measures
         """
@@ -26,7 +27,7 @@ class MetricsUtils:
                 "min": 0,
                 "max": 0
             }
-            
+        
         return {
             "count": len(values),
             "mean": mean(values),
@@ -47,12 +48,36 @@ class MetricsUtils:
         Args:
             values: List of numerical values
             percentiles: List of percentiles to calculate
-            
+        
         Returns:
             dict: Percentile values
         """
         if not values:
             return {f"p{p}": 0 for p in percentiles}
-            
+        
         results = np.percentile(values, percentiles)
-        return {f"p{p}": v for p, v in zip(percentiles, results)}
\ No newline at end of file
+        return {f"p{p}": v for p, v in zip(percentiles, results)}
+    
+    @staticmethod
+    def calculate_sketch_percentiles(
+        sketch: QuantileSketch,
+        percentiles: List[float] = [25, 50, 75, 90, 95, 99]
+    ) -> Dict[str, float]:
+        """
+        Calculate percentiles from a quantile sketch.
+        
+        Same output as ``calculate_percentiles``, without holding the
+        values in memory; each value is within the sketch's relative
+        accuracy.
+        
+        Args:
+            sketch: Sketch of the values
+            percentiles: List of percentiles to calculate
+        
+        Returns:
+            dict: Percentile values
+        """
+        if not sketch.count:
+            return {f"p{p}": 0 for p in percentiles}
+        
+        return {f"p{p}": sketch.quantile(p / 100) for p in percentiles}
\ No newline at end of file
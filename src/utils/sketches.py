@@ -0,0 +1,286 @@
+"""Mergeable sketches for approximate analytics.
+
+Each sketch summarises a stream in bounded memory, can be merged with
+another sketch built with the same parameters, and serialises to compact
+bytes so per-hour sketches can be stored and combined later.
+"""
+import math
+import zlib
+from typing import List, Optional, Tuple
+import numpy as np
+
+# splitmix64 constants
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+def hash64(values) -> np.ndarray:
+    """
+    Vectorized 64-bit hash of integer keys.
+    
+    Uses the splitmix64 finalizer, so hashes are stable across processes
+    unlike ``hash()``.
+    
+    Args:
+        values: Array-like of integers
+    
+    Returns:
+        ndarray: uint64 hashes
+    """
+    x = np.asarray(values, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        x = x + _GOLDEN
+        x = (x ^ (x >> np.uint64(30))) * _MIX1
+        x = (x ^ (x >> np.uint64(27))) * _MIX2
+        return x ^ (x >> np.uint64(31))
+
+def hash_rows(keys) -> np.ndarray:
+    """Hash each row of a 2-D integer array into one uint64."""
+    keys = np.asarray(keys, dtype=np.int64).reshape(len(keys), -1)
+    hashes = hash64(keys[:, 0])
+    for column in range(1, keys.shape[1]):
+        hashes = hash64(hashes.astype(np.int64) ^ keys[:, column])
+    return hashes
+
+def _pack(header, *arrays: np.ndarray) -> bytes:
+    """Compress an int64 header followed by raw arrays."""
+    parts = [np.asarray(header, dtype=np.int64).tobytes()]
+    parts.extend(np.ascontiguousarray(array).tobytes() for array in arrays)
+    return zlib.compress(b"".join(parts))
+
+class HyperLogLog:
+    """Distinct-count estimator with a relative error of about 1.04 / sqrt(2^precision)."""
+    
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add(self, keys) -> None:
+        """Add integer keys, or rows of keys for a 2-D array."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if not keys.size:
+            return
+        hashes = hash_rows(keys) if keys.ndim > 1 else hash64(keys)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # rest has at most 52 bits, so the float conversion is exact
+        rank = width - np.frexp(rest.astype(np.float64))[1] + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+    
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Combine with a sketch of the same precision in place."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+    
+    def count(self) -> int:
+        """Estimated number of distinct keys added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+    
+    def to_bytes(self) -> bytes:
+        """Serialise the registers."""
+        return _pack([self.precision], self.registers)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Load a sketch written by ``to_bytes``."""
+        raw = zlib.decompress(data)
+        precision = int(np.frombuffer(raw[:8], dtype=np.int64)[0])
+        return cls(precision, np.frombuffer(raw[8:], dtype=np.uint8).copy())
+
+class QuantileSketch:
+    """Quantile sketch with a bounded relative error on the returned values.
+    
+    Values are counted in logarithmic buckets, as in DDSketch, so every
+    quantile is within ``relative_accuracy`` of a value at that rank and
+    merging adds bucket counts. Values at or below ``min_value`` are
+    counted as zero.
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+    
+    @property
+    def count(self) -> int:
+        """Number of values added."""
+        return self.zero_count + int(self.counts.sum())
+    
+    def _extend(self, low: int, high: int) -> None:
+        """Grow the bucket array to cover indices low..high."""
+        if self.counts.size:
+            low, high = min(low, self.offset), max(high, self.offset + len(self.counts) - 1)
+        counts = np.zeros(high - low + 1, dtype=np.int64)
+        counts[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+        self.offset, self.counts = low, counts
+    
+    def add(self, values) -> None:
+        """Add an array of non-negative values; NaNs are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        positive = values[values > self.min_value]
+        self.zero_count += len(values) - len(positive)
+        if not len(positive):
+            return
+        index = np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64)
+        low, high = int(index.min()), int(index.max())
+        self._extend(low, high)
+        self.counts += np.bincount(index - self.offset, minlength=len(self.counts))
+    
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Combine with a sketch of the same accuracy in place."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        self.zero_count += other.zero_count
+        if other.counts.size:
+            self._extend(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        return self
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimated value at quantile q, between 0 and 1.
+        
+        Returns:
+            float: The value, or None for an empty sketch
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        position = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        index = self.offset + min(position, len(self.counts) - 1)
+        return 2 * self.gamma ** index / (self.gamma + 1)
+    
+    def to_bytes(self) -> bytes:
+        """Serialise the bucket counts; the accuracy is not stored."""
+        return _pack([self.offset, self.zero_count], self.counts)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, relative_accuracy: float = 0.01, min_value: float = 1e-3) -> "QuantileSketch":
+        """Load a sketch written by ``to_bytes`` with the accuracy it was built with."""
+        raw = np.frombuffer(zlib.decompress(data), dtype=np.int64)
+        sketch = cls(relative_accuracy, min_value)
+        sketch.offset, sketch.zero_count = int(raw[0]), int(raw[1])
+        sketch.counts = raw[2:].copy()
+        return sketch
+
+class CountMinSketch:
+    """Frequency estimator that also tracks its heaviest keys.
+    
+    Keys are rows of integers, e.g. (pickup cell, dropoff cell). Estimates
+    never undercount and overcount by at most e / width of the total with
+    probability 1 - e^-depth. A count-min sketch cannot list its keys, so
+    the ``top_k`` keys with the highest estimates are kept alongside it and
+    re-ranked on merge.
+    """
+    
+    def __init__(self, width: int = 1024, depth: int = 4, key_size: int = 2, top_k: int = 64):
+        self.width = width
+        self.depth = depth
+        self.key_size = key_size
+        self.top_k = top_k
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.candidates = np.zeros((0, key_size), dtype=np.int64)
+    
+    @property
+    def total(self) -> int:
+        """Sum of all counts added."""
+        return int(self.table[0].sum())
+    
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        """Column of each key in every row of the table."""
+        hashes = hash_rows(keys)
+        return np.stack([
+            (hash64(hashes.astype(np.int64) ^ row) % np.uint64(self.width)).astype(np.int64)
+            for row in range(self.depth)
+        ])
+    
+    def add(self, keys, counts=None) -> None:
+        """Add key rows, each once or ``counts`` times."""
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, self.key_size)
+        if not len(keys):
+            return
+        keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        weights = np.ones(len(inverse), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        weights = np.bincount(inverse.reshape(-1), weights=weights, minlength=len(keys)).astype(np.int64)
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], weights)
+        self._track(keys)
+    
+    def estimate(self, keys) -> np.ndarray:
+        """Estimated count of each key row."""
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, self.key_size)
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(keys)
+        return np.min([self.table[row][columns[row]] for row in range(self.depth)], axis=0)
+    
+    def _track(self, keys: np.ndarray) -> None:
+        """Add candidate keys, ranking them only once enough have piled up."""
+        self.candidates = np.concatenate([self.candidates, keys])
+        if len(self.candidates) > 4 * self.top_k:
+            self._compact()
+    
+    def _compact(self) -> None:
+        """Keep the ``top_k`` heaviest distinct candidates."""
+        candidates = np.unique(self.candidates, axis=0)
+        if len(candidates) > self.top_k:
+            estimates = self.estimate(candidates)
+            candidates = candidates[np.argsort(-estimates, kind='stable')[:self.top_k]]
+        self.candidates = candidates
+    
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        """Combine with a sketch of the same shape in place."""
+        if other.table.shape != self.table.shape or other.key_size != self.key_size:
+            raise ValueError("Cannot merge count-min sketches of different shape")
+        self.table += other.table
+        self._track(other.candidates)
+        return self
+    
+    def top(self, n: int) -> List[Tuple[Tuple[int, ...], int]]:
+        """The n tracked keys with the highest estimates, heaviest first."""
+        self._compact()
+        if not len(self.candidates):
+            return []
+        estimates = self.estimate(self.candidates)
+        order = np.lexsort((*self.candidates.T[::-1], -estimates))[:n]
+        return [(tuple(int(v) for v in self.candidates[i]), int(estimates[i])) for i in order]
+    
+    def to_bytes(self) -> bytes:
+        """Serialise the table and the tracked keys."""
+        self._compact()
+        header = [self.width, self.depth, self.key_size, self.top_k, len(self.candidates)]
+        return _pack(header, self.table, self.candidates)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountMinSketch":
+        """Load a sketch written by ``to_bytes``."""
+        raw = np.frombuffer(zlib.decompress(data), dtype=np.int64)
+        width, depth, key_size, top_k, candidates = (int(v) for v in raw[:5])
+        sketch = cls(width, depth, key_size, top_k)
+        end = 5 + width * depth
+        sketch.table = raw[5:end].reshape(depth, width).copy()
+        sketch.candidates = raw[end:end + candidates * key_size].reshape(candidates, key_size).copy()
+        return sketch
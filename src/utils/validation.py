@@ -17,7 +17,7 @@ class ValidationUtils:
         Args:
             start_date: Start date of the range
             end_date: End date of the range
-            
+        
         Raises:
             HTTPException: If date range is invalid
         """
@@ -34,7 +34,7 @@ class ValidationUtils:
         
         Args:
             coords: Dictionary containing latitude and longitude
-            
+        
         Raises:
             HTTPException: If coordinates are invalid
         """
@@ -47,4 +47,28 @@ class ValidationUtils:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid longitude value"
-            )
\ No newline at end of file
+            )
+    
+    @staticmethod
+    def validate_positive_int(value: int, name: str, maximum: Optional[int] = None) -> None:
+        """
+        Validate that a numeric parameter is at least 1.
+        
+        Args:
+            value: Parameter value
+            name: Parameter name used in the error message
+            maximum: Largest accepted value, if any
+        
+        Raises:
+            HTTPException: If the value is not positive or above ``maximum``
+        """
+        if value < 1:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{name} must be a positive integer"
+            )
+        if maximum is not None and value > maximum:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{name} must be at most {maximum}"
+            )
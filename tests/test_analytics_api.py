@@ -0,0 +1,241 @@
+"""Test cases for the cached analytics endpoints."""
+import pytest
+import pytest_asyncio
+from datetime import datetime
+import httpx
+import pandas as pd
+from fakeredis import aioredis
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.analytics import router
+from src.api.dependencies import get_cache_service, get_session_factory
+from src.api.graphql import schema
+from src.cache.redis_manager import RedisManager
+from src.config.settings import Settings
+from src.data.ingestion import DataIngestionService
+from src.data.rollup import HourlyRollup
+from src.database.models import Base
+from src.services.cache_service import CacheService
+
+PICKUPS = [
+    '2016-06-30 09:15:00',
+    '2016-06-30 10:00:00',
+    '2016-06-30 10:30:00',
+    '2016-06-30 11:45:00'
+]
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database with a few ingested trips."""
+    path = tmp_path / "trips.db"
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    
+    csv_path = tmp_path / "trips.csv"
+    pd.DataFrame({
+        'id': [f'id{i}' for i in range(len(PICKUPS))],
+        'vendor_id': [1, 2, 1, 2],
+        'pickup_datetime': PICKUPS,
+        'passenger_count': [1] * 4,
+        'pickup_longitude': [-73.9876] * 4,
+        'pickup_latitude': [40.7545] * 4,
+        'dropoff_longitude': [-74.0065] * 4,
+        'dropoff_latitude': [40.7406] * 4,
+        'trip_duration': [600] * 4
+    }).to_csv(csv_path, index=False)
+    DataIngestionService(session).ingest_csv(str(csv_path), batch_size=10, mode="copy")
+    session.close()
+    engine.dispose()
+    return path
+
+@pytest_asyncio.fixture
+async def services(database_path):
+    """Cache backed by fake Redis and a factory counting opened sessions."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{database_path}')
+    Session = sessionmaker(bind=engine, class_=AsyncSession)
+    opened = []
+    
+    def session_factory():
+        opened.append(1)
+        return Session()
+    
+    cache = CacheService(RedisManager(Settings(), client=aioredis.FakeRedis()))
+    
+    yield cache, session_factory, opened
+    
+    await cache.redis.close()
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def client(services):
+    """HTTP client for an app serving only the analytics router."""
+    cache, session_factory, _ = services
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1/analytics")
+    app.dependency_overrides[get_cache_service] = lambda: cache
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+def test_canonical_range():
+    """Test that ranges are widened to whole hours."""
+    start, end = HourlyRollup.canonical_range(
+        datetime(2016, 6, 30, 9, 20),
+        datetime(2016, 6, 30, 11, 5)
+    )
+    assert start == datetime(2016, 6, 30, 9)
+    assert end == datetime(2016, 6, 30, 11, 59, 59, 999999)
+    
+    # An aligned end already covers its hour, and a range never collapses
+    assert HourlyRollup.canonical_range(None, datetime(2016, 6, 30, 12))[1] == datetime(2016, 6, 30, 11, 59, 59, 999999)
+    start, end = HourlyRollup.canonical_range(datetime(2016, 6, 30, 12), datetime(2016, 6, 30, 12))
+    assert end == datetime(2016, 6, 30, 12, 59, 59, 999999)
+
+@pytest.mark.asyncio
+async def test_nearby_ranges_share_cache_entry(client, services):
+    """Test that ranges within the same hours are answered from one query."""
+    _, _, opened = services
+    first = await client.get(
+        "/api/v1/analytics/hourly-distribution",
+        params={"start_date": "2016-06-30T09:05:00", "end_date": "2016-06-30T10:40:00"}
+    )
+    second = await client.get(
+        "/api/v1/analytics/hourly-distribution",
+        params={"start_date": "2016-06-30T09:30:00", "end_date": "2016-06-30T10:50:00"}
+    )
+    
+    assert first.status_code == 200
+    assert first.json() == {"9": 1, "10": 2}
+    assert second.json() == first.json()
+    assert len(opened) == 1
+
+@pytest.mark.asyncio
+async def test_etag_revalidation(client):
+    """Test that a matching If-None-Match gets an empty 304."""
+    response = await client.get("/api/v1/analytics/popular-routes", params={"min_trips": 1})
+    assert response.status_code == 200
+    assert response.json()[0]["trip_count"] == 4
+    assert response.headers["cache-control"] == f"public, max-age={Settings().ANALYTICS_MAX_AGE}"
+    etag = response.headers["etag"]
+    
+    revalidated = await client.get(
+        "/api/v1/analytics/popular-routes",
+        params={"min_trips": 1},
+        headers={"If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    
+    changed = await client.get(
+        "/api/v1/analytics/popular-routes",
+        params={"min_trips": 5},
+        headers={"If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.json() == []
+
+@pytest.mark.asyncio
+async def test_invalid_parameters(client):
+    """Test that non-positive limits and unknown resolutions are rejected."""
+    response = await client.get("/api/v1/analytics/popular-routes", params={"limit": 0})
+    assert response.status_code == 400
+    response = await client.get("/api/v1/analytics/popular-routes", params={"resolution": 7})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_peak_hours_days_are_bounded(client, services):
+    """Test that look-backs outside 1..MAX_PEAK_HOURS_DAYS fail before querying."""
+    cache, session_factory, opened = services
+    for days in (0, 367, 10 ** 9):
+        response = await client.get("/api/v1/analytics/peak-hours", params={"days": days})
+        assert response.status_code == 400
+    
+    context = {"cache": cache, "session_factory": session_factory}
+    result = await schema.execute_async("{ peakHours(days: 367) { hour } }", context_value=context)
+    assert "days must be at most 366" in result.errors[0].message
+    assert opened == []
+
+@pytest.mark.asyncio
+async def test_graphql_analytics_fields(services):
+    """Test that GraphQL fields go through the same cache."""
+    cache, session_factory, opened = services
+    query = """
+        {
+            hourlyDistribution(startDate: "2016-06-30T09:05:00", endDate: "2016-06-30T10:40:00") {
+                hour
+                tripCount
+            }
+            distanceDistribution(binEdges: [0, 2, 5]) { bins { minKm maxKm count } }
+            popularRoutes(minTrips: 1, resolution: 6, startDate: "2016-06-30") { tripCount }
+            tripSummary(approximate: true, percentiles: [50]) {
+                tripCount
+                durationPercentiles { percentile value }
+            }
+        }
+    """
+    context = {"cache": cache, "session_factory": session_factory}
+    
+    result = await schema.execute_async(query, context_value=context)
+    assert result.errors is None
+    assert result.data["hourlyDistribution"] == [
+        {"hour": 9, "tripCount": 1},
+        {"hour": 10, "tripCount": 2}
+    ]
+    assert result.data["distanceDistribution"]["bins"] == [
+        {"minKm": 0.0, "maxKm": 2.0, "count": 0},
+        {"minKm": 2.0, "maxKm": 5.0, "count": 4}
+    ]
+    assert result.data["popularRoutes"] == [{"tripCount": 4}]
+    assert result.data["tripSummary"]["tripCount"] == 4
+    assert result.data["tripSummary"]["durationPercentiles"][0]["percentile"] == 50
+    assert result.data["tripSummary"]["durationPercentiles"][0]["value"] == pytest.approx(600, rel=0.01)
+    
+    await schema.execute_async(query, context_value=context)
+    assert len(opened) == 4
+
+@pytest.mark.asyncio
+async def test_distance_histogram(client, services):
+    """Test histogram bins, percentiles and caching per bin spec."""
+    _, _, opened = services
+    params = {"bins": "0,1,2.2,3", "percentiles": "50,90"}
+    response = await client.get("/api/v1/analytics/distance-distribution", params=params)
+    
+    assert response.status_code == 200
+    # Every trip covers the same ~2.22 km
+    assert response.json()["bins"] == [
+        {"min_km": 0.0, "max_km": 1.0, "count": 0},
+        {"min_km": 1.0, "max_km": 2.2, "count": 0},
+        {"min_km": 2.2, "max_km": 3.0, "count": 4}
+    ]
+    assert [p["distance_km"] for p in response.json()["percentiles"]] == pytest.approx([2.22, 2.22], abs=0.01)
+    
+    # The same spec written differently is served from the cache
+    await client.get("/api/v1/analytics/distance-distribution", params={"bins": "0,1,2.2,3.0", "percentiles": "90,50"})
+    assert len(opened) == 1
+    
+    overflow = await client.get("/api/v1/analytics/distance-distribution", params={"bins": "0,1"})
+    assert overflow.json()["bins"][-1] == {"min_km": 1.0, "max_km": None, "count": 4}
+    
+    invalid = await client.get("/api/v1/analytics/distance-distribution", params={"bins": "2,1"})
+    assert invalid.status_code == 400
+
+@pytest.mark.asyncio
+async def test_trip_summary_modes(client):
+    """Test that exact and approximate summaries are cached separately."""
+    exact = await client.get("/api/v1/analytics/trip-summary", params={"percentiles": "50,90.0"})
+    approximate = await client.get(
+        "/api/v1/analytics/trip-summary",
+        params={"percentiles": "50,90.0", "approximate": "true"}
+    )
+    
+    assert exact.status_code == approximate.status_code == 200
+    assert exact.json()["approximate"] is False
+    assert approximate.json()["approximate"] is True
+    assert exact.json()["trip_count"] == approximate.json()["trip_count"] == 4
+    assert list(approximate.json()["duration_percentiles"]) == ["p50", "p90"]
+    assert approximate.json()["hot_routes"][0]["trip_count"] == 4
@@ -0,0 +1,381 @@
+"""Test cases for RedisManager, CacheService and RateLimiter."""
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+import fakeredis
+from fakeredis import aioredis
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.requests import Request
+from src.auth.jwt_handler import JWTHandler
+from src.cache.local_cache import LocalCache, MISSING
+from src.cache.redis_manager import RedisManager
+from src.config.settings import Settings
+from src.middleware.rate_limiter import RateLimiter
+from src.services.cache_service import CacheService
+
+@pytest_asyncio.fixture
+async def redis_manager():
+    """Create a RedisManager backed by an in-process fake Redis."""
+    manager = RedisManager(Settings(), client=aioredis.FakeRedis())
+    
+    yield manager
+    
+    await manager.clear_all()
+    await manager.close()
+
+def make_request(host: str = "10.0.0.1", path: str = "/api/v1/trips/", token: str = None) -> Request:
+    """Build a bare request from a client address."""
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "client": (host, 1234), "path": path, "headers": headers})
+
+class FakeClock:
+    """Manually advanced clock for rate limiter tests."""
+    
+    def __init__(self):
+        self.now = 1_700_000_000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.mark.asyncio
+async def test_get_set_delete(redis_manager):
+    """Test that values round-trip as JSON."""
+    await redis_manager.set("key", {"total_trips": 2})
+    assert await redis_manager.get("key") == {"total_trips": 2}
+    
+    await redis_manager.delete("key")
+    assert await redis_manager.get("key") is None
+
+@pytest.mark.asyncio
+async def test_mget_mset(redis_manager):
+    """Test batch reads and writes, with misses returned as None."""
+    await redis_manager.mset({"a": 1, "b": [2]}, ttl=30)
+    assert await redis_manager.mget(["a", "missing", "b"]) == [1, None, [2]]
+    assert 0 < await redis_manager.redis_client.ttl("a") <= 30
+
+@pytest.mark.asyncio
+async def test_cached_decorator(redis_manager):
+    """Test that a cached function only runs on a miss."""
+    cache = CacheService(redis_manager)
+    calls = []
+    
+    @cache.cached("stats")
+    async def compute(value):
+        calls.append(value)
+        return {"value": value}
+    
+    assert await compute(1) == {"value": 1}
+    assert await compute(1) == {"value": 1}
+    assert calls == [1]
+    
+    # The second call was served from L1 without touching Redis
+    await redis_manager.redis_client.flushdb()
+    assert await compute(1) == {"value": 1}
+    assert calls == [1]
+    
+    key = cache.make_key("stats", "compute", (1,))
+    await cache.set(key, {"value": 1})
+    assert await cache.get_many([key, "missing"]) == {key: {"value": 1}}
+
+@pytest.mark.asyncio
+async def test_cache_metrics(redis_manager):
+    """Test that lookups, batch lookups and computations are counted."""
+    def sample(name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+    
+    cache = CacheService(redis_manager)
+    
+    @cache.cached("metrics")
+    async def compute(value):
+        return value
+    
+    before = {
+        result: sample("cache_requests_total", tier="l2", result=result)
+        for result in ("hit", "miss")
+    }
+    computed = sample("cache_compute_duration_seconds_count", prefix="metrics", function="compute")
+    l1_hits = sample("cache_requests_total", tier="l1", result="hit")
+    
+    await compute(1)
+    await compute(1)
+    await cache.get_many([cache.make_key("metrics", "compute", (1,)), "missing", "also-missing"])
+    
+    assert sample("cache_compute_duration_seconds_count", prefix="metrics", function="compute") - computed == 1
+    assert sample("cache_requests_total", tier="l1", result="hit") - l1_hits == 1
+    assert sample("cache_requests_total", tier="l2", result="hit") - before["hit"] == 1
+    # The first call misses before and after taking the lock, then two in the batch
+    assert sample("cache_requests_total", tier="l2", result="miss") - before["miss"] == 4
+
+async def allowed(limiter: RateLimiter, request: Request) -> bool:
+    """Whether the limiter lets a request through."""
+    try:
+        await limiter.check_rate_limit(request)
+        return True
+    except HTTPException as error:
+        assert error.status_code == 429
+        assert int(error.headers["Retry-After"]) >= 1
+        return False
+
+@pytest.mark.asyncio
+async def test_rate_limiter(redis_manager):
+    """Test that a client is rejected once it exceeds its limit and the window rolls."""
+    clock = FakeClock()
+    limiter = RateLimiter(redis_manager, requests_per_minute=3, clock=clock)
+    
+    assert [await allowed(limiter, make_request()) for _ in range(4)] == [True, True, True, False]
+    
+    # Other clients have their own limit
+    assert await allowed(limiter, make_request("10.0.0.2"))
+    
+    # One request is let through every period / limit seconds
+    clock.now += 20
+    assert await allowed(limiter, make_request())
+    assert not await allowed(limiter, make_request())
+
+@pytest.mark.asyncio
+async def test_rate_limit_per_subject_and_route(redis_manager):
+    """Test that limits are kept per JWT subject and per route."""
+    limiter = RateLimiter(
+        redis_manager,
+        requests_per_minute=2,
+        route_limits={"/api/v1/trips/stream": 1},
+        clock=FakeClock()
+    )
+    alice = JWTHandler.create_access_token({"sub": "alice"})
+    bob = JWTHandler.create_access_token({"sub": "bob"})
+    
+    assert await allowed(limiter, make_request(token=alice))
+    assert await allowed(limiter, make_request(token=alice))
+    assert not await allowed(limiter, make_request(token=alice))
+    assert await allowed(limiter, make_request(token=bob))
+    
+    # A forged token falls back to the client address
+    assert await allowed(limiter, make_request(token="not-a-token"))
+    
+    stream = "/api/v1/trips/stream"
+    assert await allowed(limiter, make_request(path=stream, token=bob))
+    assert not await allowed(limiter, make_request(path=stream, token=bob))
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_shared_and_atomic():
+    """Test that concurrent requests across workers never exceed the limit."""
+    server = fakeredis.FakeServer()
+    clock = FakeClock()
+    workers = [
+        RateLimiter(RedisManager(Settings(), client=aioredis.FakeRedis(server=server)), 10, clock=clock)
+        for _ in range(5)
+    ]
+    
+    results = await asyncio.gather(*(allowed(workers[i % 5], make_request()) for i in range(50)))
+    assert sum(results) == 10
+
+@pytest.mark.asyncio
+async def test_rate_limit_local_fast_path(redis_manager):
+    """Test that a client rejected by Redis is then rejected without it."""
+    clock = FakeClock()
+    first, second = (RateLimiter(redis_manager, 2, clock=clock) for _ in range(2))
+    for _ in range(2):
+        assert await allowed(first, make_request())
+    
+    # The second worker still has local tokens, so Redis rejects it
+    assert not await allowed(second, make_request())
+    
+    # Later requests are shed locally even though Redis would allow them
+    await redis_manager.clear_all()
+    assert not await allowed(second, make_request())
+    assert not await allowed(first, make_request())
+
+def test_local_cache_evicts_least_recently_used():
+    """Test LRU eviction by entry count and by total size."""
+    evictions = []
+    cache = LocalCache(max_entries=2, max_bytes=100, on_evict=evictions.append)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.get("a")
+    cache.set("c", 3, size=10)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    
+    cache.set("d", 4, size=95)
+    assert len(cache) == 1
+    assert cache.total_bytes == 95
+    assert evictions == ["size", "size", "size"]
+
+def test_local_cache_expires_entries():
+    """Test that entries are not served after their TTL."""
+    cache = LocalCache(default_ttl=0.01)
+    cache.set("a", 1, size=1)
+    time.sleep(0.02)
+    assert cache.get("a") is MISSING
+    assert cache.total_bytes == 0
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers():
+    """Test that an invalidation evicts L1 entries in every worker."""
+    server = fakeredis.FakeServer()
+    workers = [
+        CacheService(RedisManager(Settings(), client=aioredis.FakeRedis(server=server)))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        await worker.start_invalidation_listener()
+    await asyncio.sleep(0.05)
+    
+    key = CacheService.make_key("stats", "compute")
+    for worker in workers:
+        await worker.set(key, {"value": 1})
+    
+    # Ingestion commits are reported from worker threads
+    await asyncio.get_running_loop().run_in_executor(None, workers[0].invalidate_threadsafe)
+    for _ in range(50):
+        if workers[1].local.get(key) is MISSING:
+            break
+        await asyncio.sleep(0.01)
+    
+    assert workers[1].local.get(key) is MISSING
+    assert await workers[1].get(key) is MISSING
+    for worker in workers:
+        await worker.stop_invalidation_listener()
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_run_once(redis_manager):
+    """Test that hundreds of simultaneous misses run the function once."""
+    cache = CacheService(redis_manager)
+    calls = []
+    
+    @cache.cached("analytics")
+    async def heavy_query(days):
+        calls.append(days)
+        await asyncio.sleep(0.05)
+        return {"days": days}
+    
+    results = await asyncio.gather(*(heavy_query(7) for _ in range(500)))
+    assert calls == [7]
+    assert all(result == {"days": 7} for result in results)
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_across_processes_run_once():
+    """Test that the Redis lock coalesces misses from separate workers."""
+    server = fakeredis.FakeServer()
+    workers = [
+        CacheService(RedisManager(Settings(), client=aioredis.FakeRedis(server=server)))
+        for _ in range(3)
+    ]
+    calls = []
+    
+    async def heavy_query():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"total": 42}
+    
+    functions = [worker.cached("analytics")(heavy_query) for worker in workers]
+    results = await asyncio.gather(*(functions[i % 3]() for i in range(300)))
+    assert len(calls) == 1
+    assert all(result == {"total": 42} for result in results)
+
+@pytest.mark.asyncio
+async def test_stale_value_served_while_refreshing(redis_manager):
+    """Test stale-while-revalidate: callers get the old value and one refresh runs."""
+    cache = CacheService(redis_manager, stale_ttl=60)
+    version = {"value": 1}
+    calls = []
+    
+    @cache.cached("stats", ttl=1)
+    async def stats():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return dict(version)
+    
+    assert await stats() == {"value": 1}
+    
+    # Expire the fresh window without dropping the stale copy
+    key = cache.make_key("stats", "stats")
+    entry = await cache._get_entry(key)
+    entry["expires"] = time.time() - 1
+    await redis_manager.set(key, entry, ttl=60)
+    cache.local.invalidate()
+    version["value"] = 2
+    
+    results = await asyncio.gather(*(stats() for _ in range(100)))
+    assert all(result == {"value": 1} for result in results)
+    
+    await asyncio.sleep(0.2)
+    assert len(calls) == 2
+    assert await stats() == {"value": 2}
+
+@pytest.mark.asyncio
+async def test_miss_during_refresh_returns_value(redis_manager):
+    """Test that a miss while a background refresh runs still gets a value."""
+    cache = CacheService(redis_manager, stale_ttl=60)
+    
+    @cache.cached("stats", ttl=1)
+    async def stats():
+        await asyncio.sleep(0.05)
+        return {"total": 42}
+    
+    assert await stats() == {"total": 42}
+    key = cache.make_key("stats", "stats")
+    entry = await cache._get_entry(key)
+    entry["expires"] = time.time() - 1
+    await redis_manager.set(key, entry, ttl=60)
+    cache.local.invalidate()
+    
+    # A stale hit starts a refresh, then the key is dropped while it runs
+    assert await stats() == {"total": 42}
+    await cache.invalidate("stats")
+    assert await stats() == {"total": 42}
+
+class FailingRedisManager(RedisManager):
+    """RedisManager whose reads, locks or writes fail as during an outage."""
+    
+    def __init__(self, failing: str):
+        super().__init__(Settings(), client=aioredis.FakeRedis())
+        self.failing = failing
+    
+    def check(self, step: str) -> None:
+        if step == self.failing:
+            raise RedisConnectionError("Connection refused")
+    
+    async def get_raw(self, key):
+        self.check("reads")
+        return await super().get_raw(key)
+    
+    async def set_raw(self, key, value, ttl=None):
+        self.check("writes")
+        await super().set_raw(key, value, ttl)
+    
+    def lock(self, name, timeout):
+        self.check("locks")
+        return super().lock(name, timeout)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failing", ["reads", "locks", "writes"])
+async def test_cached_values_are_computed_when_redis_fails(failing):
+    """Test that a Redis outage bypasses the cache instead of failing the call."""
+    redis_manager = FailingRedisManager(failing)
+    cache = CacheService(redis_manager)
+    calls = []
+    
+    @cache.cached("analytics")
+    async def stats(day):
+        calls.append(day)
+        return {"day": day}
+    
+    assert await stats(1) == {"day": 1}
+    assert await stats(1) == {"day": 1}
+    assert calls == [1, 1]
+    await redis_manager.close()
+
+def test_early_expiration_probability(redis_manager):
+    """Test that refreshes start earlier for slow-to-compute values."""
+    cache = CacheService(redis_manager)
+    now = time.time()
+    slow = {"value": 1, "expires": now + 1, "delta": 5.0}
+    fast = {"value": 1, "expires": now + 1, "delta": 0.0}
+    
+    assert sum(cache._should_refresh(slow) for _ in range(1000)) > 500
+    assert not any(cache._should_refresh(fast) for _ in range(1000))
+    assert cache._should_refresh({"value": 1, "expires": now - 1, "delta": 0.0})
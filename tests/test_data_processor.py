@@ -7,7 +7,8 @@ from src.data.processor import DataProcessor
 def sample_data():
     """Create sample taxi trip data."""
     return pd.DataFrame({
-        'vendor_id': ['A', 'B', 'C', 'D'],
+        'id': ['id1', 'id2', 'id3', 'id4'],
+        'vendor_id': [1, 2, 1, 2],
         'pickup_datetime': ['2023-01-01 10:00:00'] * 4,
         'dropoff_datetime': ['2023-01-01 11:00:00'] * 4,
         'passenger_count': [1, 2, None, 2],
@@ -23,8 +24,8 @@ def test_clean_data(sample_data):
     processor = DataProcessor()
     cleaned_data = processor.clean_data(sample_data)
     
-    # Should remove rows with missing values
-    assert len(cleaned_data) < len(sample_data)
+    # Should keep the valid rows and remove the rest
+    assert list(cleaned_data['id']) == ['id1', 'id4']
     
     # Should remove rows with invalid coordinates
     assert not any(cleaned_data['pickup_longitude'] == 0)
@@ -33,12 +34,75 @@ def test_clean_data(sample_data):
     # Should remove outlier trip durations
     assert all(cleaned_data['trip_duration'] <= 86400)
 
+def test_clean_data_adds_trip_distance():
+    """Test that the haversine trip distance is stored with each trip."""
+    raw = pd.DataFrame({
+        'id': ['id1', 'id2'],
+        'vendor_id': [1, 2],
+        'pickup_datetime': ['2016-06-30 23:59:58'] * 2,
+        'passenger_count': [1, 3],
+        'pickup_longitude': [-73.9876, -73.9712],
+        'pickup_latitude': [40.7545, 40.7644],
+        'dropoff_longitude': [-74.0065, -73.9901],
+        'dropoff_latitude': [40.7406, 40.7321],
+        'trip_duration': [455, 429]
+    })
+    cleaned_data = DataProcessor.clean_data(raw)
+    
+    assert cleaned_data['trip_distance_km'].dtype == 'float32'
+    assert cleaned_data['trip_distance_km'].tolist() == pytest.approx([2.219, 3.929], abs=0.001)
+
 def test_to_models(sample_data):
     """Test conversion to database models."""
     processor = DataProcessor()
     cleaned_data = processor.clean_data(sample_data)
     models = processor.to_models(cleaned_data)
     
-    assert len(models) == len(cleaned_data)
+    assert len(models) == len(cleaned_data) == 2
+    assert [model.id for model in models] == ['id1', 'id4']
     assert all(hasattr(model, 'vendor_id') for model in models)
-    assert all(hasattr(model, 'trip_duration') for model in models)
\ No newline at end of file
+    assert all(hasattr(model, 'trip_duration') for model in models)
+
+def test_clean_data_with_report():
+    """Test per-rule rejection counts and compact dtypes."""
+    raw = pd.DataFrame({
+        'id': ['id1', '2', 'id3', 'id4', 'id5'],
+        'vendor_id': [1, 2, 1, None, 2],
+        'pickup_datetime': pd.to_datetime(['2016-06-30 23:59:58'] * 5),
+        'passenger_count': [1, 0, 2, 1, 1],
+        'pickup_longitude': [-73.9876, -73.9876, -73.9876, -73.9876, -73.9876],
+        'pickup_latitude': [40.7545, 40.7545, 40.7545, 40.7545, 40.7545],
+        'dropoff_longitude': [-74.0065, -74.0065, -77.0, -74.0065, -74.0065],
+        'dropoff_latitude': [40.7406, 40.7406, 40.7406, 40.7406, 40.7406]
+    })
+    
+    cleaned, report = DataProcessor.clean_data_with_report(raw)
+    
+    assert list(cleaned['id']) == ['id1', 'id5']
+    assert report['missing_values'] == 1
+    assert report['dropoff_outside_nyc'] == 1
+    assert report['invalid_passenger_count'] == 1
+    assert sum(report.values()) == len(raw) - len(cleaned)
+    assert cleaned['pickup_latitude'].dtype == 'float32'
+    assert cleaned['passenger_count'].dtype == 'int8'
+    assert cleaned['vendor_id'].dtype == 'int8'
+
+def test_malformed_values_are_rejected_per_row():
+    """Test that values that are not numbers or dates only reject their own rows."""
+    raw = pd.DataFrame({
+        'id': ['id1', 'id2', 'id3', 'id4'],
+        'vendor_id': ['1', '2', '1', None],
+        'pickup_datetime': ['2016-06-30 23:59:58', 'not a date', '2016-06-30 23:59:58', '2016-06-30 23:59:58'],
+        'passenger_count': ['1', '1', 'x', '1'],
+        'pickup_longitude': [-73.9876] * 4,
+        'pickup_latitude': [40.7545] * 4,
+        'dropoff_longitude': [-74.0065] * 4,
+        'dropoff_latitude': [40.7406] * 4
+    })
+    
+    cleaned, report = DataProcessor.clean_data_with_report(raw)
+    
+    assert list(cleaned['id']) == ['id1']
+    assert report['malformed_values'] == 2
+    assert report['missing_values'] == 1
+    assert cleaned['passenger_count'].dtype == 'int8'
@@ -0,0 +1,139 @@
+"""Test cases for GraphQL execution."""
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.api import graphql
+from src.api.graphql import PersistedQueryCache, execute_request
+from src.database.models import Base, TaxiTrip
+
+TRIPS_QUERY = "{ trips(limit: 10) { id pickupDatetime vendor { id totalTrips } } }"
+
+@pytest_asyncio.fixture
+async def engine():
+    """In-memory database with trips from two vendors."""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    start = datetime(2016, 6, 30, 9)
+    session.add_all([
+        TaxiTrip(
+            id=f'id{i}',
+            vendor_id=1 + i % 2,
+            pickup_datetime=start + timedelta(minutes=i),
+            dropoff_datetime=start + timedelta(minutes=i + 10),
+            passenger_count=1,
+            trip_duration=600
+        )
+        for i in range(5)
+    ])
+    await session.commit()
+    await session.close()
+    
+    yield engine
+    
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def run(engine, monkeypatch):
+    """Execute requests with a fresh query cache, recording the SQL issued."""
+    monkeypatch.setattr(graphql, "query_cache", PersistedQueryCache(graphql.schema))
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    
+    async def run(payload):
+        async with sessionmaker(bind=engine, class_=AsyncSession)() as db:
+            return await execute_request(payload, {"db": db})
+    
+    run.statements = statements
+    yield run
+    
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+@pytest.mark.asyncio
+async def test_trips_select_only_requested_columns(run):
+    """Test that the trips query is projected to the selected fields."""
+    response, status = await run({"query": "{ trips(limit: 2) { id pickupDatetime } }"})
+    
+    assert status == 200
+    assert response["data"]["trips"] == [
+        {"id": "id0", "pickupDatetime": "2016-06-30T09:00:00"},
+        {"id": "id1", "pickupDatetime": "2016-06-30T09:01:00"}
+    ]
+    assert "passenger_count" not in run.statements[0]
+    assert "vendor_id" not in run.statements[0]
+
+@pytest.mark.asyncio
+async def test_nested_vendors_are_batched(run, monkeypatch):
+    """Test that vendors for every trip are fetched with one query."""
+    # Trips were added directly, so the rollup is empty
+    monkeypatch.setattr(graphql.get_settings(), "USE_ROLLUP", False)
+    response, status = await run({"query": TRIPS_QUERY})
+    
+    assert status == 200
+    vendors = {trip["id"]: trip["vendor"] for trip in response["data"]["trips"]}
+    assert vendors["id0"] == {"id": 1, "totalTrips": 3}
+    assert vendors["id1"] == {"id": 2, "totalTrips": 2}
+    assert len(run.statements) == 2
+
+@pytest.mark.asyncio
+async def test_persisted_queries(run, monkeypatch):
+    """Test hash-only requests and that repeated queries are parsed once."""
+    parsed = []
+    parse = graphql.parse
+    monkeypatch.setattr(graphql, "parse", lambda query: parsed.append(query) or parse(query))
+    monkeypatch.setattr(graphql.get_settings(), "USE_ROLLUP", False)
+    extensions = {"persistedQuery": {
+        "version": 1,
+        "sha256Hash": PersistedQueryCache.query_hash(TRIPS_QUERY)
+    }}
+    
+    response, status = await run({"extensions": extensions})
+    assert status == 200
+    assert response["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+    
+    first, _ = await run({"query": TRIPS_QUERY, "extensions": extensions})
+    second, _ = await run({"query": TRIPS_QUERY})
+    by_hash, _ = await run({"extensions": extensions})
+    assert first == second == by_hash
+    assert len(parsed) == 1
+    
+    response, status = await run({"query": "{ trips { id } }", "extensions": extensions})
+    assert status == 400
+
+@pytest.mark.asyncio
+async def test_invalid_query(run):
+    """Test that validation errors are returned without executing."""
+    response, status = await run({"query": "{ trips { unknownField } }"})
+    assert status == 400
+    assert response["data"] is None
+    assert run.statements == []
+
+@pytest.mark.asyncio
+async def test_variables_must_be_an_object(run):
+    """Test that non-object variables or extensions are a client error."""
+    for payload in ({"variables": []}, {"variables": "[1]"}, {"variables": 1}, {"extensions": "[]"}):
+        response, status = await run({"query": "{ trips(limit: 1) { id } }", **payload})
+        assert status == 400
+        assert "JSON objects" in response["errors"][0]["message"]
+    
+    response, status = await run({"query": "{ trips(limit: 1) { id } }", "variables": None})
+    assert status == 200
+    assert run.statements
+
+@pytest.mark.asyncio
+async def test_trips_limit_is_bounded(run):
+    """Test that a page size outside 1..MAX_PAGE_SIZE is rejected without a query."""
+    for limit in (0, -1, 1001):
+        response, _ = await run({"query": f"{{ trips(limit: {limit}) {{ id }} }}"})
+        assert "limit must be" in response["errors"][0]["message"]
+    assert run.statements == []
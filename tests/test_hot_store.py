@@ -0,0 +1,228 @@
+"""Test cases for the in-memory hot trip store."""
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.data.hot_store import ROW_BYTES, HotTripStore
+from src.data.ingestion import DataIngestionService, add_run_listener, remove_run_listener
+from src.data.snapshot import TripSnapshots
+from src.database.models import Base
+from src.services.analytics_service import AnalyticsService
+
+NOW = datetime(2016, 7, 7)
+TRIPS = 300
+
+def trips(count: int, seed: int) -> pd.DataFrame:
+    """Trips picked up at random times in the week before NOW."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': [f'id{seed}-{i}' for i in range(count)],
+        'vendor_id': rng.integers(1, 3, count),
+        'pickup_datetime': NOW - pd.to_timedelta(rng.integers(1, 7 * 86400, count), unit='s'),
+        'passenger_count': rng.integers(1, 5, count),
+        'pickup_latitude': [40.7545] * count,
+        'pickup_longitude': [-73.9876] * count,
+        'dropoff_latitude': [40.7406] * count,
+        'dropoff_longitude': [-74.0065] * count,
+        'trip_duration': [600] * count
+    })
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database with ingested trips."""
+    path = tmp_path / "trips.db"
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    csv_path = tmp_path / "trips.csv"
+    trips(TRIPS, 0).to_csv(csv_path, index=False)
+    DataIngestionService(session).ingest_csv(str(csv_path), batch_size=100, mode="copy")
+    session.close()
+    engine.dispose()
+    return path
+
+@pytest.fixture
+def store(database_path):
+    """Store loaded with the last three days."""
+    store = HotTripStore(window=timedelta(days=3), clock=lambda: NOW)
+    engine = create_engine(f'sqlite:///{database_path}')
+    session = sessionmaker(bind=engine)()
+    store.load(session, batch_size=50)
+    session.close()
+    engine.dispose()
+    return store
+
+@pytest_asyncio.fixture
+async def async_session(database_path):
+    """Async session as used by the API services."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{database_path}')
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    
+    yield session
+    
+    await session.close()
+    await engine.dispose()
+
+def test_append_requires_load():
+    """Test that an unloaded store ignores commits and covers nothing."""
+    store = HotTripStore(clock=lambda: NOW)
+    assert store.append(trips(10, 1)) == 0
+    assert not store.covers(NOW - timedelta(days=1))
+
+@pytest.mark.asyncio
+async def test_hourly_distribution_matches_sql(store, async_session):
+    """Test that counts from the store equal the SQL aggregation."""
+    start, end = NOW - timedelta(days=2, minutes=30), NOW - timedelta(hours=5)
+    assert store.covers(start)
+    assert not store.covers(NOW - timedelta(days=4))
+    
+    sql = await AnalyticsService(async_session, None).get_hourly_distribution(start, end)
+    assert store.count_by_hour(start, end) == sql
+    assert await AnalyticsService(async_session, None, hot_store=store).get_hourly_distribution(start, end) == sql
+
+def test_day_of_week_and_appends(store):
+    """Test day-of-week numbering and that appended chunks are merged in order."""
+    extra = trips(200, 2)
+    for chunk in np.array_split(extra, 10):
+        store.append(chunk)
+    assert len(store._segments) <= 8
+    
+    start = NOW - timedelta(days=1)
+    pickups = pd.to_datetime(extra['pickup_datetime'])
+    recent = pickups[pickups >= start]
+    expected = ((recent.dt.dayofweek + 1) % 7 * 24 + recent.dt.hour).value_counts()
+    
+    before = store.count_by_day_and_hour(start)
+    assert store.append(extra.assign(id=extra['id'] + 'b')) == (pickups >= NOW - timedelta(days=3)).sum()
+    after = store.count_by_day_and_hour(start)
+    added = {
+        day * 24 + hour: after[(day, hour)] - before.get((day, hour), 0)
+        for day, hour in after
+    }
+    assert {key: value for key, value in added.items() if value} == expected.to_dict()
+    
+    segment = store._segments[-1]['pickup_datetime']
+    assert (np.diff(segment) >= 0).all()
+
+def test_memory_budget_evicts_oldest(database_path):
+    """Test that the budget keeps the newest trips and narrows coverage."""
+    store = HotTripStore(window=timedelta(days=7), max_bytes=100 * ROW_BYTES, clock=lambda: NOW)
+    engine = create_engine(f'sqlite:///{database_path}')
+    session = sessionmaker(bind=engine)()
+    store.load(session)
+    session.close()
+    engine.dispose()
+    
+    assert store.row_count == 100
+    assert store.covered_from > NOW - timedelta(days=7)
+    assert store.covers(store.covered_from)
+    assert not store.covers(NOW - timedelta(days=6, hours=23))
+
+@pytest.fixture
+def session_factory(database_path):
+    """Sync session factory for the ingested database."""
+    engine = create_engine(f'sqlite:///{database_path}')
+    
+    yield sessionmaker(bind=engine)
+    
+    engine.dispose()
+
+def unreachable_database():
+    raise AssertionError("the database should not be queried")
+
+def test_snapshot_is_mapped_and_appended_to(store, session_factory, tmp_path):
+    """Test that workers map a published snapshot and keep it as a shared base."""
+    snapshots = TripSnapshots(str(tmp_path / "snapshots"), keep=2)
+    session = session_factory()
+    manifest = store.export(session, snapshots)
+    session.close()
+    assert (tmp_path / "snapshots" / "CURRENT").read_text() == manifest['version']
+    assert manifest['row_count'] == store.row_count
+    
+    worker = HotTripStore(window=timedelta(days=3), clock=lambda: NOW)
+    assert worker.load_snapshot(snapshots)
+    assert not worker.load_snapshot(snapshots)
+    assert isinstance(worker._segments[0]['pickup_datetime'], np.memmap)
+    start = NOW - timedelta(days=2)
+    assert worker.covered_from == store.covered_from
+    assert worker.count_by_hour(start) == store.count_by_hour(start)
+    
+    extra = trips(200, 4)
+    for chunk in np.array_split(extra, 10):
+        worker.append(chunk)
+        store.append(chunk)
+    assert len(worker._segments) <= 8
+    assert isinstance(worker._segments[0]['pickup_datetime'], np.memmap)
+    assert worker.count_by_day_and_hour(start) == store.count_by_day_and_hour(start)
+    
+    for _ in range(2):
+        session = session_factory()
+        store.export(session, snapshots)
+        session.close()
+    assert len(snapshots.versions()) == 2
+    assert manifest['version'] not in snapshots.versions()
+
+def test_refresh_exports_once_per_run(session_factory, tmp_path):
+    """Test that one worker exports and the others only map the snapshot."""
+    snapshots = TripSnapshots(str(tmp_path / "snapshots"))
+    first = HotTripStore(window=timedelta(days=3), clock=lambda: NOW)
+    second = HotTripStore(window=timedelta(days=3), clock=lambda: NOW)
+    
+    first.refresh(session_factory, 300, snapshots)
+    second.refresh(unreachable_database, 300, snapshots)
+    assert len(snapshots.versions()) == 1
+    assert second.snapshot_version == first.snapshot_version
+    
+    csv_path = tmp_path / "more.csv"
+    trips(50, 5).to_csv(csv_path, index=False)
+    add_run_listener(second.request_export)
+    try:
+        session = session_factory()
+        DataIngestionService(session).ingest_csv(str(csv_path), batch_size=25, mode="copy")
+        session.close()
+    finally:
+        remove_run_listener(second.request_export)
+    
+    # Another worker holding the lock defers the export
+    with snapshots.exclusive() as acquired:
+        assert acquired
+        second.refresh(unreachable_database, 300, snapshots)
+    assert len(snapshots.versions()) == 1
+    
+    second.refresh(session_factory, 300, snapshots)
+    first.refresh(unreachable_database, 300, snapshots)
+    assert len(snapshots.versions()) == 2
+    assert first.snapshot_version == second.snapshot_version
+    assert first.row_count == second.row_count > 0
+
+def test_replacing_contents_calls_on_replace(session_factory, tmp_path):
+    """Test that reloads and newly mapped snapshots notify, so cached results can be dropped."""
+    replaced = []
+    store = HotTripStore(window=timedelta(days=3), clock=lambda: NOW, on_replace=lambda: replaced.append(1))
+    store.refresh(session_factory, 300)
+    assert len(replaced) == 1
+    
+    store.append(trips(10, 6))
+    assert len(replaced) == 1
+    
+    snapshots = TripSnapshots(str(tmp_path / "snapshots"))
+    store.refresh(session_factory, 300, snapshots)
+    exported = len(replaced)
+    assert exported > 1
+    store.refresh(unreachable_database, 300, snapshots)
+    assert len(replaced) == exported
+    
+    worker = HotTripStore(window=timedelta(days=3), clock=lambda: NOW, on_replace=lambda: replaced.append(1))
+    worker.refresh(unreachable_database, 300, snapshots)
+    assert len(replaced) == exported + 1
+    
+    def fail():
+        raise RuntimeError("Redis is down")
+    
+    store.on_replace = fail
+    store.refresh(session_factory, 300)
+    assert store.row_count > 0
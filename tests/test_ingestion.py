@@ -0,0 +1,327 @@
+"""Test cases for DataIngestionService."""
+import threading
+import pytest
+import httpx
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.api.rest import router
+from src.data.formats import ChunkReader
+from src.database.session import get_db
+from src.data.ingestion import DataIngestionService, add_commit_listener, remove_commit_listener
+from src.database.models import Base, IngestionJob, TaxiTrip
+from src.services.ingestion_job_service import IngestionJobService
+
+@pytest.fixture
+def db_session():
+    """Create a test database session."""
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    
+    yield session
+    
+    session.close()
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """Write a small trip CSV in the public dataset layout."""
+    path = tmp_path / "trips.csv"
+    pd.DataFrame({
+        'id': ['id1', 'id2', '3', 'id4'],
+        'vendor_id': [1, 2, 1, 2],
+        'pickup_datetime': ['2016-06-30 23:59:58'] * 4,
+        'passenger_count': [1, 2, 1, 3],
+        'pickup_longitude': [-73.9876, 0, -73.9876, -73.9712],
+        'pickup_latitude': [40.7545, 40.7545, 40.7545, 40.7644],
+        'dropoff_longitude': [-74.0065, -74.0065, -74.0065, -73.9901],
+        'dropoff_latitude': [40.7406, 40.7406, 40.7406, 40.7321],
+        'store_and_fwd_flag': ['N'] * 4
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_ingest_csv_copy_mode(db_session, csv_file):
+    """Test bulk loading without ORM objects."""
+    service = DataIngestionService(db_session)
+    stats = service.ingest_csv(csv_file, batch_size=2, mode="copy")
+    
+    assert stats["total_records"] == 4
+    assert stats["processed_records"] == 3
+    assert stats["failed_records"] == 1
+    assert stats["rows_per_second"] > 0
+    
+    ids = {trip.id for trip in db_session.query(TaxiTrip).all()}
+    assert ids == {'id1', 'id3', 'id4'}
+
+def test_ingestion_metrics(db_session, csv_file):
+    """Test that loaded and failed records and run throughput are exported."""
+    def sample(name: str, **labels: str) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+    
+    loaded = sample("ingestion_records_total", status="loaded")
+    failed = sample("ingestion_records_total", status="failed")
+    stats = DataIngestionService(db_session).ingest_csv(csv_file, batch_size=2, mode="copy")
+    
+    assert sample("ingestion_records_total", status="loaded") - loaded == 3
+    assert sample("ingestion_records_total", status="failed") - failed == 1
+    assert sample("ingestion_rows_per_second", runner="serial") == stats["rows_per_second"]
+
+@pytest.mark.parametrize("suffix", [".arrow", ".arrows"])
+def test_arrow_files_are_read_in_batch_sized_chunks(tmp_path, suffix):
+    """Test that IPC files and streams are re-chunked batch by batch."""
+    path = tmp_path / f"trips{suffix}"
+    table = pa.table({"id": [f"id{i}" for i in range(10)], "vendor_id": list(range(10))})
+    new_writer = pa.ipc.new_stream if suffix == ".arrows" else pa.ipc.new_file
+    with new_writer(str(path), table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=3):
+            writer.write_batch(batch)
+    
+    chunks = list(ChunkReader.read(str(path), batch_size=4, columns=["id"]))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert list(chunks[0].columns) == ["id"]
+    assert pd.concat(chunks)["id"].tolist() == table.column("id").to_pylist()
+    
+    resumed = list(ChunkReader.read(str(path), batch_size=4, skip_chunks=2))
+    assert [chunk["vendor_id"].tolist() for chunk in resumed] == [[8, 9]]
+
+def test_parquet_row_groups_are_pruned_by_pickup_range(tmp_path):
+    """Test that row groups outside a pickup range are skipped by their statistics."""
+    path = tmp_path / "trips.parquet"
+    pickups = pd.to_datetime([
+        '2016-06-01 08:00', '2016-06-01 09:00',
+        '2016-06-02 08:00', '2016-06-02 09:00',
+        '2016-06-03 08:00', '2016-06-03 09:00'
+    ])
+    pq.write_table(
+        pa.table({'id': [f'id{i}' for i in range(6)], 'pickup_datetime': pickups}),
+        path,
+        row_group_size=2
+    )
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    
+    june_2 = (datetime(2016, 6, 2), datetime(2016, 6, 2, 23, 59))
+    assert ChunkReader.matching_row_groups(parquet_file) == [0, 1, 2]
+    assert ChunkReader.matching_row_groups(parquet_file, *june_2) == [1]
+    assert ChunkReader.matching_row_groups(parquet_file, start_date=datetime(2016, 6, 2, 9, 30)) == [2]
+    assert ChunkReader.matching_row_groups(parquet_file, end_date=datetime(2016, 5, 31)) == []
+    
+    chunks = list(ChunkReader.read(str(path), batch_size=10, start_date=datetime(2016, 6, 2, 8, 30), end_date=june_2[1]))
+    assert [chunk['id'].tolist() for chunk in chunks] == [['id3']]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("file_format, suffix", [("parquet", ".parquet"), ("arrow", ".arrows")])
+async def test_exported_trips_round_trip(tmp_path, csv_file, file_format, suffix):
+    """Test that an export reads back with pyarrow and ingests into an empty database."""
+    engine = create_engine(
+        'sqlite://',
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    # Complete trips: an exported null duration is rejected when re-ingested
+    source = pd.read_csv(csv_file).assign(trip_duration=[455, 663, 2124, 429])
+    source.to_csv(csv_file, index=False)
+    DataIngestionService(session).ingest_csv(csv_file, batch_size=2, mode="copy")
+    
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_db] = lambda: session
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/v1/trips/export", params={"format": file_format})
+    session.close()
+    
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith(f"trips{suffix}")
+    if file_format == "parquet":
+        table = pq.read_table(pa.BufferReader(response.content))
+    else:
+        table = pa.ipc.open_stream(response.content).read_all()
+    assert sorted(table.column('id').to_pylist()) == ['id1', 'id3', 'id4']
+    assert table.schema.field('pickup_datetime').type == pa.timestamp('us')
+    
+    path = tmp_path / f"trips{suffix}"
+    path.write_bytes(response.content)
+    target = sessionmaker(bind=create_engine('sqlite://'))()
+    Base.metadata.create_all(target.get_bind())
+    stats = DataIngestionService(target).ingest_file(str(path), batch_size=2, mode="copy")
+    
+    assert stats["processed_records"] == 3
+    trips = {trip.id: trip for trip in target.query(TaxiTrip).all()}
+    assert set(trips) == {'id1', 'id3', 'id4'}
+    assert trips['id4'].pickup_datetime == datetime(2016, 6, 30, 23, 59, 58)
+    assert trips['id4'].passenger_count == 3
+    assert trips['id4'].trip_duration == 429
+    target.close()
+
+def test_malformed_csv_value_rejects_only_its_row(db_session, csv_file):
+    """Test that a value that is not a number is counted instead of failing the run."""
+    frame = pd.read_csv(csv_file, dtype=str)
+    frame.loc[3, 'passenger_count'] = 'x'
+    frame.to_csv(csv_file, index=False)
+    
+    stats = DataIngestionService(db_session).ingest_csv(csv_file, batch_size=2, mode="copy")
+    
+    assert stats["processed_records"] == 2
+    assert stats["failed_records"] == 2
+    assert stats["rejected_by_rule"]["malformed_values"] == 1
+    assert {trip.id for trip in db_session.query(TaxiTrip).all()} == {'id1', 'id3'}
+
+@pytest.mark.parametrize("mode", ["orm", "copy"])
+def test_ingest_csv_with_dropoff_times(db_session, csv_file, mode):
+    """Test that dropoff times in the train.csv layout are stored as datetimes."""
+    frame = pd.read_csv(csv_file)
+    frame['dropoff_datetime'] = '2016-07-01 00:09:58'
+    frame['trip_duration'] = 600
+    frame.to_csv(csv_file, index=False)
+    
+    stats = DataIngestionService(db_session).ingest_csv(csv_file, batch_size=2, mode=mode)
+    
+    assert stats["processed_records"] == 3
+    trip = db_session.query(TaxiTrip).filter_by(id='id1').one()
+    assert trip.dropoff_datetime == datetime(2016, 7, 1, 0, 9, 58)
+    assert trip.trip_duration == 600
+
+def test_ingest_csv_rejects_unknown_mode(db_session, csv_file):
+    """Test that an unknown load mode is rejected."""
+    service = DataIngestionService(db_session)
+    with pytest.raises(ValueError):
+        service.ingest_csv(csv_file, mode="bogus")
+
+def test_ingest_file_parallel(db_session, csv_file):
+    """Test the multi-process pipeline commits every chunk."""
+    service = DataIngestionService(db_session)
+    stats = service.ingest_file_parallel(csv_file, batch_size=1, mode="copy", workers=2, queue_depth=1)
+    
+    assert stats["total_records"] == 4
+    assert stats["processed_records"] == 3
+    assert set(stats["stage_timings"]) == {
+        "parse_seconds", "clean_seconds", "write_seconds", "write_wait_seconds"
+    }
+    assert db_session.query(TaxiTrip).count() == 3
+
+def test_commit_listeners_see_committed_chunks(db_session, csv_file):
+    """Test that listeners are called once per committed chunk."""
+    committed = []
+    listener = lambda chunk: committed.append(len(chunk))
+    add_commit_listener(listener)
+    try:
+        DataIngestionService(db_session).ingest_csv(csv_file, batch_size=2, mode="copy")
+    finally:
+        remove_commit_listener(listener)
+    
+    assert committed == [1, 2]
+
+def test_commit_listeners_skip_duplicate_rows(db_session, csv_file):
+    """Test that rows skipped as duplicates are not passed to listeners."""
+    service = DataIngestionService(db_session)
+    chunk = next(service.read_chunks(csv_file, batch_size=10))[1]
+    cleaned = service.processor.clean_data(chunk)
+    service.write_chunk(cleaned.iloc[:1], "copy")
+    
+    committed = []
+    listener = lambda chunk: committed.append(list(chunk['id']))
+    add_commit_listener(listener)
+    try:
+        loaded = service.write_chunk(pd.concat([cleaned, cleaned]), "copy", skip_duplicates=True)
+    finally:
+        remove_commit_listener(listener)
+    
+    assert loaded == len(cleaned) - 1
+    assert committed == [list(cleaned['id'].iloc[1:])]
+
+def test_failed_partition_creation_rolls_back(db_session, csv_file, monkeypatch):
+    """Test that a chunk whose partition cannot be created leaves the session usable."""
+    service = DataIngestionService(db_session)
+    cleaned = service.processor.clean_data(next(service.read_chunks(csv_file, batch_size=10))[1])
+    db_session.add(TaxiTrip(id='pending', vendor_id=1, pickup_datetime=datetime(2016, 6, 30)))
+    
+    def fail(timestamps):
+        raise RuntimeError("cannot create partition")
+    
+    monkeypatch.setattr(service.partitions, "ensure_partitions", fail)
+    with pytest.raises(RuntimeError):
+        service.write_chunk(cleaned, "copy")
+    
+    assert not db_session.new
+    monkeypatch.undo()
+    assert service.write_chunk(cleaned, "copy") == len(cleaned)
+
+def test_ingestion_job_resumes_from_checkpoint(tmp_path, csv_file):
+    """Test that a resumed job skips committed chunks and duplicate ids."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    service = IngestionJobService(Session)
+    
+    # A crashed job that had committed its first chunk (id1 and the
+    # rejected zero-coordinate row) before going down
+    session = Session()
+    pickup = datetime(2016, 6, 30, 23, 59, 58)
+    session.add(TaxiTrip(id='id1', vendor_id=1, pickup_datetime=pickup))
+    session.add(TaxiTrip(id='id3', vendor_id=1, pickup_datetime=pickup))
+    session.add(IngestionJob(id='crashed', file_path=csv_file, batch_size=2, chunk_offset=1, status='running'))
+    session.commit()
+    session.close()
+    
+    service.resume_job('crashed')
+    service.wait('crashed', timeout=10)
+    
+    job = service.get_job('crashed')
+    assert job['status'] == 'completed'
+    assert job['chunk_offset'] == 2
+    assert job['total_records'] == 2
+    assert job['processed_records'] == 1
+    
+    session = Session()
+    assert {trip.id for trip in session.query(TaxiTrip).all()} == {'id1', 'id3', 'id4'}
+    session.close()
+
+def test_concurrent_resumes_start_one_worker(tmp_path, monkeypatch):
+    """Test that racing resume calls run a job's checkpoint only once."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    service = IngestionJobService(Session)
+    session = Session()
+    session.add(IngestionJob(id='crashed', file_path='trips.csv', batch_size=2, status='running'))
+    session.commit()
+    session.close()
+    
+    runs = []
+    release = threading.Event()
+    monkeypatch.setattr(service, "_run", lambda job_id, event: runs.append(job_id) or release.wait(5))
+    barrier = threading.Barrier(8)
+    
+    def resume():
+        barrier.wait()
+        service.resume_job('crashed')
+    
+    threads = [threading.Thread(target=resume) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    service.wait('crashed', timeout=5)
+    assert runs == ['crashed']
+
+@pytest.mark.asyncio
+async def test_job_route_rejects_invalid_batch_size():
+    """Test that a non-positive batch size is a client error, not a failed job."""
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for batch_size in (0, -1):
+            response = await client.post("/api/v1/ingestion/jobs", params={"batch_size": batch_size})
+            assert response.status_code == 400
@@ -0,0 +1,74 @@
+"""Test cases for request, query and ingestion metrics."""
+import pytest
+import httpx
+from fastapi import FastAPI, HTTPException
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from src.middleware.metrics import UNMATCHED, MetricsMiddleware
+from src.monitoring.queries import fingerprint, instrument_engine
+
+def sample(name: str, **labels: str) -> float:
+    """Current value of a metric sample, 0 if it was never observed."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+@pytest.mark.asyncio
+async def test_requests_are_labelled_by_route_template():
+    """Test that requests are counted per route template, not per raw path."""
+    app = FastAPI()
+    
+    @app.get("/vendors/{vendor_id}/trips")
+    async def vendor_trips(vendor_id: int):
+        if vendor_id == 0:
+            raise HTTPException(status_code=404)
+        return []
+    
+    app.add_middleware(MetricsMiddleware)
+    route = "/vendors/{vendor_id}/trips"
+    ok_before = sample("http_requests_total", method="GET", endpoint=route, status="200")
+    missing_before = sample("http_requests_total", method="GET", endpoint=route, status="404")
+    unmatched_before = sample("http_requests_total", method="GET", endpoint=UNMATCHED, status="404")
+    timed_before = sample("http_request_duration_seconds_count", method="GET", endpoint=route)
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for vendor_id in (1, 2, 0):
+            await client.get(f"/vendors/{vendor_id}/trips")
+        await client.get("/no/such/path")
+    
+    assert sample("http_requests_total", method="GET", endpoint=route, status="200") - ok_before == 2
+    assert sample("http_requests_total", method="GET", endpoint=route, status="404") - missing_before == 1
+    assert sample("http_requests_total", method="GET", endpoint=UNMATCHED, status="404") - unmatched_before == 1
+    assert sample("http_request_duration_seconds_count", method="GET", endpoint=route) - timed_before == 3
+    assert sample("http_requests_total", method="GET", endpoint="/vendors/1/trips", status="200") == 0
+
+def test_statement_fingerprints_ignore_values():
+    """Test that statements differing only in values share a fingerprint."""
+    first = fingerprint("SELECT * FROM taxi_trips WHERE vendor_id IN (?, ?) AND id = 'id1' LIMIT 10")
+    second = fingerprint("SELECT *\n  FROM taxi_trips WHERE vendor_id IN (?, ?, ?) AND id = 'it''s' LIMIT 5")
+    assert first[2] == second[2]
+    assert first[:2] == ("SELECT", "taxi_trips")
+    
+    assert fingerprint("INSERT INTO trips VALUES ($1, $2), ($3, $4)")[2] == fingerprint(
+        "INSERT INTO trips VALUES ($1, $2)"
+    )[2]
+    assert fingerprint("SELECT pickup::date FROM trips")[2] != fingerprint("SELECT pickup FROM trips")[2]
+    assert fingerprint("DELETE FROM trips")[:2] == ("DELETE", "trips")
+
+def test_queries_are_timed_by_fingerprint():
+    """Test that an instrumented engine observes every statement it runs."""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    instrument_engine(engine)
+    operation, table, digest = fingerprint("SELECT count(*) FROM numbers WHERE n > ?")
+    labels = {"operation": operation, "table": table, "fingerprint": digest}
+    before = sample("db_query_duration_seconds_count", **labels)
+    
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TABLE numbers (n INTEGER)"))
+        for n in range(3):
+            connection.execute(text("SELECT count(*) FROM numbers WHERE n > :n"), {"n": n})
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.info["query_started"] == []
+    
+    assert sample("db_query_duration_seconds_count", **labels) - before == 3
+    engine.dispose()
@@ -0,0 +1,142 @@
+"""Test cases for the hourly trip rollup."""
+import pytest
+import pytest_asyncio
+from datetime import date, datetime
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.data.ingestion import DataIngestionService
+from src.data.rollup import HourlyRollup
+from src.database.models import Base, TaxiTrip, TripHourlyRollup, TripHourlySketch, TripRouteMatrix
+from src.database.partitions import PartitionManager
+from src.services.analytics_service import AnalyticsService
+from src.services.trip_service import TripService
+
+PICKUPS = [
+    '2016-06-30 09:15:00',
+    '2016-06-30 10:00:00',
+    '2016-06-30 10:30:00',
+    '2016-06-30 11:45:00',
+    '2016-06-30 12:05:00'
+]
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database shared by the sync ingestion and async query sessions."""
+    return tmp_path / "trips.db"
+
+@pytest.fixture
+def db_session(database_path):
+    """Create a test database session."""
+    engine = create_engine(f'sqlite:///{database_path}')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    
+    yield session
+    
+    session.close()
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def loaded_session(db_session, tmp_path):
+    """Ingest a few trips spread over several hours."""
+    path = tmp_path / "trips.csv"
+    pd.DataFrame({
+        'id': [f'id{i}' for i in range(len(PICKUPS))],
+        'vendor_id': [1, 2, 2, 2, 1],
+        'pickup_datetime': PICKUPS,
+        'passenger_count': [1, 2, 3, 1, 1],
+        'pickup_longitude': [-73.9876] * 5,
+        'pickup_latitude': [40.7545] * 5,
+        'dropoff_longitude': [-74.0065] * 5,
+        'dropoff_latitude': [40.7406] * 5,
+        'trip_duration': [600, 1200, 1800, 300, 900]
+    }).to_csv(path, index=False)
+    
+    DataIngestionService(db_session).ingest_csv(str(path), batch_size=2, mode="copy")
+    return db_session
+
+@pytest_asyncio.fixture
+async def async_session(loaded_session, database_path):
+    """Async session over the ingested trips, as used by the API services."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{database_path}')
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    
+    yield session
+    
+    await session.close()
+    await engine.dispose()
+
+def test_split_range():
+    """Test that a range splits into whole hours and partial edges."""
+    buckets, edges = HourlyRollup.split_range(
+        datetime(2016, 6, 30, 9, 30),
+        datetime(2016, 6, 30, 11, 59, 59, 999999)
+    )
+    assert buckets == (datetime(2016, 6, 30, 10), datetime(2016, 6, 30, 12))
+    assert edges == [(datetime(2016, 6, 30, 9, 30), datetime(2016, 6, 30, 10))]
+    
+    buckets, edges = HourlyRollup.split_range(datetime(2016, 6, 30, 9, 10), datetime(2016, 6, 30, 9, 20))
+    assert buckets is None
+    assert len(edges) == 1
+
+def test_ingestion_updates_rollup(loaded_session):
+    """Test that committed chunks are summarised per hour and vendor."""
+    rows = loaded_session.query(TripHourlyRollup).all()
+    assert sum(row.trip_count for row in rows) == len(PICKUPS)
+    
+    ten = [row for row in rows if row.hour_bucket == datetime(2016, 6, 30, 10)]
+    assert len(ten) == 1
+    assert ten[0].trip_count == 2
+    assert ten[0].passenger_sum == 5
+    assert ten[0].duration_sum == 3000
+
+def test_rebuild_matches_incremental(loaded_session):
+    """Test that rebuilding from raw trips gives the same rollup."""
+    def snapshot():
+        return sorted(
+            (row.hour_bucket, row.vendor_id, row.pickup_cell, row.trip_count, row.duration_sum)
+            for row in loaded_session.query(TripHourlyRollup).all()
+        )
+    
+    incremental = snapshot()
+    HourlyRollup(loaded_session).rebuild()
+    assert snapshot() == incremental
+
+@pytest.mark.asyncio
+async def test_trip_stats_from_rollup(async_session):
+    """Test that rollup-backed stats match a raw scan for unaligned ranges."""
+    start, end = datetime(2016, 6, 30, 9, 30), datetime(2016, 6, 30, 12, 0)
+    raw = await TripService(async_session).get_trip_stats(start, end)
+    planned = await TripService(async_session, use_rollup=True).get_trip_stats(start, end)
+    
+    assert planned == raw
+    assert raw['total_trips'] == 3
+
+@pytest.mark.asyncio
+async def test_hourly_distribution_from_rollup(async_session):
+    """Test that the analytics planner combines rollup and edge scans."""
+    start, end = datetime(2016, 6, 30, 9, 30), datetime(2016, 6, 30, 12, 10)
+    raw = AnalyticsService(async_session, None)
+    planned = AnalyticsService(async_session, None, use_rollup=True)
+    
+    expected = await raw.get_hourly_distribution(start, end)
+    assert await planned.get_hourly_distribution(start, end) == expected
+    assert expected == {10: 2, 11: 1, 12: 1}
+
+def test_detached_month_leaves_no_derived_rows(loaded_session):
+    """Test that deleting a month's derived rows only touches that month."""
+    manager = PartitionManager(loaded_session)
+    tables = (TripHourlyRollup, TripHourlySketch, TripRouteMatrix)
+    counts = {table: loaded_session.query(table).count() for table in tables}
+    assert all(counts.values())
+    
+    with manager.engine.begin() as connection:
+        manager.delete_derived_rows(connection, date(2016, 7, 1))
+    assert {table: loaded_session.query(table).count() for table in tables} == counts
+    
+    with manager.engine.begin() as connection:
+        manager.delete_derived_rows(connection, date(2016, 6, 1))
+    assert all(loaded_session.query(table).count() == 0 for table in tables)
@@ -0,0 +1,124 @@
+"""Test cases for the origin-destination route matrix."""
+import pytest
+import pytest_asyncio
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, create_engine, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.data.ingestion import DataIngestionService
+from src.data.route_matrix import RouteMatrix
+from src.database.models import Base, TripRouteMatrix
+from src.services.analytics_service import AnalyticsService
+from src.utils.geo import GeoUtils
+
+# A and B share a cell at resolution 6 but not at resolution 8; C is further north
+PICKUP_A = (40.7545, -73.9876)
+PICKUP_B = (40.7585, -73.9876)
+PICKUP_C = (40.8000, -73.9876)
+
+TRIPS = [
+    ('2016-06-30 09:15:00', 1, PICKUP_A, 600),
+    ('2016-06-30 10:00:00', 2, PICKUP_A, 1200),
+    ('2016-06-30 10:30:00', 1, PICKUP_B, 300),
+    ('2016-07-01 08:00:00', 1, PICKUP_A, 900),
+    ('2016-07-01 09:45:00', 2, PICKUP_B, 600),
+    ('2016-07-01 11:00:00', 1, PICKUP_C, 600)
+]
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database shared by the sync ingestion and async query sessions."""
+    return tmp_path / "trips.db"
+
+@pytest.fixture
+def loaded_session(database_path, tmp_path):
+    """Ingest trips on two days in small chunks."""
+    engine = create_engine(f'sqlite:///{database_path}')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    
+    path = tmp_path / "trips.csv"
+    pd.DataFrame({
+        'id': [f'id{i}' for i in range(len(TRIPS))],
+        'vendor_id': [trip[1] for trip in TRIPS],
+        'pickup_datetime': [trip[0] for trip in TRIPS],
+        'passenger_count': [1] * len(TRIPS),
+        'pickup_latitude': [trip[2][0] for trip in TRIPS],
+        'pickup_longitude': [trip[2][1] for trip in TRIPS],
+        'dropoff_latitude': [40.7406] * len(TRIPS),
+        'dropoff_longitude': [-74.0065] * len(TRIPS),
+        'trip_duration': [trip[3] for trip in TRIPS]
+    }).to_csv(path, index=False)
+    DataIngestionService(session).ingest_csv(str(path), batch_size=2, mode="copy")
+    
+    yield session
+    
+    session.close()
+    engine.dispose()
+
+@pytest_asyncio.fixture
+async def analytics(loaded_session, database_path):
+    """Analytics service over the ingested trips."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{database_path}')
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    
+    yield AnalyticsService(session, None)
+    
+    await session.close()
+    await engine.dispose()
+
+def test_coarsen_matches_grid_cell(loaded_session):
+    """Test that coarsened ids equal ids computed at the coarser resolution."""
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(40.5, 40.9, 1000)
+    longitudes = rng.uniform(-74.2, -73.7, 1000)
+    cells = GeoUtils.grid_cell(latitudes, longitudes)
+    
+    for resolution in (0, 4, 6, 8):
+        expected = GeoUtils.grid_cell(latitudes, longitudes, resolution)
+        assert (GeoUtils.coarsen_cell(cells, resolution) == expected).all()
+        in_sql = loaded_session.execute(
+            select(RouteMatrix.coarsen(literal(int(cells[0]), BigInteger), resolution))
+        ).scalar()
+        assert in_sql == expected[0]
+
+def test_rebuild_matches_incremental(loaded_session):
+    """Test that rebuilding from raw trips gives the same matrix."""
+    def snapshot():
+        return sorted(
+            (row.resolution, row.day_bucket, row.vendor_id, row.pickup_cell, row.dropoff_cell,
+             row.trip_count, row.duration_sum, row.duration_count)
+            for row in loaded_session.query(TripRouteMatrix).all()
+        )
+    
+    incremental = snapshot()
+    assert sum(row[5] for row in incremental if row[0] == 8) == len(TRIPS)
+    RouteMatrix(loaded_session).rebuild()
+    assert snapshot() == incremental
+
+@pytest.mark.asyncio
+async def test_popular_routes_cluster_by_resolution(analytics):
+    """Test that nearby pickups merge into one route at a coarser resolution."""
+    fine = await analytics.get_popular_routes(min_trips=1, resolution=8)
+    assert [route['trip_count'] for route in fine] == [3, 2, 1]
+    assert fine[0]['avg_duration'] == 900
+    assert fine[0]['pickup_cell'] == int(GeoUtils.grid_cell(*PICKUP_A))
+    assert fine[0]['pickup']['lat'] == pytest.approx(PICKUP_A[0], abs=0.002)
+    
+    coarse = await analytics.get_popular_routes(min_trips=1, resolution=6)
+    assert [route['trip_count'] for route in coarse] == [5, 1]
+    assert await analytics.get_popular_routes(min_trips=2, resolution=6, limit=1) == coarse[:1]
+
+@pytest.mark.asyncio
+async def test_popular_routes_filters(analytics):
+    """Test the day range and vendor filters."""
+    second_day = await analytics.get_popular_routes(
+        min_trips=1, resolution=6, start_date=date(2016, 7, 1), end_date=date(2016, 7, 1)
+    )
+    assert [route['trip_count'] for route in second_day] == [2, 1]
+    
+    vendor = await analytics.get_popular_routes(min_trips=1, resolution=6, vendor_id=2)
+    assert [route['trip_count'] for route in vendor] == [2]
+    assert vendor[0]['avg_duration'] == 900
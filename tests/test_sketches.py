@@ -0,0 +1,142 @@
+"""Test cases for sketches and approximate analytics."""
+import pytest
+import pytest_asyncio
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.data.ingestion import DataIngestionService
+from src.data.sketch_rollup import HourlySketches, TripSketch
+from src.database.models import Base, TripHourlySketch
+from src.services.analytics_service import AnalyticsService
+from src.utils.metrics import MetricsUtils
+from src.utils.sketches import CountMinSketch, HyperLogLog, QuantileSketch
+
+TRIPS = 600
+
+def test_hyperloglog_merge():
+    """Test that merged sketches estimate the distinct count of the union."""
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 10 ** 12, 100000)
+    first, second = HyperLogLog(), HyperLogLog()
+    first.add(keys[:60000])
+    second.add(keys[40000:])
+    
+    merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+    assert merged.count() == pytest.approx(len(np.unique(keys)), rel=0.03)
+    assert HyperLogLog().count() == 0
+
+def test_quantile_sketch_matches_percentiles():
+    """Test that sketch percentiles are within the relative accuracy."""
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(6, 1, 50000)
+    first, second = QuantileSketch(), QuantileSketch()
+    first.add(values[:20000])
+    second.add(np.append(values[20000:], np.nan))
+    sketch = QuantileSketch.from_bytes(first.to_bytes()).merge(second)
+    
+    exact = MetricsUtils.calculate_percentiles(list(values))
+    approximate = MetricsUtils.calculate_sketch_percentiles(sketch)
+    assert approximate.keys() == exact.keys()
+    for key, value in exact.items():
+        assert approximate[key] == pytest.approx(value, rel=0.02)
+    assert MetricsUtils.calculate_sketch_percentiles(QuantileSketch(), [50]) == {"p50": 0}
+
+def test_count_min_top_keys():
+    """Test that the heaviest routes survive merging."""
+    rng = np.random.default_rng(2)
+    routes = np.stack([rng.zipf(1.5, 20000) % 300, rng.zipf(1.5, 20000) % 300], axis=1)
+    first, second = CountMinSketch(), CountMinSketch()
+    first.add(routes[:10000])
+    second.add(routes[10000:])
+    sketch = CountMinSketch.from_bytes(first.to_bytes()).merge(second)
+    
+    keys, counts = np.unique(routes, axis=0, return_counts=True)
+    heaviest = np.argsort(-counts, kind='stable')[:3]
+    top = sketch.top(3)
+    assert [key for key, _ in top] == [tuple(keys[i]) for i in heaviest]
+    for (_, estimate), i in zip(top, heaviest):
+        assert counts[i] <= estimate <= counts[i] + 0.01 * len(routes)
+
+@pytest.fixture
+def database_path(tmp_path):
+    """File database shared by the sync ingestion and async query sessions."""
+    return tmp_path / "trips.db"
+
+@pytest.fixture
+def loaded_session(database_path, tmp_path):
+    """Ingest trips spread over a day in chunks that share hours."""
+    engine = create_engine(f'sqlite:///{database_path}')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    
+    rng = np.random.default_rng(3)
+    path = tmp_path / "trips.csv"
+    pd.DataFrame({
+        'id': [f'id{i}' for i in range(TRIPS)],
+        'vendor_id': rng.integers(1, 3, TRIPS),
+        'pickup_datetime': pd.Timestamp('2016-06-30') + pd.to_timedelta(np.sort(rng.integers(0, 86400, TRIPS)), unit='s'),
+        'passenger_count': [1] * TRIPS,
+        'pickup_latitude': 40.75 + rng.integers(0, 5, TRIPS) * 0.01,
+        'pickup_longitude': [-73.98] * TRIPS,
+        'dropoff_latitude': 40.70 + rng.integers(0, 3, TRIPS) * 0.01,
+        'dropoff_longitude': [-74.0] * TRIPS,
+        'trip_duration': rng.integers(60, 3600, TRIPS)
+    }).to_csv(path, index=False)
+    DataIngestionService(session).ingest_csv(str(path), batch_size=50, mode="copy")
+    
+    yield session
+    
+    session.close()
+    engine.dispose()
+
+@pytest_asyncio.fixture
+async def analytics(loaded_session, database_path):
+    """Analytics service over the ingested trips."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{database_path}')
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    
+    yield AnalyticsService(session, None)
+    
+    await session.close()
+    await engine.dispose()
+
+def test_rebuild_matches_incremental(loaded_session):
+    """Test that rebuilt sketches equal the ones merged at ingestion."""
+    def snapshot():
+        return {
+            row.hour_bucket: TripSketch.from_row(row)
+            for row in loaded_session.query(TripHourlySketch).all()
+        }
+    
+    incremental = snapshot()
+    assert sum(sketch.trip_count for sketch in incremental.values()) == TRIPS
+    HourlySketches(loaded_session).rebuild()
+    rebuilt = snapshot()
+    
+    assert rebuilt.keys() == incremental.keys()
+    for hour, sketch in rebuilt.items():
+        assert sketch.trip_count == incremental[hour].trip_count
+        assert (sketch.routes.registers == incremental[hour].routes.registers).all()
+        assert (sketch.durations.counts == incremental[hour].durations.counts).all()
+        assert (sketch.hot_routes.table == incremental[hour].hot_routes.table).all()
+
+@pytest.mark.asyncio
+async def test_approximate_summary_matches_exact(analytics):
+    """Test that the sketch-backed summary agrees with the exact one."""
+    start, end = datetime(2016, 6, 30, 3, 30), datetime(2016, 6, 30, 20, 15)
+    exact = await analytics.get_trip_summary(start, end, (50, 90), top_routes=3)
+    approximate = await analytics.get_trip_summary(start, end, (50, 90), top_routes=3, approximate=True)
+    
+    assert exact['approximate'] is False and approximate['approximate'] is True
+    assert approximate['trip_count'] == exact['trip_count']
+    assert approximate['distinct_routes'] == exact['distinct_routes'] == 15
+    assert approximate['duration_percentiles'].keys() == {'p50', 'p90'}
+    for name in ('duration_percentiles', 'distance_percentiles'):
+        for key, value in exact[name].items():
+            assert approximate[name][key] == pytest.approx(value, rel=0.05)
+    assert [route['trip_count'] for route in approximate['hot_routes']] == [
+        route['trip_count'] for route in exact['hot_routes']
+    ]
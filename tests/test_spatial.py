@@ -0,0 +1,78 @@
+"""Test cases for vectorized distances and nearby trip queries."""
+import pytest
+import pytest_asyncio
+import numpy as np
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.database.models import Base, TaxiTrip
+from src.services.spatial_service import SpatialService
+from src.utils.geo import GeoUtils
+
+CENTER = (40.7545, -73.9876)
+
+def test_haversine_array_matches_scalar():
+    """Test that the vectorized haversine agrees with the scalar one."""
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(40.5, 40.9, 1000)
+    longitudes = rng.uniform(-74.2, -73.7, 1000)
+    
+    expected = [GeoUtils.calculate_distance(CENTER, point) for point in zip(latitudes, longitudes)]
+    assert np.allclose(GeoUtils.haversine_array(*CENTER, latitudes, longitudes), expected)
+    assert GeoUtils.haversine_array(*CENTER, *CENTER) == 0
+
+def test_cells_in_radius_cover_circle():
+    """Test that every point within the radius falls in one of the cells."""
+    rng = np.random.default_rng(1)
+    latitudes = rng.uniform(CENTER[0] - 0.02, CENTER[0] + 0.02, 20000)
+    longitudes = rng.uniform(CENTER[1] - 0.02, CENTER[1] + 0.02, 20000)
+    within = GeoUtils.haversine_array(*CENTER, latitudes, longitudes) <= 0.5
+    
+    cells = GeoUtils.cells_in_radius(*CENTER, 0.5)
+    assert np.isin(GeoUtils.grid_cell(latitudes, longitudes)[within], cells).all()
+    assert len(cells) < 30
+
+@pytest_asyncio.fixture
+async def db_session():
+    """Trips at increasing distances north of the center."""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session = sessionmaker(bind=engine, class_=AsyncSession)()
+    
+    # 0.001 degrees of latitude is about 111 m
+    latitudes = [CENTER[0] + 0.001 * i for i in (4, 0, 2, 8, 30)]
+    cells = GeoUtils.grid_cell(latitudes, [CENTER[1]] * len(latitudes))
+    session.add_all([
+        TaxiTrip(
+            id=f'id{i}',
+            pickup_datetime=datetime(2016, 6, 30, 9) + timedelta(hours=i),
+            pickup_latitude=latitude,
+            pickup_longitude=CENTER[1],
+            pickup_cell=int(cell)
+        )
+        for i, (latitude, cell) in enumerate(zip(latitudes, cells))
+    ])
+    await session.commit()
+    
+    yield session
+    
+    await session.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_find_nearby(db_session):
+    """Test that nearby trips are filtered by radius and sorted by distance."""
+    service = SpatialService(db_session, batch_size=2)
+    trips = await service.find_nearby(*CENTER, radius_m=500)
+    
+    assert [trip['id'] for trip in trips] == ['id1', 'id2', 'id0']
+    assert trips[0]['distance_m'] == 0
+    assert trips[2]['distance_m'] == pytest.approx(444.8, abs=1)
+    
+    nearest = await service.find_nearby(*CENTER, radius_m=1000, limit=2)
+    assert [trip['id'] for trip in nearest] == ['id1', 'id2']
+    
+    later = await service.find_nearby(*CENTER, radius_m=1000, start_date=datetime(2016, 6, 30, 11))
+    assert [trip['id'] for trip in later] == ['id2', 'id3']
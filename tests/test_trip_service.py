@@ -1,22 +1,30 @@
 """Test cases for TripService."""
 import pytest
+import pytest_asyncio
+import httpx
+from fastapi import FastAPI
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.api.rest import router
+from src.database.session import get_async_db
 from src.services.trip_service import TripService
 from src.database.models import Base, TaxiTrip
 
-@pytest.fixture
-def db_session():
+@pytest_asyncio.fixture
+async def db_session():
     """Create a test database session."""
-    engine = create_engine('sqlite:///:memory:')
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
     session = Session()
     
     # Add test data
     test_trips = [
         TaxiTrip(
+            id='id1',
             vendor_id='test1',
             pickup_datetime=datetime.now() - timedelta(hours=2),
             dropoff_datetime=datetime.now() - timedelta(hours=1),
@@ -28,6 +36,7 @@ def db_session():
             trip_duration=3600
         ),
         TaxiTrip(
+            id='id2',
             vendor_id='test2',
             pickup_datetime=datetime.now() - timedelta(days=1),
             dropoff_datetime=datetime.now() - timedelta(days=1, hours=-1),
@@ -40,31 +49,113 @@ def db_session():
         )
     ]
     
-    session.bulk_save_objects(test_trips)
-    session.commit()
+    session.add_all(test_trips)
+    await session.commit()
     
     yield session
     
-    Base.metadata.drop_all(engine)
+    await session.close()
+    await engine.dispose()
 
-def test_get_trips(db_session):
+@pytest.mark.asyncio
+async def test_get_trips(db_session):
     """Test retrieving trips within a date range."""
     service = TripService(db_session)
     
     # Test without date filters
-    trips = service.get_trips()
+    trips = await service.get_trips()
     assert len(trips) == 2
     
     # Test with date filter
     start_date = datetime.now() - timedelta(hours=3)
-    trips = service.get_trips(start_date=start_date)
+    trips = await service.get_trips(start_date=start_date)
     assert len(trips) == 1
-    assert trips[0].vendor_id == 'test1'
+    assert trips[0]['vendor_id'] == 'test1'
 
-def test_get_trip_stats(db_session):
+@pytest.mark.asyncio
+async def test_get_trip_stats(db_session):
     """Test calculating trip statistics."""
     service = TripService(db_session)
     
-    stats = service.get_trip_stats()
+    stats = await service.get_trip_stats()
     assert stats['total_trips'] == 2
-    assert stats['average_duration'] == 5400  # (3600 + 7200) / 2
\ No newline at end of file
+    assert stats['average_duration'] == 5400  # (3600 + 7200) / 2
+
+@pytest_asyncio.fixture
+async def page_session():
+    """Create a session holding two trips with ids, the key of pagination."""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)()
+    session.add_all([
+        TaxiTrip(
+            id=f'id{index}',
+            vendor_id=index,
+            pickup_datetime=datetime(2016, 6, 30, 10 + index),
+            passenger_count=1,
+            pickup_longitude=-73.9876,
+            pickup_latitude=40.7545,
+            dropoff_longitude=-74.0065,
+            dropoff_latitude=40.7406
+        )
+        for index in (1, 2)
+    ])
+    await session.commit()
+    
+    yield session
+    
+    await session.close()
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_get_trips_page_cursor(page_session):
+    """Test keyset pagination walks every trip exactly once."""
+    service = TripService(page_session)
+    
+    first, cursor = await service.get_trips_page(limit=1)
+    assert len(first) == 1
+    assert cursor is not None
+    
+    second, cursor = await service.get_trips_page(limit=1, cursor=cursor)
+    assert len(second) == 1
+    assert cursor is None
+    assert first[0]['pickup_datetime'] < second[0]['pickup_datetime']
+
+@pytest.mark.asyncio
+async def test_stream_trips_csv(page_session):
+    """Test streaming trips as CSV."""
+    service = TripService(page_session)
+    
+    chunks = [chunk async for chunk in service.stream_trips(output_format="csv", batch_size=1)]
+    lines = "".join(chunks).splitlines()
+    assert lines[0].startswith('id,vendor_id,pickup_datetime')
+    assert len(lines) == 3
+
+@pytest.mark.asyncio
+async def test_trips_route_rejects_invalid_limit():
+    """Test that the trips route validates the page size before querying."""
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_async_db] = lambda: None
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for limit in (0, -5, 1001):
+            response = await client.get("/api/v1/trips/", params={"limit": limit})
+            assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_nearby_route_rejects_invalid_limit():
+    """Test that the nearby route bounds its result size like the trips route."""
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    app.dependency_overrides[get_async_db] = lambda: None
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for limit in (0, 1001):
+            response = await client.get(
+                "/api/v1/trips/nearby",
+                params={"latitude": 40.7545, "longitude": -73.9876, "limit": limit}
+            )
+            assert response.status_code == 400
+            assert "limit must be" in response.json()["detail"]